@@ -1,38 +1,229 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+
 from fastapi import FastAPI
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
-from openai import OpenAI
-import os
+from openai import AsyncOpenAI
+
+MODEL          = os.getenv("ASSISTANT_MODEL", "gpt-3.5-turbo")
+MAX_CONCURRENT = int(os.getenv("ASSISTANT_MAX_CONCURRENCY", 8))
+QUEUE_TIMEOUT  = float(os.getenv("ASSISTANT_QUEUE_TIMEOUT_S", 10))
+TIMEOUT        = float(os.getenv("ASSISTANT_TIMEOUT_S", 60))
+CACHE_SIZE     = int(os.getenv("ASSISTANT_CACHE_SIZE", 256))
+CACHE_TTL      = float(os.getenv("ASSISTANT_CACHE_TTL_S", 600))
 
 # 1) Create FastAPI app and serve your static folder under /static
 app = FastAPI()
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
-# 2) Instantiate a real OpenAI client (reads OPENAI_API_KEY from env)
-client = OpenAI()
+# 2) Async OpenAI client (reads OPENAI_API_KEY; OPENAI_BASE_URL points it at
+#    another endpoint, e.g. stub_llm.py for offline testing)
+client = AsyncOpenAI(timeout=TIMEOUT, max_retries=1)
+
+
+class Busy(Exception):
+    pass
+
+
+class CompletionTimeout(Exception):
+    pass
+
 
 # 3) Pydantic model for your POST body
 class Cmd(BaseModel):
     cmd: str
 
+
+class TTLCache:
+    """LRU of finished replies that also forgets entries older than `ttl`."""
+
+    def __init__(self, size, ttl):
+        self.size, self.ttl = size, ttl
+        self.data = OrderedDict()
+
+    def get(self, key):
+        hit = self.data.get(key)
+        if hit is None:
+            return None
+        stored, value = hit
+        if time.monotonic() - stored > self.ttl:
+            del self.data[key]
+            return None
+        self.data.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self.data[key] = (time.monotonic(), value)
+        self.data.move_to_end(key)
+        while len(self.data) > self.size:
+            self.data.popitem(last=False)
+
+
+class Flight:
+    """One completion in progress. Any number of requests follow() it and
+    get every token from the start, so identical prompts share one call."""
+
+    def __init__(self):
+        self.chunks   = []
+        self.error    = None
+        self.done     = False
+        self.started  = time.monotonic()
+        self._changed = asyncio.Event()
+
+    def _wake(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def push(self, text):
+        self.chunks.append(text)
+        self._wake()
+
+    def finish(self, error=None):
+        self.error, self.done = error, True
+        self._wake()
+
+    @property
+    def text(self):
+        return "".join(self.chunks)
+
+    async def follow(self):
+        i = 0
+        while True:
+            while i < len(self.chunks):
+                yield self.chunks[i]
+                i += 1
+            if self.done:
+                if self.error:
+                    raise self.error
+                return
+            await self._changed.wait()
+
+
+class Assistant:
+    def __init__(self):
+        self.cache    = TTLCache(CACHE_SIZE, CACHE_TTL)
+        self.inflight = {}
+        self.tasks    = set()   # keeps running completions referenced
+        self.slots    = asyncio.Semaphore(MAX_CONCURRENT)
+        self.stats    = {"requests": 0, "cache_hits": 0, "coalesced": 0, "completions": 0,
+                         "errors": 0, "timeouts": 0, "busy": 0}
+
+    @staticmethod
+    def key(prompt):
+        return hashlib.sha256(f"{MODEL}\0{prompt.strip()}".encode()).hexdigest()
+
+    def ask(self, prompt):
+        """Returns (cached reply, None) or (None, Flight)."""
+        self.stats["requests"] += 1
+        k = self.key(prompt)
+        reply = self.cache.get(k)
+        if reply is not None:
+            self.stats["cache_hits"] += 1
+            return reply, None
+        flight = self.inflight.get(k)
+        if flight is not None:
+            self.stats["coalesced"] += 1
+            return None, flight
+        flight = self.inflight[k] = Flight()
+        # the completion runs on its own task: a client going away doesn't
+        # cancel it for the others following the same flight
+        task = asyncio.get_running_loop().create_task(self._complete(k, prompt, flight))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return None, flight
+
+    async def _complete(self, k, prompt, flight):
+        try:
+            try:
+                await asyncio.wait_for(self.slots.acquire(), QUEUE_TIMEOUT)
+            except asyncio.TimeoutError:
+                self.stats["busy"] += 1
+                raise Busy(f"assistant busy: {MAX_CONCURRENT} completions already running")
+            try:
+                await asyncio.wait_for(self._stream(prompt, flight), TIMEOUT)
+            except asyncio.TimeoutError:
+                self.stats["timeouts"] += 1
+                raise CompletionTimeout(f"completion timed out after {TIMEOUT:g}s")
+            finally:
+                self.slots.release()
+            self.stats["completions"] += 1
+            self.cache.put(k, flight.text.strip())
+            flight.finish()
+        except Exception as e:
+            self.stats["errors"] += 1
+            flight.finish(e)
+        finally:
+            self.inflight.pop(k, None)
+
+    async def _stream(self, prompt, flight):
+        stream = await client.chat.completions.create(
+            model=MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            stream=True,
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                flight.push(chunk.choices[0].delta.content)
+
+
+assistant = Assistant()
+
+
+def sse(data, event=None):
+    head = f"event: {event}\n" if event else ""
+    return f"{head}data: {json.dumps(data)}\n\n"
+
+
 # 4) UI entry-point: serve your HTML chat page
 @app.get("/")
 def serve_ui():
     return FileResponse("static/index.html")
 
-# 5) Chat endpoint: forward user text into gpt-3.5-turbo chat
+
+# 5) Chat endpoint: whole reply as JSON
 @app.post("/run")
 async def run(cmd: Cmd):
-    try:
-        completion = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": cmd.cmd}],
-        )
-        # grab the assistant’s reply
-        reply = completion.choices[0].message.content.strip()
-        return {"response": reply}
+    reply, flight = assistant.ask(cmd.cmd)
+    if flight is not None:
+        try:
+            async for _ in flight.follow():
+                pass
+        except Exception as e:
+            status = {Busy: 503, CompletionTimeout: 504}.get(type(e), 500)
+            return JSONResponse(status_code=status, content={"error": str(e)})
+        reply = flight.text.strip()
+    return {"response": reply, "cached": flight is None}
+
+
+# 6) Same, streamed token by token as server-sent events
+@app.post("/stream")
+async def stream(cmd: Cmd):
+    reply, flight = assistant.ask(cmd.cmd)
+
+    async def events():
+        if flight is None:
+            yield sse({"delta": reply})
+            yield sse({"cached": True}, "done")
+            return
+        try:
+            async for text in flight.follow():
+                yield sse({"delta": text})
+        except Exception as e:
+            yield sse({"error": str(e)}, "error")
+            return
+        yield sse({"cached": False, "seconds": round(time.monotonic() - flight.started, 3)}, "done")
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 
-    except Exception as e:
-        # bubble up any errors
-        return JSONResponse(status_code=500, content={"error": str(e)})
+@app.get("/healthz")
+def healthz():
+    return {**assistant.stats, "inflight": len(assistant.inflight),
+            "cached": len(assistant.cache.data), "max_concurrency": MAX_CONCURRENT}
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# Latency / throughput check for the assistant endpoint (see stub_llm.py to
+# run it offline). Fires --requests prompts, --concurrency at a time, drawn
+# from --distinct different prompts, so repeats exercise the cache and
+# simultaneous repeats the request coalescing.
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+
+import httpx
+
+
+async def one(client, url, prompt, streaming):
+    t0 = time.perf_counter()
+    first = None
+    if not streaming:
+        r = await client.post(f"{url}/run", json={"cmd": prompt})
+        return r.status_code == 200, time.perf_counter() - t0, time.perf_counter() - t0
+    ok = True
+    async with client.stream("POST", f"{url}/stream", json={"cmd": prompt}) as r:
+        async for line in r.aiter_lines():
+            if line.startswith("event: error"):
+                ok = False
+            if line.startswith("data:") and first is None:
+                first = time.perf_counter() - t0
+    return ok and r.status_code == 200, first or 0.0, time.perf_counter() - t0
+
+
+def pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))] if values else 0.0
+
+
+async def main():
+    p = argparse.ArgumentParser(description="Load-test the assistant endpoint")
+    p.add_argument("--url", default="http://localhost:8080")
+    p.add_argument("--requests", type=int, default=200)
+    p.add_argument("--concurrency", type=int, default=32)
+    p.add_argument("--distinct", type=int, default=20, help="Different prompts to draw from")
+    p.add_argument("--no-stream", action="store_true", help="Use /run instead of /stream")
+    args = p.parse_args()
+
+    prompts = [f"how did backtest {i} do?" for i in range(args.distinct)]
+    gate = asyncio.Semaphore(args.concurrency)
+    results = []
+
+    async with httpx.AsyncClient(timeout=120) as client:
+        async def task():
+            async with gate:
+                results.append(await one(client, args.url, random.choice(prompts), not args.no_stream))
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(task() for _ in range(args.requests)))
+        wall = time.perf_counter() - t0
+        stats = (await client.get(f"{args.url}/healthz")).json()
+
+    ok = [r for r in results if r[0]]
+    ttfb = [r[1] for r in ok]
+    total = [r[2] for r in ok]
+    print(f"✅ {len(ok)}/{len(results)} ok in {wall:.2f}s → {len(ok) / wall:.1f} req/s")
+    print(f"⏱️  first byte p50 {pct(ttfb, 50) * 1000:.0f} ms  p95 {pct(ttfb, 95) * 1000:.0f} ms")
+    print(f"⏱️  complete   p50 {pct(total, 50) * 1000:.0f} ms  p95 {pct(total, 95) * 1000:.0f} ms  "
+          f"mean {statistics.mean(total) * 1000 if total else 0:.0f} ms")
+    print("📊", json.dumps(stats))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,69 @@
+# Offline stand-in for the chat completions API, for load-testing app.py
+# without a key or network:
+#
+#   uvicorn stub_llm:app --port 8090
+#   OPENAI_BASE_URL=http://localhost:8090/v1 OPENAI_API_KEY=stub uvicorn app:app --port 8080
+#   python bench.py --url http://localhost:8080
+#
+# Replies echo the prompt word by word, after STUB_LATENCY_S of "thinking"
+# and STUB_TOKEN_DELAY_S per token, streamed or not as requested.
+import asyncio
+import json
+import os
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+LATENCY     = float(os.getenv("STUB_LATENCY_S", 0.5))
+TOKEN_DELAY = float(os.getenv("STUB_TOKEN_DELAY_S", 0.02))
+
+app = FastAPI()
+calls = {"n": 0}
+
+
+def reply_tokens(prompt):
+    words = f"Stub reply to: {prompt}".split()
+    return [w if i == 0 else " " + w for i, w in enumerate(words)]
+
+
+def chunk(cid, model, content=None, finish=None):
+    delta = {"content": content} if content is not None else {}
+    return {"id": cid, "object": "chat.completion.chunk", "created": int(time.time()),
+            "model": model, "choices": [{"index": 0, "delta": delta, "finish_reason": finish}]}
+
+
+@app.post("/v1/chat/completions")
+async def completions(request: Request):
+    body = await request.json()
+    calls["n"] += 1
+    model = body.get("model", "stub")
+    prompt = body["messages"][-1]["content"]
+    tokens = reply_tokens(prompt)
+    cid = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+    await asyncio.sleep(LATENCY)
+
+    if not body.get("stream"):
+        await asyncio.sleep(TOKEN_DELAY * len(tokens))
+        return {
+            "id": cid, "object": "chat.completion", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": "".join(tokens)}}],
+            "usage": {"prompt_tokens": len(prompt.split()), "completion_tokens": len(tokens),
+                      "total_tokens": len(prompt.split()) + len(tokens)},
+        }
+
+    async def events():
+        for t in tokens:
+            yield f"data: {json.dumps(chunk(cid, model, t))}\n\n"
+            await asyncio.sleep(TOKEN_DELAY)
+        yield f"data: {json.dumps(chunk(cid, model, finish='stop'))}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.get("/calls")
+def calls_made():
+    return calls
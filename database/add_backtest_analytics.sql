@@ -0,0 +1,14 @@
+-- add_backtest_analytics.sql
+-- Columns filled in by engine-wrapper/backtest_analytics.py next to the
+-- win_rate / net_profit the dashboards already chart. Ratios are NULL when a
+-- batch has too few closed trades to define them.
+ALTER TABLE backtests ADD COLUMN IF NOT EXISTS trades         integer;
+ALTER TABLE backtests ADD COLUMN IF NOT EXISTS closed_trades  integer;
+ALTER TABLE backtests ADD COLUMN IF NOT EXISTS max_drawdown   numeric;
+ALTER TABLE backtests ADD COLUMN IF NOT EXISTS sharpe         double precision;
+ALTER TABLE backtests ADD COLUMN IF NOT EXISTS sortino        double precision;
+ALTER TABLE backtests ADD COLUMN IF NOT EXISTS profit_factor  double precision;
+ALTER TABLE backtests ADD COLUMN IF NOT EXISTS exposure_pct   double precision;
+ALTER TABLE backtests ADD COLUMN IF NOT EXISTS avg_hold_s     double precision;
+ALTER TABLE backtests ADD COLUMN IF NOT EXISTS per_symbol     jsonb;
+ALTER TABLE backtests ADD COLUMN IF NOT EXISTS computed_at    timestamptz;
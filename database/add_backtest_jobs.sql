@@ -0,0 +1,38 @@
+-- add_backtest_jobs.sql
+-- Persistent queue of backtest runs submitted from the dashboards. Workers
+-- (engine-wrapper/backtest_jobs.py worker) claim the highest-priority,
+-- oldest queued job with FOR UPDATE SKIP LOCKED and heartbeat while it runs;
+-- a running job whose heartbeat stops is re-queued, up to max_attempts.
+CREATE TABLE IF NOT EXISTS backtest_jobs (
+    job_id        bigserial     PRIMARY KEY,
+    status        text          NOT NULL DEFAULT 'queued'
+                                CHECK (status IN ('queued', 'running', 'done', 'failed', 'cancelled')),
+    priority      integer       NOT NULL DEFAULT 0,
+    submitted_by  text          NOT NULL,
+    tradeplan     text          NOT NULL,
+    symbols       text          NOT NULL,
+    start_date    date          NOT NULL,
+    end_date      date          NOT NULL,
+    batch_id      text          NOT NULL,
+    options       jsonb         NOT NULL DEFAULT '{}',
+    attempts      integer       NOT NULL DEFAULT 0,
+    max_attempts  integer       NOT NULL DEFAULT 2,
+    worker        text,
+    submitted_at  timestamptz   NOT NULL DEFAULT now(),
+    started_at    timestamptz,
+    heartbeat_at  timestamptz,
+    finished_at   timestamptz,
+    returncode    integer,
+    result        jsonb
+);
+
+CREATE INDEX IF NOT EXISTS backtest_jobs_queue_idx
+    ON backtest_jobs (priority DESC, job_id)
+    WHERE status = 'queued';
+
+CREATE INDEX IF NOT EXISTS backtest_jobs_running_idx
+    ON backtest_jobs (heartbeat_at)
+    WHERE status = 'running';
+
+CREATE INDEX IF NOT EXISTS backtest_jobs_submitted_idx
+    ON backtest_jobs (submitted_at);
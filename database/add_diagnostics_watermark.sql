@@ -0,0 +1,29 @@
+-- add_diagnostics_watermark.sql
+-- Bumped once per DELETE statement on algo_run/trades. Incremental
+-- diagnostics (engine-wrapper/diagnostics.py) only look at rows newer than
+-- their last snapshot, so any delete since then forces a full rebuild.
+-- Sequences ignore rollbacks, which at worst costs an unneeded rebuild.
+CREATE SEQUENCE IF NOT EXISTS batch_delete_seq;
+
+CREATE OR REPLACE FUNCTION bump_batch_delete_seq()
+    RETURNS TRIGGER
+    LANGUAGE PLPGSQL
+    AS
+$$
+BEGIN
+    PERFORM nextval('batch_delete_seq');
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS algo_run_delete_seq ON algo_run;
+CREATE TRIGGER algo_run_delete_seq
+    AFTER DELETE
+    ON algo_run
+    FOR EACH STATEMENT EXECUTE PROCEDURE bump_batch_delete_seq();
+
+DROP TRIGGER IF EXISTS trades_delete_seq ON trades;
+CREATE TRIGGER trades_delete_seq
+    AFTER DELETE
+    ON trades
+    FOR EACH STATEMENT EXECUTE PROCEDURE bump_batch_delete_seq();
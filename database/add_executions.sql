@@ -0,0 +1,80 @@
+-- add_executions.sql
+-- Read model for the live UIs: one row per buy or sell event on `trades`,
+-- kept in sync by triggers so dashboards never have to UNION ALL the whole
+-- trades heap. execution_id is the feed watermark, ts is the display order.
+CREATE TABLE IF NOT EXISTS executions (
+    execution_id bigserial     PRIMARY KEY,
+    trade_id     integer       NOT NULL,
+    algo_run_id  integer,
+    symbol       text          NOT NULL,
+    side         text          NOT NULL CHECK (side IN ('buy', 'sell')),
+    qty          integer       NOT NULL,
+    price        decimal(8, 2),
+    ts           timestamp     NOT NULL,
+    UNIQUE (trade_id, side)
+);
+
+CREATE INDEX IF NOT EXISTS executions_ts_idx ON executions(ts);
+
+CREATE OR REPLACE FUNCTION trades_to_executions()
+    RETURNS TRIGGER
+    LANGUAGE PLPGSQL
+    AS
+$$
+BEGIN
+    IF NEW.buy_time IS NOT NULL AND (TG_OP = 'INSERT' OR OLD.buy_time IS NULL) THEN
+        INSERT INTO executions (trade_id, algo_run_id, symbol, side, qty, price, ts)
+        VALUES (NEW.trade_id, NEW.algo_run_id, NEW.symbol, 'buy', NEW.qty, NEW.buy_price, NEW.buy_time)
+        ON CONFLICT (trade_id, side) DO NOTHING;
+    END IF;
+
+    IF NEW.sell_time IS NOT NULL AND (TG_OP = 'INSERT' OR OLD.sell_time IS NULL) THEN
+        INSERT INTO executions (trade_id, algo_run_id, symbol, side, qty, price, ts)
+        VALUES (NEW.trade_id, NEW.algo_run_id, NEW.symbol, 'sell', NEW.qty, NEW.sell_price, NEW.sell_time)
+        ON CONFLICT (trade_id, side) DO NOTHING;
+    END IF;
+
+    RETURN NEW;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION trades_delete_executions()
+    RETURNS TRIGGER
+    LANGUAGE PLPGSQL
+    AS
+$$
+BEGIN
+    DELETE FROM executions e
+     USING gone g
+     WHERE e.trade_id = g.trade_id;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trades_executions_ins ON trades;
+CREATE TRIGGER trades_executions_ins
+    AFTER INSERT OR UPDATE OF buy_time, sell_time
+    ON trades
+    FOR EACH ROW EXECUTE PROCEDURE trades_to_executions();
+
+DROP TRIGGER IF EXISTS trades_executions_del ON trades;
+CREATE TRIGGER trades_executions_del
+    AFTER DELETE
+    ON trades
+    REFERENCING OLD TABLE AS gone
+    FOR EACH STATEMENT EXECUTE PROCEDURE trades_delete_executions();
+
+-- backfill existing history, oldest first so execution_id follows time
+INSERT INTO executions (trade_id, algo_run_id, symbol, side, qty, price, ts)
+SELECT trade_id, algo_run_id, symbol, side, qty, price, ts
+  FROM (
+    SELECT trade_id, algo_run_id, symbol, 'buy' AS side, qty, buy_price AS price, buy_time AS ts
+      FROM trades
+     WHERE buy_time IS NOT NULL
+    UNION ALL
+    SELECT trade_id, algo_run_id, symbol, 'sell' AS side, qty, sell_price AS price, sell_time AS ts
+      FROM trades
+     WHERE sell_time IS NOT NULL
+  ) ev
+ ORDER BY ts
+ON CONFLICT (trade_id, side) DO NOTHING;
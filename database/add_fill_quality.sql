@@ -0,0 +1,28 @@
+-- add_fill_quality.sql
+-- Backtest-vs-live fill comparisons computed by engine-wrapper/fill_quality.py,
+-- one row per (live run, backtest run) pair. A row is reused as long as
+-- neither run has new fills (the last new_trades.trade_id and fill count of
+-- each run are stored with it) and it was matched with the same tolerance.
+CREATE TABLE IF NOT EXISTS fill_quality (
+    live_run_id        integer          NOT NULL REFERENCES algo_run(algo_run_id) ON DELETE CASCADE,
+    backtest_run_id    integer          NOT NULL REFERENCES algo_run(algo_run_id) ON DELETE CASCADE,
+    tolerance_s        double precision NOT NULL,
+    live_fills         integer          NOT NULL,
+    backtest_fills     integer          NOT NULL,
+    live_last_id       bigint,
+    backtest_last_id   bigint,
+    matched            integer          NOT NULL,
+    missed             integer          NOT NULL,     -- backtest fills with no live fill
+    extra              integer          NOT NULL,     -- live fills with no backtest fill
+    slippage_bps_p50   double precision,
+    slippage_bps_p95   double precision,
+    slippage_cost      numeric,
+    latency_s_p50      double precision,
+    latency_s_p95      double precision,
+    summary            jsonb            NOT NULL,
+    per_symbol         jsonb,
+    computed_at        timestamptz      NOT NULL DEFAULT now(),
+    PRIMARY KEY (live_run_id, backtest_run_id)
+);
+
+CREATE INDEX IF NOT EXISTS fill_quality_backtest_idx ON fill_quality (backtest_run_id);
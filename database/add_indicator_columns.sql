@@ -0,0 +1,80 @@
+-- add_indicator_columns.sql
+-- Typed copies of frequently queried indicator keys. The JSONB documents
+-- (trades.buy_indicators / sell_indicators, new_trades.indicators,
+-- stock_ohlc.indicators) stay as they are. engine-wrapper/indicators.py
+-- promotes a key: it becomes a typed, indexed column of the source's side
+-- table below, gets filled in batches, and is kept current by a row trigger
+-- that indicators.py generates for the promoted keys. Side tables are keyed
+-- like their source row. Deleting source rows deletes their side rows;
+-- partition_maint.py does it by hand for dropped partitions.
+CREATE TABLE IF NOT EXISTS indicator_columns (
+    source        text        NOT NULL,     -- e.g. 'trades.buy_indicators'
+    key           text        NOT NULL,     -- JSON key, or dotted path
+    column_name   text        NOT NULL,
+    kind          text        NOT NULL CHECK (kind IN ('numeric', 'text', 'boolean')),
+    backfilled_to bigint      NOT NULL DEFAULT 0,   -- source ids ≤ this are done
+    backfill_end  bigint,                           -- max id at promotion; NULL once done
+    promoted_at   timestamptz NOT NULL DEFAULT now(),
+    PRIMARY KEY (source, key),
+    UNIQUE (source, column_name)
+);
+
+CREATE TABLE IF NOT EXISTS trade_buy_indicators  (trade_id  integer PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS trade_sell_indicators (trade_id  integer PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS new_trade_indicators  (trade_id  integer PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS stock_ohlc_indicators (symbol_id integer PRIMARY KEY);
+
+CREATE OR REPLACE FUNCTION trades_delete_indicators()
+    RETURNS TRIGGER
+    LANGUAGE PLPGSQL
+    AS
+$$
+BEGIN
+    DELETE FROM trade_buy_indicators i USING gone g WHERE i.trade_id = g.trade_id;
+    DELETE FROM trade_sell_indicators i USING gone g WHERE i.trade_id = g.trade_id;
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION new_trades_delete_indicators()
+    RETURNS TRIGGER
+    LANGUAGE PLPGSQL
+    AS
+$$
+BEGIN
+    DELETE FROM new_trade_indicators i USING gone g WHERE i.trade_id = g.trade_id;
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION stock_ohlc_delete_indicators()
+    RETURNS TRIGGER
+    LANGUAGE PLPGSQL
+    AS
+$$
+BEGIN
+    DELETE FROM stock_ohlc_indicators i USING gone g WHERE i.symbol_id = g.symbol_id;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trades_indicators_del ON trades;
+CREATE TRIGGER trades_indicators_del
+    AFTER DELETE
+    ON trades
+    REFERENCING OLD TABLE AS gone
+    FOR EACH STATEMENT EXECUTE PROCEDURE trades_delete_indicators();
+
+DROP TRIGGER IF EXISTS new_trades_indicators_del ON new_trades;
+CREATE TRIGGER new_trades_indicators_del
+    AFTER DELETE
+    ON new_trades
+    REFERENCING OLD TABLE AS gone
+    FOR EACH STATEMENT EXECUTE PROCEDURE new_trades_delete_indicators();
+
+DROP TRIGGER IF EXISTS stock_ohlc_indicators_del ON stock_ohlc;
+CREATE TRIGGER stock_ohlc_indicators_del
+    AFTER DELETE
+    ON stock_ohlc
+    REFERENCING OLD TABLE AS gone
+    FOR EACH STATEMENT EXECUTE PROCEDURE stock_ohlc_delete_indicators();
@@ -0,0 +1,33 @@
+-- add_trade_notify.sql
+-- Wake up the live UIs when fills land. One NOTIFY per statement (and
+-- Postgres folds identical payloads within a transaction), so bulk inserts
+-- from a backtest arrive as a single event rather than a storm.
+CREATE OR REPLACE FUNCTION notify_trade_change()
+    RETURNS TRIGGER
+    LANGUAGE PLPGSQL
+    AS
+$$
+BEGIN
+    PERFORM pg_notify(
+        'trade_changes',
+        json_build_object(
+            'table',  TG_TABLE_NAME,
+            'op',     TG_OP,
+            'tstamp', extract(epoch FROM now())
+        )::text
+    );
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trades_notify ON trades;
+CREATE TRIGGER trades_notify
+    AFTER INSERT OR UPDATE
+    ON trades
+    FOR EACH STATEMENT EXECUTE PROCEDURE notify_trade_change();
+
+DROP TRIGGER IF EXISTS new_trades_notify ON new_trades;
+CREATE TRIGGER new_trades_notify
+    AFTER INSERT OR UPDATE
+    ON new_trades
+    FOR EACH STATEMENT EXECUTE PROCEDURE notify_trade_change();
@@ -0,0 +1,233 @@
+-- add_trades_partitioning.sql
+-- Range-partition trades by buy_time and new_trades by tstamp, one
+-- partition per month. The existing heap is attached as-is (no rewrite) as
+-- the partition for everything up to the end of its newest month; a DEFAULT
+-- partition catches rows no monthly partition covers yet, and
+-- maintain_trade_partitions() (run by engine-wrapper/partition_maint.py)
+-- moves them into monthly partitions and creates the months ahead.
+-- Detaching/dropping a partition fires no DELETE triggers, so the archival
+-- job cleans up executions and bumps batch_delete_seq itself.
+BEGIN;
+
+CREATE OR REPLACE FUNCTION partition_trade_table(parent text, part_key text)
+    RETURNS void
+    LANGUAGE PLPGSQL
+    AS
+$$
+DECLARE
+    cutover timestamp := date_trunc('month', now());
+    newest  timestamp;
+    legacy  text      := parent || '_legacy';
+    idx     text;
+    missing bigint;
+    sample  integer[];
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = parent::regclass) = 'p' THEN
+        RETURN;
+    END IF;
+    -- the primary key has to include the partition key, which can't be NULL;
+    -- rows without one are reported, not guessed at
+    EXECUTE format('SELECT COUNT(*), (array_agg(trade_id ORDER BY trade_id))[1:20] '
+                   'FROM %I WHERE %I IS NULL', parent, part_key) INTO missing, sample;
+    IF missing > 0 THEN
+        RAISE EXCEPTION '% rows of % have no %', missing, parent, part_key
+            USING DETAIL = format('trade_id %s', array_to_string(sample, ', ')),
+                  HINT   = format('Set %s on those rows (or delete them) and run this migration again.', part_key);
+    END IF;
+    -- the legacy partition ends at the month after its newest row
+    EXECUTE format('SELECT MAX(%I) FROM %I', part_key, parent) INTO newest;
+    cutover := GREATEST(cutover, date_trunc('month', newest) + interval '1 month');
+
+    EXECUTE format('ALTER TABLE %I RENAME TO %I', parent, legacy);
+    -- free the index names (trades_pkey, trades_symbol_idx, …) for the parent
+    FOR idx IN SELECT c.relname
+                 FROM pg_index i
+                 JOIN pg_class c ON c.oid = i.indexrelid
+                WHERE i.indrelid = legacy::regclass
+                  AND c.relname LIKE parent || '\_%'
+    LOOP
+        EXECUTE format('ALTER INDEX %I RENAME TO %I', idx, legacy || substr(idx, length(parent) + 1));
+    END LOOP;
+    EXECUTE format('ALTER TABLE %I ALTER COLUMN %I SET NOT NULL', legacy, part_key);
+    EXECUTE format('CREATE UNIQUE INDEX %I ON %I (trade_id, %I)', legacy || '_pk', legacy, part_key);
+    EXECUTE format('ALTER TABLE %I DROP CONSTRAINT %I', legacy, legacy || '_pkey');
+    EXECUTE format('ALTER TABLE %I ADD CONSTRAINT %I PRIMARY KEY USING INDEX %I',
+                   legacy, legacy || '_pkey', legacy || '_pk');
+
+    EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+                   'PARTITION BY RANGE (%I)', parent, legacy, part_key);
+    EXECUTE format('ALTER TABLE %I ADD PRIMARY KEY (trade_id, %I)', parent, part_key);
+    EXECUTE format('ALTER TABLE %I ADD FOREIGN KEY (algo_run_id) REFERENCES algo_run(algo_run_id)', parent);
+    EXECUTE format('ALTER SEQUENCE %I OWNED BY %I.trade_id', parent || '_trade_id_seq', parent);
+
+    -- the CHECK lets ATTACH skip its own validation scan
+    EXECUTE format('ALTER TABLE %I ADD CONSTRAINT %I CHECK (%I < %L)',
+                   legacy, legacy || '_range', part_key, cutover);
+    EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (MINVALUE) TO (%L)',
+                   parent, legacy, cutover);
+    EXECUTE format('ALTER TABLE %I DROP CONSTRAINT %I', legacy, legacy || '_range');
+    EXECUTE format('CREATE TABLE %I PARTITION OF %I DEFAULT', parent || '_default', parent);
+END;
+$$;
+
+-- Give one month of `parent` its own partition, moving any rows for it out
+-- of the DEFAULT partition (or the detached table `source`) first. Months
+-- already covered (e.g. by the legacy partition) are left alone.
+DROP FUNCTION IF EXISTS trade_partition_for(text, timestamp);
+CREATE OR REPLACE FUNCTION trade_partition_for(parent text, month timestamp, source text DEFAULT NULL)
+    RETURNS text
+    LANGUAGE PLPGSQL
+    AS
+$$
+DECLARE
+    lo       timestamp := date_trunc('month', month);
+    hi       timestamp := date_trunc('month', month) + interval '1 month';
+    name     text      := parent || '_p' || to_char(month, 'YYYYMM');
+    part_key text      := substring(pg_get_partkeydef(parent::regclass) FROM '\((.*)\)');
+BEGIN
+    IF to_regclass(name) IS NOT NULL THEN
+        RETURN name;
+    END IF;
+    BEGIN
+        EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', name, parent);
+        EXECUTE format('ALTER TABLE %I ADD CONSTRAINT %I CHECK (%I >= %L AND %I < %L)',
+                       name, name || '_range', part_key, lo, part_key, hi);
+        -- plain DELETE/INSERT on the partitions: the parent's statement
+        -- triggers (executions, notify, delete counter) don't fire for a move
+        EXECUTE format('WITH moved AS (DELETE FROM %I WHERE %I >= %L AND %I < %L RETURNING *) '
+                       'INSERT INTO %I SELECT * FROM moved',
+                       COALESCE(source, parent || '_default'), part_key, lo, part_key, hi, name);
+        EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                       parent, name, lo, hi);
+        EXECUTE format('ALTER TABLE %I DROP CONSTRAINT %I', name, name || '_range');
+    EXCEPTION WHEN invalid_object_definition THEN
+        -- overlaps an existing partition
+        RETURN NULL;
+    END;
+    RETURN name;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION maintain_trade_partitions(parent text, months_ahead int DEFAULT 3)
+    RETURNS SETOF text
+    LANGUAGE PLPGSQL
+    AS
+$$
+DECLARE
+    part_key text := substring(pg_get_partkeydef(parent::regclass) FROM '\((.*)\)');
+    m        timestamp;
+BEGIN
+    FOR m IN EXECUTE format('SELECT DISTINCT date_trunc(''month'', %I) FROM %I',
+                            part_key, parent || '_default')
+    LOOP
+        RETURN NEXT trade_partition_for(parent, m);
+    END LOOP;
+    FOR m IN SELECT generate_series(date_trunc('month', now()),
+                                    date_trunc('month', now()) + make_interval(months => months_ahead),
+                                    interval '1 month')
+    LOOP
+        RETURN NEXT trade_partition_for(parent, m);
+    END LOOP;
+END;
+$$;
+
+-- Move the oldest `months` months of the legacy partition into monthly
+-- partitions, so pre-migration history can be archived like any other
+-- month instead of staying in one partition that never ages out. The
+-- legacy partition shrinks from below and is dropped once empty. Each call
+-- holds an exclusive lock on `parent` while it moves the rows and rescans
+-- what is left of the legacy partition, so split a few months at a time.
+CREATE OR REPLACE FUNCTION split_legacy_partition(parent text, months int DEFAULT 1)
+    RETURNS SETOF text
+    LANGUAGE PLPGSQL
+    AS
+$$
+DECLARE
+    legacy   text := parent || '_legacy';
+    part_key text := substring(pg_get_partkeydef(parent::regclass) FROM '\((.*)\)');
+    upper    timestamp;
+    lo       timestamp;
+    hi       timestamp;
+    m        timestamp;
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_inherits
+                    WHERE inhparent = parent::regclass AND inhrelid = to_regclass(legacy)) THEN
+        RETURN;
+    END IF;
+    EXECUTE format('LOCK TABLE %I IN ACCESS EXCLUSIVE MODE', parent);
+    upper := substring(pg_get_expr((SELECT relpartbound FROM pg_class WHERE oid = legacy::regclass),
+                                   legacy::regclass)
+                       FROM 'TO \(''([^'']+)''\)')::timestamp;
+    EXECUTE format('SELECT date_trunc(''month'', MIN(%I)) FROM %I', part_key, legacy) INTO lo;
+    hi := LEAST(COALESCE(lo, upper) + make_interval(months => months), upper);
+
+    EXECUTE format('ALTER TABLE %I DETACH PARTITION %I', parent, legacy);
+    IF lo IS NOT NULL THEN
+        FOR m IN SELECT generate_series(lo, hi - interval '1 month', interval '1 month')
+        LOOP
+            RETURN NEXT trade_partition_for(parent, m, legacy);
+        END LOOP;
+    END IF;
+    IF hi >= upper THEN
+        EXECUTE format('DROP TABLE %I', legacy);
+        RETURN;
+    END IF;
+    -- as in partition_trade_table: the CHECK is the validation scan
+    EXECUTE format('ALTER TABLE %I ADD CONSTRAINT %I CHECK (%I >= %L AND %I < %L)',
+                   legacy, legacy || '_range', part_key, hi, part_key, upper);
+    EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                   parent, legacy, hi, upper);
+    EXECUTE format('ALTER TABLE %I DROP CONSTRAINT %I', legacy, legacy || '_range');
+END;
+$$;
+
+-- the old triggers belong to the heap that becomes the legacy partition
+DROP TRIGGER IF EXISTS trades_executions_ins ON trades;
+DROP TRIGGER IF EXISTS trades_executions_del ON trades;
+DROP TRIGGER IF EXISTS trades_notify ON trades;
+DROP TRIGGER IF EXISTS trades_delete_seq ON trades;
+DROP TRIGGER IF EXISTS new_trades_notify ON new_trades;
+
+SELECT partition_trade_table('trades', 'buy_time');
+SELECT partition_trade_table('new_trades', 'tstamp');
+
+CREATE INDEX IF NOT EXISTS trades_symbol_idx ON trades(symbol);
+CREATE INDEX IF NOT EXISTS trades_algo_run_id_idx ON trades(algo_run_id);
+CREATE INDEX IF NOT EXISTS trades_is_win_idx ON trades(is_win);
+CREATE INDEX IF NOT EXISTS new_trades_symbol_idx ON new_trades(symbol);
+CREATE INDEX IF NOT EXISTS new_trades_algo_run_id_idx ON new_trades(algo_run_id);
+
+-- rows arrive roughly in time order, so block ranges stay tight
+CREATE INDEX IF NOT EXISTS trades_buy_time_brin ON trades USING brin (buy_time);
+CREATE INDEX IF NOT EXISTS new_trades_tstamp_brin ON new_trades USING brin (tstamp);
+
+SELECT maintain_trade_partitions('trades');
+SELECT maintain_trade_partitions('new_trades');
+
+CREATE TRIGGER trades_executions_ins
+    AFTER INSERT OR UPDATE OF buy_time, sell_time
+    ON trades
+    FOR EACH ROW EXECUTE PROCEDURE trades_to_executions();
+
+CREATE TRIGGER trades_executions_del
+    AFTER DELETE
+    ON trades
+    REFERENCING OLD TABLE AS gone
+    FOR EACH STATEMENT EXECUTE PROCEDURE trades_delete_executions();
+
+CREATE TRIGGER trades_notify
+    AFTER INSERT OR UPDATE
+    ON trades
+    FOR EACH STATEMENT EXECUTE PROCEDURE notify_trade_change();
+
+CREATE TRIGGER trades_delete_seq
+    AFTER DELETE
+    ON trades
+    FOR EACH STATEMENT EXECUTE PROCEDURE bump_batch_delete_seq();
+
+CREATE TRIGGER new_trades_notify
+    AFTER INSERT OR UPDATE
+    ON new_trades
+    FOR EACH STATEMENT EXECUTE PROCEDURE notify_trade_change();
+
+COMMIT;
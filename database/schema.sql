@@ -402,3 +402,538 @@ CREATE TABLE IF NOT EXISTS backtests (
     win_rate   DOUBLE PRECISION NOT NULL,
     net_profit NUMERIC     NOT NULL
 );
+
+-- Read model for the live UIs: one row per buy or sell event on `trades`,
+-- kept in sync by triggers so dashboards never have to UNION ALL the whole
+-- trades heap. execution_id is the feed watermark, ts is the display order.
+CREATE TABLE IF NOT EXISTS executions (
+    execution_id bigserial     PRIMARY KEY,
+    trade_id     integer       NOT NULL,
+    algo_run_id  integer,
+    symbol       text          NOT NULL,
+    side         text          NOT NULL CHECK (side IN ('buy', 'sell')),
+    qty          integer       NOT NULL,
+    price        decimal(8, 2),
+    ts           timestamp     NOT NULL,
+    UNIQUE (trade_id, side)
+);
+
+CREATE INDEX IF NOT EXISTS executions_ts_idx ON executions(ts);
+
+CREATE OR REPLACE FUNCTION trades_to_executions()
+    RETURNS TRIGGER
+    LANGUAGE PLPGSQL
+    AS
+$$
+BEGIN
+    IF NEW.buy_time IS NOT NULL AND (TG_OP = 'INSERT' OR OLD.buy_time IS NULL) THEN
+        INSERT INTO executions (trade_id, algo_run_id, symbol, side, qty, price, ts)
+        VALUES (NEW.trade_id, NEW.algo_run_id, NEW.symbol, 'buy', NEW.qty, NEW.buy_price, NEW.buy_time)
+        ON CONFLICT (trade_id, side) DO NOTHING;
+    END IF;
+
+    IF NEW.sell_time IS NOT NULL AND (TG_OP = 'INSERT' OR OLD.sell_time IS NULL) THEN
+        INSERT INTO executions (trade_id, algo_run_id, symbol, side, qty, price, ts)
+        VALUES (NEW.trade_id, NEW.algo_run_id, NEW.symbol, 'sell', NEW.qty, NEW.sell_price, NEW.sell_time)
+        ON CONFLICT (trade_id, side) DO NOTHING;
+    END IF;
+
+    RETURN NEW;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION trades_delete_executions()
+    RETURNS TRIGGER
+    LANGUAGE PLPGSQL
+    AS
+$$
+BEGIN
+    DELETE FROM executions e
+     USING gone g
+     WHERE e.trade_id = g.trade_id;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trades_executions_ins ON trades;
+CREATE TRIGGER trades_executions_ins
+    AFTER INSERT OR UPDATE OF buy_time, sell_time
+    ON trades
+    FOR EACH ROW EXECUTE PROCEDURE trades_to_executions();
+
+DROP TRIGGER IF EXISTS trades_executions_del ON trades;
+CREATE TRIGGER trades_executions_del
+    AFTER DELETE
+    ON trades
+    REFERENCING OLD TABLE AS gone
+    FOR EACH STATEMENT EXECUTE PROCEDURE trades_delete_executions();
+
+-- backfill existing history, oldest first so execution_id follows time
+INSERT INTO executions (trade_id, algo_run_id, symbol, side, qty, price, ts)
+SELECT trade_id, algo_run_id, symbol, side, qty, price, ts
+  FROM (
+    SELECT trade_id, algo_run_id, symbol, 'buy' AS side, qty, buy_price AS price, buy_time AS ts
+      FROM trades
+     WHERE buy_time IS NOT NULL
+    UNION ALL
+    SELECT trade_id, algo_run_id, symbol, 'sell' AS side, qty, sell_price AS price, sell_time AS ts
+      FROM trades
+     WHERE sell_time IS NOT NULL
+  ) ev
+ ORDER BY ts
+ON CONFLICT (trade_id, side) DO NOTHING;
+
+-- Wake up the live UIs when fills land. One NOTIFY per statement (and
+-- Postgres folds identical payloads within a transaction), so bulk inserts
+-- from a backtest arrive as a single event rather than a storm.
+CREATE OR REPLACE FUNCTION notify_trade_change()
+    RETURNS TRIGGER
+    LANGUAGE PLPGSQL
+    AS
+$$
+BEGIN
+    PERFORM pg_notify(
+        'trade_changes',
+        json_build_object(
+            'table',  TG_TABLE_NAME,
+            'op',     TG_OP,
+            'tstamp', extract(epoch FROM now())
+        )::text
+    );
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trades_notify ON trades;
+CREATE TRIGGER trades_notify
+    AFTER INSERT OR UPDATE
+    ON trades
+    FOR EACH STATEMENT EXECUTE PROCEDURE notify_trade_change();
+
+DROP TRIGGER IF EXISTS new_trades_notify ON new_trades;
+CREATE TRIGGER new_trades_notify
+    AFTER INSERT OR UPDATE
+    ON new_trades
+    FOR EACH STATEMENT EXECUTE PROCEDURE notify_trade_change();
+
+-- Bumped once per DELETE statement on algo_run/trades. Incremental
+-- diagnostics (engine-wrapper/diagnostics.py) only look at rows newer than
+-- their last snapshot, so any delete since then forces a full rebuild.
+-- Sequences ignore rollbacks, which at worst costs an unneeded rebuild.
+CREATE SEQUENCE IF NOT EXISTS batch_delete_seq;
+
+CREATE OR REPLACE FUNCTION bump_batch_delete_seq()
+    RETURNS TRIGGER
+    LANGUAGE PLPGSQL
+    AS
+$$
+BEGIN
+    PERFORM nextval('batch_delete_seq');
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS algo_run_delete_seq ON algo_run;
+CREATE TRIGGER algo_run_delete_seq
+    AFTER DELETE
+    ON algo_run
+    FOR EACH STATEMENT EXECUTE PROCEDURE bump_batch_delete_seq();
+
+DROP TRIGGER IF EXISTS trades_delete_seq ON trades;
+CREATE TRIGGER trades_delete_seq
+    AFTER DELETE
+    ON trades
+    FOR EACH STATEMENT EXECUTE PROCEDURE bump_batch_delete_seq();
+
+-- Range-partition trades by buy_time and new_trades by tstamp, one
+-- partition per month. The existing heap is attached as-is (no rewrite) as
+-- the partition for everything up to the end of its newest month; a DEFAULT
+-- partition catches rows no monthly partition covers yet, and
+-- maintain_trade_partitions() (run by engine-wrapper/partition_maint.py)
+-- moves them into monthly partitions and creates the months ahead.
+-- Detaching/dropping a partition fires no DELETE triggers, so the archival
+-- job cleans up executions and bumps batch_delete_seq itself.
+BEGIN;
+
+CREATE OR REPLACE FUNCTION partition_trade_table(parent text, part_key text)
+    RETURNS void
+    LANGUAGE PLPGSQL
+    AS
+$$
+DECLARE
+    cutover timestamp := date_trunc('month', now());
+    newest  timestamp;
+    legacy  text      := parent || '_legacy';
+    idx     text;
+    missing bigint;
+    sample  integer[];
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = parent::regclass) = 'p' THEN
+        RETURN;
+    END IF;
+    -- the primary key has to include the partition key, which can't be NULL;
+    -- rows without one are reported, not guessed at
+    EXECUTE format('SELECT COUNT(*), (array_agg(trade_id ORDER BY trade_id))[1:20] '
+                   'FROM %I WHERE %I IS NULL', parent, part_key) INTO missing, sample;
+    IF missing > 0 THEN
+        RAISE EXCEPTION '% rows of % have no %', missing, parent, part_key
+            USING DETAIL = format('trade_id %s', array_to_string(sample, ', ')),
+                  HINT   = format('Set %s on those rows (or delete them) and run this migration again.', part_key);
+    END IF;
+    -- the legacy partition ends at the month after its newest row
+    EXECUTE format('SELECT MAX(%I) FROM %I', part_key, parent) INTO newest;
+    cutover := GREATEST(cutover, date_trunc('month', newest) + interval '1 month');
+
+    EXECUTE format('ALTER TABLE %I RENAME TO %I', parent, legacy);
+    -- free the index names (trades_pkey, trades_symbol_idx, …) for the parent
+    FOR idx IN SELECT c.relname
+                 FROM pg_index i
+                 JOIN pg_class c ON c.oid = i.indexrelid
+                WHERE i.indrelid = legacy::regclass
+                  AND c.relname LIKE parent || '\_%'
+    LOOP
+        EXECUTE format('ALTER INDEX %I RENAME TO %I', idx, legacy || substr(idx, length(parent) + 1));
+    END LOOP;
+    EXECUTE format('ALTER TABLE %I ALTER COLUMN %I SET NOT NULL', legacy, part_key);
+    EXECUTE format('CREATE UNIQUE INDEX %I ON %I (trade_id, %I)', legacy || '_pk', legacy, part_key);
+    EXECUTE format('ALTER TABLE %I DROP CONSTRAINT %I', legacy, legacy || '_pkey');
+    EXECUTE format('ALTER TABLE %I ADD CONSTRAINT %I PRIMARY KEY USING INDEX %I',
+                   legacy, legacy || '_pkey', legacy || '_pk');
+
+    EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+                   'PARTITION BY RANGE (%I)', parent, legacy, part_key);
+    EXECUTE format('ALTER TABLE %I ADD PRIMARY KEY (trade_id, %I)', parent, part_key);
+    EXECUTE format('ALTER TABLE %I ADD FOREIGN KEY (algo_run_id) REFERENCES algo_run(algo_run_id)', parent);
+    EXECUTE format('ALTER SEQUENCE %I OWNED BY %I.trade_id', parent || '_trade_id_seq', parent);
+
+    -- the CHECK lets ATTACH skip its own validation scan
+    EXECUTE format('ALTER TABLE %I ADD CONSTRAINT %I CHECK (%I < %L)',
+                   legacy, legacy || '_range', part_key, cutover);
+    EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (MINVALUE) TO (%L)',
+                   parent, legacy, cutover);
+    EXECUTE format('ALTER TABLE %I DROP CONSTRAINT %I', legacy, legacy || '_range');
+    EXECUTE format('CREATE TABLE %I PARTITION OF %I DEFAULT', parent || '_default', parent);
+END;
+$$;
+
+-- Give one month of `parent` its own partition, moving any rows for it out
+-- of the DEFAULT partition (or the detached table `source`) first. Months
+-- already covered (e.g. by the legacy partition) are left alone.
+DROP FUNCTION IF EXISTS trade_partition_for(text, timestamp);
+CREATE OR REPLACE FUNCTION trade_partition_for(parent text, month timestamp, source text DEFAULT NULL)
+    RETURNS text
+    LANGUAGE PLPGSQL
+    AS
+$$
+DECLARE
+    lo       timestamp := date_trunc('month', month);
+    hi       timestamp := date_trunc('month', month) + interval '1 month';
+    name     text      := parent || '_p' || to_char(month, 'YYYYMM');
+    part_key text      := substring(pg_get_partkeydef(parent::regclass) FROM '\((.*)\)');
+BEGIN
+    IF to_regclass(name) IS NOT NULL THEN
+        RETURN name;
+    END IF;
+    BEGIN
+        EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', name, parent);
+        EXECUTE format('ALTER TABLE %I ADD CONSTRAINT %I CHECK (%I >= %L AND %I < %L)',
+                       name, name || '_range', part_key, lo, part_key, hi);
+        -- plain DELETE/INSERT on the partitions: the parent's statement
+        -- triggers (executions, notify, delete counter) don't fire for a move
+        EXECUTE format('WITH moved AS (DELETE FROM %I WHERE %I >= %L AND %I < %L RETURNING *) '
+                       'INSERT INTO %I SELECT * FROM moved',
+                       COALESCE(source, parent || '_default'), part_key, lo, part_key, hi, name);
+        EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                       parent, name, lo, hi);
+        EXECUTE format('ALTER TABLE %I DROP CONSTRAINT %I', name, name || '_range');
+    EXCEPTION WHEN invalid_object_definition THEN
+        -- overlaps an existing partition
+        RETURN NULL;
+    END;
+    RETURN name;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION maintain_trade_partitions(parent text, months_ahead int DEFAULT 3)
+    RETURNS SETOF text
+    LANGUAGE PLPGSQL
+    AS
+$$
+DECLARE
+    part_key text := substring(pg_get_partkeydef(parent::regclass) FROM '\((.*)\)');
+    m        timestamp;
+BEGIN
+    FOR m IN EXECUTE format('SELECT DISTINCT date_trunc(''month'', %I) FROM %I',
+                            part_key, parent || '_default')
+    LOOP
+        RETURN NEXT trade_partition_for(parent, m);
+    END LOOP;
+    FOR m IN SELECT generate_series(date_trunc('month', now()),
+                                    date_trunc('month', now()) + make_interval(months => months_ahead),
+                                    interval '1 month')
+    LOOP
+        RETURN NEXT trade_partition_for(parent, m);
+    END LOOP;
+END;
+$$;
+
+-- Move the oldest `months` months of the legacy partition into monthly
+-- partitions, so pre-migration history can be archived like any other
+-- month instead of staying in one partition that never ages out. The
+-- legacy partition shrinks from below and is dropped once empty. Each call
+-- holds an exclusive lock on `parent` while it moves the rows and rescans
+-- what is left of the legacy partition, so split a few months at a time.
+CREATE OR REPLACE FUNCTION split_legacy_partition(parent text, months int DEFAULT 1)
+    RETURNS SETOF text
+    LANGUAGE PLPGSQL
+    AS
+$$
+DECLARE
+    legacy   text := parent || '_legacy';
+    part_key text := substring(pg_get_partkeydef(parent::regclass) FROM '\((.*)\)');
+    upper    timestamp;
+    lo       timestamp;
+    hi       timestamp;
+    m        timestamp;
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_inherits
+                    WHERE inhparent = parent::regclass AND inhrelid = to_regclass(legacy)) THEN
+        RETURN;
+    END IF;
+    EXECUTE format('LOCK TABLE %I IN ACCESS EXCLUSIVE MODE', parent);
+    upper := substring(pg_get_expr((SELECT relpartbound FROM pg_class WHERE oid = legacy::regclass),
+                                   legacy::regclass)
+                       FROM 'TO \(''([^'']+)''\)')::timestamp;
+    EXECUTE format('SELECT date_trunc(''month'', MIN(%I)) FROM %I', part_key, legacy) INTO lo;
+    hi := LEAST(COALESCE(lo, upper) + make_interval(months => months), upper);
+
+    EXECUTE format('ALTER TABLE %I DETACH PARTITION %I', parent, legacy);
+    IF lo IS NOT NULL THEN
+        FOR m IN SELECT generate_series(lo, hi - interval '1 month', interval '1 month')
+        LOOP
+            RETURN NEXT trade_partition_for(parent, m, legacy);
+        END LOOP;
+    END IF;
+    IF hi >= upper THEN
+        EXECUTE format('DROP TABLE %I', legacy);
+        RETURN;
+    END IF;
+    -- as in partition_trade_table: the CHECK is the validation scan
+    EXECUTE format('ALTER TABLE %I ADD CONSTRAINT %I CHECK (%I >= %L AND %I < %L)',
+                   legacy, legacy || '_range', part_key, hi, part_key, upper);
+    EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                   parent, legacy, hi, upper);
+    EXECUTE format('ALTER TABLE %I DROP CONSTRAINT %I', legacy, legacy || '_range');
+END;
+$$;
+
+-- the old triggers belong to the heap that becomes the legacy partition
+DROP TRIGGER IF EXISTS trades_executions_ins ON trades;
+DROP TRIGGER IF EXISTS trades_executions_del ON trades;
+DROP TRIGGER IF EXISTS trades_notify ON trades;
+DROP TRIGGER IF EXISTS trades_delete_seq ON trades;
+DROP TRIGGER IF EXISTS new_trades_notify ON new_trades;
+
+SELECT partition_trade_table('trades', 'buy_time');
+SELECT partition_trade_table('new_trades', 'tstamp');
+
+CREATE INDEX IF NOT EXISTS trades_symbol_idx ON trades(symbol);
+CREATE INDEX IF NOT EXISTS trades_algo_run_id_idx ON trades(algo_run_id);
+CREATE INDEX IF NOT EXISTS trades_is_win_idx ON trades(is_win);
+CREATE INDEX IF NOT EXISTS new_trades_symbol_idx ON new_trades(symbol);
+CREATE INDEX IF NOT EXISTS new_trades_algo_run_id_idx ON new_trades(algo_run_id);
+
+-- rows arrive roughly in time order, so block ranges stay tight
+CREATE INDEX IF NOT EXISTS trades_buy_time_brin ON trades USING brin (buy_time);
+CREATE INDEX IF NOT EXISTS new_trades_tstamp_brin ON new_trades USING brin (tstamp);
+
+SELECT maintain_trade_partitions('trades');
+SELECT maintain_trade_partitions('new_trades');
+
+CREATE TRIGGER trades_executions_ins
+    AFTER INSERT OR UPDATE OF buy_time, sell_time
+    ON trades
+    FOR EACH ROW EXECUTE PROCEDURE trades_to_executions();
+
+CREATE TRIGGER trades_executions_del
+    AFTER DELETE
+    ON trades
+    REFERENCING OLD TABLE AS gone
+    FOR EACH STATEMENT EXECUTE PROCEDURE trades_delete_executions();
+
+CREATE TRIGGER trades_notify
+    AFTER INSERT OR UPDATE
+    ON trades
+    FOR EACH STATEMENT EXECUTE PROCEDURE notify_trade_change();
+
+CREATE TRIGGER trades_delete_seq
+    AFTER DELETE
+    ON trades
+    FOR EACH STATEMENT EXECUTE PROCEDURE bump_batch_delete_seq();
+
+CREATE TRIGGER new_trades_notify
+    AFTER INSERT OR UPDATE
+    ON new_trades
+    FOR EACH STATEMENT EXECUTE PROCEDURE notify_trade_change();
+
+COMMIT;
+
+-- Persistent queue of backtest runs submitted from the dashboards. Workers
+-- (engine-wrapper/backtest_jobs.py worker) claim the highest-priority,
+-- oldest queued job with FOR UPDATE SKIP LOCKED and heartbeat while it runs;
+-- a running job whose heartbeat stops is re-queued, up to max_attempts.
+CREATE TABLE IF NOT EXISTS backtest_jobs (
+    job_id        bigserial     PRIMARY KEY,
+    status        text          NOT NULL DEFAULT 'queued'
+                                CHECK (status IN ('queued', 'running', 'done', 'failed', 'cancelled')),
+    priority      integer       NOT NULL DEFAULT 0,
+    submitted_by  text          NOT NULL,
+    tradeplan     text          NOT NULL,
+    symbols       text          NOT NULL,
+    start_date    date          NOT NULL,
+    end_date      date          NOT NULL,
+    batch_id      text          NOT NULL,
+    options       jsonb         NOT NULL DEFAULT '{}',
+    attempts      integer       NOT NULL DEFAULT 0,
+    max_attempts  integer       NOT NULL DEFAULT 2,
+    worker        text,
+    submitted_at  timestamptz   NOT NULL DEFAULT now(),
+    started_at    timestamptz,
+    heartbeat_at  timestamptz,
+    finished_at   timestamptz,
+    returncode    integer,
+    result        jsonb
+);
+
+CREATE INDEX IF NOT EXISTS backtest_jobs_queue_idx
+    ON backtest_jobs (priority DESC, job_id)
+    WHERE status = 'queued';
+
+CREATE INDEX IF NOT EXISTS backtest_jobs_running_idx
+    ON backtest_jobs (heartbeat_at)
+    WHERE status = 'running';
+
+CREATE INDEX IF NOT EXISTS backtest_jobs_submitted_idx
+    ON backtest_jobs (submitted_at);
+
+-- Columns filled in by engine-wrapper/backtest_analytics.py next to the
+-- win_rate / net_profit the dashboards already chart. Ratios are NULL when a
+-- batch has too few closed trades to define them.
+ALTER TABLE backtests ADD COLUMN IF NOT EXISTS trades         integer;
+ALTER TABLE backtests ADD COLUMN IF NOT EXISTS closed_trades  integer;
+ALTER TABLE backtests ADD COLUMN IF NOT EXISTS max_drawdown   numeric;
+ALTER TABLE backtests ADD COLUMN IF NOT EXISTS sharpe         double precision;
+ALTER TABLE backtests ADD COLUMN IF NOT EXISTS sortino        double precision;
+ALTER TABLE backtests ADD COLUMN IF NOT EXISTS profit_factor  double precision;
+ALTER TABLE backtests ADD COLUMN IF NOT EXISTS exposure_pct   double precision;
+ALTER TABLE backtests ADD COLUMN IF NOT EXISTS avg_hold_s     double precision;
+ALTER TABLE backtests ADD COLUMN IF NOT EXISTS per_symbol     jsonb;
+ALTER TABLE backtests ADD COLUMN IF NOT EXISTS computed_at    timestamptz;
+
+-- Typed copies of frequently queried indicator keys. The JSONB documents
+-- (trades.buy_indicators / sell_indicators, new_trades.indicators,
+-- stock_ohlc.indicators) stay as they are. engine-wrapper/indicators.py
+-- promotes a key: it becomes a typed, indexed column of the source's side
+-- table below, gets filled in batches, and is kept current by a row trigger
+-- that indicators.py generates for the promoted keys. Side tables are keyed
+-- like their source row. Deleting source rows deletes their side rows;
+-- partition_maint.py does it by hand for dropped partitions.
+CREATE TABLE IF NOT EXISTS indicator_columns (
+    source        text        NOT NULL,     -- e.g. 'trades.buy_indicators'
+    key           text        NOT NULL,     -- JSON key, or dotted path
+    column_name   text        NOT NULL,
+    kind          text        NOT NULL CHECK (kind IN ('numeric', 'text', 'boolean')),
+    backfilled_to bigint      NOT NULL DEFAULT 0,   -- source ids ≤ this are done
+    backfill_end  bigint,                           -- max id at promotion; NULL once done
+    promoted_at   timestamptz NOT NULL DEFAULT now(),
+    PRIMARY KEY (source, key),
+    UNIQUE (source, column_name)
+);
+
+CREATE TABLE IF NOT EXISTS trade_buy_indicators  (trade_id  integer PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS trade_sell_indicators (trade_id  integer PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS new_trade_indicators  (trade_id  integer PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS stock_ohlc_indicators (symbol_id integer PRIMARY KEY);
+
+CREATE OR REPLACE FUNCTION trades_delete_indicators()
+    RETURNS TRIGGER
+    LANGUAGE PLPGSQL
+    AS
+$$
+BEGIN
+    DELETE FROM trade_buy_indicators i USING gone g WHERE i.trade_id = g.trade_id;
+    DELETE FROM trade_sell_indicators i USING gone g WHERE i.trade_id = g.trade_id;
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION new_trades_delete_indicators()
+    RETURNS TRIGGER
+    LANGUAGE PLPGSQL
+    AS
+$$
+BEGIN
+    DELETE FROM new_trade_indicators i USING gone g WHERE i.trade_id = g.trade_id;
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION stock_ohlc_delete_indicators()
+    RETURNS TRIGGER
+    LANGUAGE PLPGSQL
+    AS
+$$
+BEGIN
+    DELETE FROM stock_ohlc_indicators i USING gone g WHERE i.symbol_id = g.symbol_id;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trades_indicators_del ON trades;
+CREATE TRIGGER trades_indicators_del
+    AFTER DELETE
+    ON trades
+    REFERENCING OLD TABLE AS gone
+    FOR EACH STATEMENT EXECUTE PROCEDURE trades_delete_indicators();
+
+DROP TRIGGER IF EXISTS new_trades_indicators_del ON new_trades;
+CREATE TRIGGER new_trades_indicators_del
+    AFTER DELETE
+    ON new_trades
+    REFERENCING OLD TABLE AS gone
+    FOR EACH STATEMENT EXECUTE PROCEDURE new_trades_delete_indicators();
+
+DROP TRIGGER IF EXISTS stock_ohlc_indicators_del ON stock_ohlc;
+CREATE TRIGGER stock_ohlc_indicators_del
+    AFTER DELETE
+    ON stock_ohlc
+    REFERENCING OLD TABLE AS gone
+    FOR EACH STATEMENT EXECUTE PROCEDURE stock_ohlc_delete_indicators();
+
+-- Backtest-vs-live fill comparisons computed by engine-wrapper/fill_quality.py,
+-- one row per (live run, backtest run) pair. A row is reused as long as
+-- neither run has new fills (the last new_trades.trade_id and fill count of
+-- each run are stored with it) and it was matched with the same tolerance.
+CREATE TABLE IF NOT EXISTS fill_quality (
+    live_run_id        integer          NOT NULL REFERENCES algo_run(algo_run_id) ON DELETE CASCADE,
+    backtest_run_id    integer          NOT NULL REFERENCES algo_run(algo_run_id) ON DELETE CASCADE,
+    tolerance_s        double precision NOT NULL,
+    live_fills         integer          NOT NULL,
+    backtest_fills     integer          NOT NULL,
+    live_last_id       bigint,
+    backtest_last_id   bigint,
+    matched            integer          NOT NULL,
+    missed             integer          NOT NULL,     -- backtest fills with no live fill
+    extra              integer          NOT NULL,     -- live fills with no backtest fill
+    slippage_bps_p50   double precision,
+    slippage_bps_p95   double precision,
+    slippage_cost      numeric,
+    latency_s_p50      double precision,
+    latency_s_p95      double precision,
+    summary            jsonb            NOT NULL,
+    per_symbol         jsonb,
+    computed_at        timestamptz      NOT NULL DEFAULT now(),
+    PRIMARY KEY (live_run_id, backtest_run_id)
+);
+
+CREATE INDEX IF NOT EXISTS fill_quality_backtest_idx ON fill_quality (backtest_run_id);
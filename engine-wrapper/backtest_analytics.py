@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+# Performance analytics for backtest batches, upserted into `backtests`
+# (database/add_backtests.sql + add_backtest_analytics.sql).
+#
+# All trades of the requested batches come out of Postgres in one COPY,
+# sorted by batch and close time, and every metric is computed over the
+# whole set at once: batches are contiguous segments of the arrays, so
+# per-batch sums are np.bincount over the batch index and running maxima
+# use an offset that keeps segments from seeing each other. There is no
+# Python loop per trade or per batch, only one per row written back.
+#
+# Definitions:
+#   win_rate       share of closed trades with is_win (P&L > 0 when NULL)
+#   net_profit     Σ (sell_price − buy_price) · qty over closed trades
+#   max_drawdown   deepest fall of cumulative P&L from its running peak
+#                  (starting at 0), in currency
+#   sharpe/sortino daily P&L over the batch's mean position notional,
+#                  annualised with √252, on days that closed a trade
+#   exposure_pct   time with at least one position open / first buy → last sell
+#   symbols        canonical tickers (symbol_renames.py): trades in VIAC and
+#                  PARA count as one instrument in per_symbol
+import os
+import io
+import sys
+import json
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+import symbol_renames
+
+TRADES_COPY = """
+    COPY (
+        SELECT ar.batch_id,
+               t.symbol,
+               t.qty,
+               t.buy_price,
+               t.sell_price,
+               t.is_win,
+               extract(epoch FROM t.buy_time)  AS buy_ts,
+               extract(epoch FROM t.sell_time) AS sell_ts
+          FROM trades t
+          JOIN algo_run ar ON ar.algo_run_id = t.algo_run_id
+         WHERE {where}
+         ORDER BY ar.batch_id, t.sell_time NULLS LAST, t.trade_id
+    ) TO STDOUT WITH (FORMAT csv, HEADER)
+"""
+
+UPSERT_SQL = """
+    INSERT INTO backtests
+           (batch_id, symbols, win_rate, net_profit, trades, closed_trades, max_drawdown,
+            sharpe, sortino, profit_factor, exposure_pct, avg_hold_s, per_symbol, computed_at)
+    VALUES %s
+    ON CONFLICT (batch_id) DO UPDATE
+       SET symbols       = EXCLUDED.symbols,
+           win_rate      = EXCLUDED.win_rate,
+           net_profit    = EXCLUDED.net_profit,
+           trades        = EXCLUDED.trades,
+           closed_trades = EXCLUDED.closed_trades,
+           max_drawdown  = EXCLUDED.max_drawdown,
+           sharpe        = EXCLUDED.sharpe,
+           sortino       = EXCLUDED.sortino,
+           profit_factor = EXCLUDED.profit_factor,
+           exposure_pct  = EXCLUDED.exposure_pct,
+           avg_hold_s    = EXCLUDED.avg_hold_s,
+           per_symbol    = EXCLUDED.per_symbol,
+           computed_at   = now()
+"""
+UPSERT_TEMPLATE = "(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, now())"
+
+DTYPES = {"batch_id": str, "symbol": str, "qty": "float64", "buy_price": "float64",
+          "sell_price": "float64", "is_win": str, "buy_ts": "float64", "sell_ts": "float64"}
+DAY_S = 86_400
+
+
+def load_trades(conn, batch_ids=None, since=None):
+    # one round trip, parsed column-wise by pandas' C reader
+    if batch_ids is not None:
+        where = "ar.batch_id = ANY(%(batches)s)"
+    elif since is not None:
+        where = "ar.start_time >= %(since)s"
+    else:
+        where = "ar.batch_id != ''"
+    with conn.cursor() as cur:
+        copy = cur.mogrify(TRADES_COPY.format(where=where),
+                           {"batches": list(batch_ids or []), "since": since}).decode()
+        buf = io.StringIO()
+        cur.copy_expert(copy, buf)
+    buf.seek(0)
+    # is_win stays text: "t", "f" or "" for NULL
+    df = pd.read_csv(buf, dtype=DTYPES, keep_default_na=False,
+                     na_values={c: [""] for c in ("sell_price", "sell_ts", "buy_ts")})
+    return {c: df[c].to_numpy() for c in df.columns}
+
+
+def _segments(keys):
+    # keys sorted: start offset of each run and the run index of every row
+    if len(keys) == 0:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+    change = np.empty(len(keys), dtype=bool)
+    change[0] = True
+    change[1:] = keys[1:] != keys[:-1]
+    return np.flatnonzero(change), np.cumsum(change) - 1
+
+
+def _segment_running_max(values, seg):
+    # np.maximum.accumulate restarted at every segment: lift each segment
+    # above everything before it, accumulate, and drop the lift again
+    if len(values) == 0:
+        return values
+    span = float(np.nanmax(values) - np.nanmin(values)) + 1.0
+    lift = seg * span
+    return np.maximum.accumulate(values + lift) - lift
+
+
+def _reduce(ufunc, values, starts, n):
+    out = np.zeros(n)
+    if len(values):
+        out[:] = ufunc.reduceat(values, starts)
+    return out
+
+
+def compute(cols, renames=None):
+    """Metrics for every batch in `cols` (as returned by load_trades)."""
+    batch = cols.get("batch_id", np.array([], dtype=object))
+    if len(batch) == 0:
+        return []
+    starts, seg = _segments(batch)
+    names = batch[starts]
+    n = len(starts)
+
+    qty, buy, sell = cols["qty"], cols["buy_price"], cols["sell_price"]
+    buy_ts, sell_ts = cols["buy_ts"], cols["sell_ts"]
+    closed = ~np.isnan(sell)
+    pnl = np.where(closed, (sell - buy) * qty, 0.0)
+    notional = buy * qty
+    is_win = cols["is_win"]
+    won = np.where(is_win != "", is_win == "t", pnl > 0) & closed
+
+    trades = np.bincount(seg, minlength=n)
+    n_closed = np.bincount(seg, weights=closed, minlength=n)
+    wins = np.bincount(seg, weights=won, minlength=n)
+    net = np.bincount(seg, weights=pnl, minlength=n)
+    gross_win = np.bincount(seg, weights=np.where(pnl > 0, pnl, 0.0), minlength=n)
+    gross_loss = -np.bincount(seg, weights=np.where(pnl < 0, pnl, 0.0), minlength=n)
+    hold = np.where(closed, sell_ts - buy_ts, 0.0)
+    hold_sum = np.bincount(seg, weights=np.nan_to_num(hold), minlength=n)
+    mean_notional = np.bincount(seg, weights=notional, minlength=n) / np.maximum(trades, 1)
+
+    # drawdown: rows are in close order within a batch (open trades last, 0 P&L)
+    equity = np.cumsum(pnl)
+    equity -= (equity - pnl)[starts][seg]
+    peak = np.maximum(_segment_running_max(equity, seg), 0.0)
+    max_dd = _reduce(np.maximum, peak - equity, starts, n)
+
+    # daily returns: P&L per (batch, close day) over the batch's mean notional
+    day = np.floor(sell_ts[closed] / DAY_S).astype(np.int64)
+    if len(day):
+        day -= day.min()
+        _, day_seg = np.unique(seg[closed] * (day.max() + 1) + day, return_inverse=True)
+    else:
+        day_seg = np.array([], dtype=np.int64)
+    n_days = day_seg.max() + 1 if len(day_seg) else 0
+    day_pnl = np.bincount(day_seg, weights=pnl[closed], minlength=n_days)
+    day_batch = np.zeros(n_days, dtype=np.int64)
+    day_batch[day_seg] = seg[closed]
+    ret = day_pnl / np.where(mean_notional[day_batch] > 0, mean_notional[day_batch], np.nan)
+    ret = np.nan_to_num(ret)
+    days = np.bincount(day_batch, minlength=n)
+    mu = np.bincount(day_batch, weights=ret, minlength=n) / np.maximum(days, 1)
+    var = np.bincount(day_batch, weights=(ret - mu[day_batch]) ** 2, minlength=n) / np.maximum(days - 1, 1)
+    down = np.bincount(day_batch, weights=np.minimum(ret, 0.0) ** 2, minlength=n) / np.maximum(days, 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sharpe = np.where((days > 1) & (var > 0), mu / np.sqrt(var) * np.sqrt(252), np.nan)
+        sortino = np.where((days > 1) & (down > 0), mu / np.sqrt(down) * np.sqrt(252), np.nan)
+        pf = np.where(gross_loss > 0, gross_win / gross_loss, np.nan)
+
+    # exposure: union of [buy, sell] per batch, in buy order
+    c_idx = np.flatnonzero(closed)
+    order = c_idx[np.lexsort((buy_ts[c_idx], seg[c_idx]))]
+    s, e, g = buy_ts[order], sell_ts[order], seg[order]
+    covered = np.zeros(n)
+    first_buy = np.full(n, np.nan)
+    last_sell = np.full(n, np.nan)
+    if len(order):
+        runmax = _segment_running_max(e, g)
+        prev = np.empty_like(runmax)
+        prev[0] = -np.inf
+        prev[1:] = runmax[:-1]
+        prev[np.diff(g, prepend=-1) != 0] = -np.inf     # first of each batch
+        covered = np.bincount(g, weights=np.maximum(e - np.maximum(s, prev), 0.0), minlength=n)
+        g_starts = np.flatnonzero(np.diff(g, prepend=-1))
+        first_buy[g[g_starts]] = s[g_starts]
+        last_sell[g[g_starts]] = np.maximum.reduceat(e, g_starts)
+    span = last_sell - first_buy
+    with np.errstate(divide="ignore", invalid="ignore"):
+        exposure = np.where(span > 0, covered / span, np.nan)
+
+    symbol = (renames or symbol_renames.default()).canonical_many(cols["symbol"])
+    per_symbol = _per_symbol(seg, symbol, closed, won, pnl, n)
+
+    out = []
+    for i in range(n):
+        out.append({
+            "batch_id":      names[i],
+            "symbols":       sorted(per_symbol[i]),
+            "trades":        int(trades[i]),
+            "closed_trades": int(n_closed[i]),
+            "win_rate":      float(wins[i] / n_closed[i]) if n_closed[i] else 0.0,
+            "net_profit":    round(float(net[i]), 2),
+            "max_drawdown":  round(float(max_dd[i]), 2),
+            "sharpe":        _num(sharpe[i]),
+            "sortino":       _num(sortino[i]),
+            "profit_factor": _num(pf[i]),
+            "exposure_pct":  _num(exposure[i]),
+            "avg_hold_s":    float(hold_sum[i] / n_closed[i]) if n_closed[i] else None,
+            "per_symbol":    per_symbol[i],
+        })
+    return out
+
+
+def _num(x):
+    return None if not np.isfinite(x) else round(float(x), 4)
+
+
+def _per_symbol(seg, symbol, closed, won, pnl, n):
+    syms, code = np.unique(symbol, return_inverse=True)
+    keys, inv = np.unique(seg * len(syms) + code.ravel(), return_inverse=True)
+    inv = inv.ravel()
+    k = len(keys)
+    cnt = np.bincount(inv, minlength=k)
+    cls = np.bincount(inv, weights=closed, minlength=k)
+    wns = np.bincount(inv, weights=won, minlength=k)
+    net = np.bincount(inv, weights=pnl, minlength=k)
+    out = [{} for _ in range(n)]
+    for j, key in enumerate(keys):
+        out[key // len(syms)][syms[key % len(syms)]] = {
+            "trades":     int(cnt[j]),
+            "win_rate":   round(float(wns[j] / cls[j]), 4) if cls[j] else 0.0,
+            "net_profit": round(float(net[j]), 2),
+        }
+    return out
+
+
+def empty_row(batch_id):
+    return {"batch_id": batch_id, "symbols": [], "trades": 0, "closed_trades": 0,
+            "win_rate": 0.0, "net_profit": 0.0, "max_drawdown": 0.0, "sharpe": None,
+            "sortino": None, "profit_factor": None, "exposure_pct": None,
+            "avg_hold_s": None, "per_symbol": {}}
+
+
+def upsert(conn, rows, page_size=1000):
+    from psycopg2.extras import execute_values
+    with conn.cursor() as cur:
+        execute_values(cur, UPSERT_SQL, [
+            (r["batch_id"], r["symbols"], r["win_rate"], r["net_profit"], r["trades"],
+             r["closed_trades"], r["max_drawdown"], r["sharpe"], r["sortino"],
+             r["profit_factor"], r["exposure_pct"], r["avg_hold_s"], json.dumps(r["per_symbol"]))
+            for r in rows
+        ], template=UPSERT_TEMPLATE, page_size=page_size)
+    conn.commit()
+
+
+def refresh(dsn, batch_ids=None, since=None, save=True):
+    """Compute (and by default upsert) metrics; returns {batch_id: row}.
+
+    Requested batches without any trades still get a zero row, so a run
+    that traded nothing shows up in `backtests` too.
+    """
+    from db_pool import connection
+    with connection(dsn) as conn:
+        rows = {r["batch_id"]: r for r in compute(load_trades(conn, batch_ids, since))}
+        for b in batch_ids or []:
+            rows.setdefault(b, empty_row(b))
+        if save and rows:
+            upsert(conn, list(rows.values()))
+    return rows
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Compute backtest performance metrics into `backtests`")
+    g = p.add_mutually_exclusive_group(required=True)
+    g.add_argument("--batch-id", action="append", help="Batch to score (repeatable)")
+    g.add_argument("--since", help="Every batch whose algo_run started on/after this date")
+    g.add_argument("--all", action="store_true", help="Every batch in algo_run")
+    p.add_argument("--dry-run", action="store_true", help="Print, don't write")
+    args = p.parse_args(argv)
+
+    dsn = os.getenv("DSN", "")
+    if not dsn:
+        print("❌ DSN not set", file=sys.stderr)
+        sys.exit(1)
+
+    t0 = time.perf_counter()
+    rows = refresh(dsn, args.batch_id, args.since, save=not args.dry_run)
+    elapsed = time.perf_counter() - t0
+    for r in sorted(rows.values(), key=lambda r: -r["net_profit"])[:20]:
+        print(f"{r['batch_id']:<32} {r['closed_trades']:>6} closed  win {r['win_rate']:>6.1%}  "
+              f"net {r['net_profit']:>12,.2f}  dd {r['max_drawdown']:>10,.2f}  "
+              f"sharpe {r['sharpe'] if r['sharpe'] is not None else '—':>8}")
+    verb = "computed" if args.dry_run else "upserted"
+    print(f"✅ {len(rows)} batches {verb} in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
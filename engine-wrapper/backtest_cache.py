@@ -0,0 +1,234 @@
+# Content-addressed cache of enhanced_backtest results.
+#
+# The key is a SHA-256 over the normalized tradeplan (parsed TOML, so
+# comments and whitespace don't matter), the contents of any strategy or
+# scanner files it references, the symbol set, the date range and the
+# installed liualgotrader version. A hit returns the stored output,
+# diagnostics, summary and trades of the run that produced it, without
+# starting a subprocess and without writing a new batch to the DB.
+#
+# Entries are single gzipped JSON files under BACKTEST_CACHE_DIR. Reads
+# touch the file's mtime, and writes evict the least recently used entries
+# until the cache fits BACKTEST_CACHE_MAX_MB.
+import gzip
+import hashlib
+import json
+import os
+import subprocess
+import tempfile
+import time
+from datetime import date, datetime
+from importlib import metadata
+from pathlib import Path
+
+import metrics
+
+CACHE_DIR    = os.getenv("BACKTEST_CACHE_DIR", "liu_samples/.backtest_cache")
+MAX_BYTES    = int(float(os.getenv("BACKTEST_CACHE_MAX_MB", 512)) * 1024 * 1024)
+OUTPUT_CHARS = 20_000   # stdout/stderr tail kept per entry
+
+TRADES_SQL = """
+    SELECT t.symbol, t.qty, t.buy_price, t.buy_time, t.sell_price, t.sell_time, t.is_win
+      FROM trades t
+      JOIN algo_run ar ON ar.algo_run_id = t.algo_run_id
+     WHERE ar.batch_id = %s
+     ORDER BY t.buy_time
+"""
+
+
+def engine_version():
+    try:
+        return metadata.version("liualgotrader")
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def normalize_tradeplan(path):
+    path = Path(path)
+    text = path.read_text()
+    import toml
+    try:
+        plan = toml.loads(text)
+    except Exception:
+        return {"raw": text}, []
+    # strategy/scanner code is part of what gets run, so hash it too
+    files = []
+    for section in ("strategies", "scanners"):
+        for entry in plan.get(section, []):
+            fn = entry.get("filename") if isinstance(entry, dict) else None
+            if fn and (path.parent / fn).exists():
+                files.append((fn, (path.parent / fn).read_bytes()))
+    return plan, files
+
+
+def cache_key(tradeplan, symbols, start_date, end_date):
+    plan, files = normalize_tradeplan(tradeplan)
+    h = hashlib.sha256()
+    h.update(json.dumps({
+        "plan":    plan,
+        "symbols": sorted({s.strip().upper() for s in symbols.split(",") if s.strip()}),
+        "start":   str(start_date),
+        "end":     str(end_date),
+        "engine":  engine_version(),
+    }, sort_keys=True, default=str).encode())
+    for fn, blob in sorted(files):
+        h.update(fn.encode())
+        h.update(hashlib.sha256(blob).digest())
+    return h.hexdigest()
+
+
+def cacheable(end_date):
+    # bars for today (or later) are still changing
+    return str(end_date) < date.today().isoformat()
+
+
+class BacktestCache:
+    def __init__(self, root=None, max_bytes=None):
+        self.root = Path(root or CACHE_DIR)
+        self.max_bytes = max_bytes if max_bytes is not None else MAX_BYTES
+
+    def _path(self, key):
+        return self.root / key[:2] / f"{key}.json.gz"
+
+    def get(self, key):
+        p = self._path(key)
+        try:
+            with gzip.open(p, "rt") as f:
+                entry = json.load(f)
+            os.utime(p)     # LRU bookkeeping
+            return entry
+        except (FileNotFoundError, ValueError, OSError):
+            return None
+
+    def put(self, key, entry):
+        p = self._path(key)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=p.parent, prefix=".tmp-")
+        try:
+            with gzip.open(os.fdopen(fd, "wb"), "wt") as f:
+                json.dump(entry, f, default=str)
+            os.replace(tmp, p)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        self.evict()
+
+    def entries(self):
+        out = []
+        for p in self.root.glob("*/*.json.gz"):
+            try:
+                st = p.stat()
+            except FileNotFoundError:
+                continue    # evicted by another process
+            out.append((st.st_mtime, st.st_size, p))
+        return sorted(out)
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, p in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                p.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def stats(self):
+        entries = self.entries()
+        return {"entries": len(entries),
+                "bytes": sum(size for _, size, _ in entries),
+                "max_bytes": self.max_bytes}
+
+
+def fetch_trades(batch_id):
+    dsn = os.getenv("DSN", "")
+    if not dsn or not batch_id:
+        return None
+    from db_pool import connection
+    with connection(dsn) as conn, conn.cursor() as cur:
+        cur.execute(TRADES_SQL, (batch_id,))
+        cols = [c.name for c in cur.description]
+        return [dict(zip(cols, r)) for r in cur.fetchall()]
+
+
+def summarize(trades):
+    if trades is None:
+        return None
+    closed = [t for t in trades if t["sell_price"] is not None]
+    wins = sum(1 for t in closed if t["is_win"])
+    return {
+        "trades":     len(trades),
+        "win_rate":   wins / len(closed) if closed else 0.0,
+        "net_profit": float(sum((t["sell_price"] - t["buy_price"]) * t["qty"] for t in closed)),
+    }
+
+
+def run(tool, cmd, *, tradeplan, symbols, start_date, end_date, batch_id,
+        diagnostics=None, bypass=False, cache=None, **kwargs):
+    """metrics.run_backtest() behind the result cache.
+
+    Returns a CompletedProcess with an extra `cache` attribute: the entry
+    (with "hit": True/False) or None when the run was not cacheable. On a hit
+    the stored diagnostics are written to `diagnostics` so callers that read
+    that file behave as if the backtest had just run.
+    """
+    cache = cache or BacktestCache()
+    key = None
+    if cacheable(end_date):
+        try:
+            key = cache_key(tradeplan, symbols, start_date, end_date)
+        except OSError:
+            key = None
+
+    if key and not bypass:
+        entry = cache.get(key)
+        if entry is not None:
+            if diagnostics:
+                dg = Path(diagnostics)
+                if entry.get("diagnostics") is not None:
+                    dg.write_text(json.dumps(entry["diagnostics"], indent=2))
+                elif dg.exists():
+                    dg.unlink()     # the cached run wrote none; don't leave a stale one
+            proc = subprocess.CompletedProcess(cmd, 0, entry["stdout"], entry["stderr"])
+            proc.cache = {**entry, "hit": True}
+            proc.log_dir, proc.log_index = None, entry.get("log_index")
+            metrics.record_cache(tool, hit=True)
+            return proc
+
+    kwargs.setdefault("log_name", batch_id)
+    t0 = time.monotonic()
+    proc = metrics.run_backtest(tool, cmd, **kwargs)
+    duration_s = round(time.monotonic() - t0, 3)
+    proc.cache = None
+    if key:
+        metrics.record_cache(tool, hit=False)
+    if key and proc.returncode == 0:
+        diag = None
+        if diagnostics and Path(diagnostics).exists():
+            try:
+                diag = json.loads(Path(diagnostics).read_text())
+            except ValueError:
+                pass
+        try:
+            trades = fetch_trades(batch_id)
+        except Exception as e:
+            print(f"⚠️ Could not read trades for cache: {e}")
+            trades = None
+        entry = {
+            "key":         key,
+            "batch_id":    batch_id,
+            "created":     datetime.utcnow().isoformat(),
+            "engine":      engine_version(),
+            "duration_s":  duration_s,
+            "stdout":      (proc.stdout or "")[-OUTPUT_CHARS:],
+            "stderr":      (proc.stderr or "")[-OUTPUT_CHARS:],
+            "diagnostics": diag,
+            "log_index":   getattr(proc, "log_index", None),
+            "summary":     summarize(trades),
+            "trades":      trades,
+        }
+        cache.put(key, entry)
+        proc.cache = {**entry, "hit": False}
+    return proc
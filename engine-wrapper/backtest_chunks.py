@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+# Checkpointed, resumable backtests over long date ranges.
+#
+# The range is split into chunks of N trading days (weekdays; a holiday
+# just makes a chunk a day lighter). Each chunk is its own enhanced_backtest
+# run, written under the sub-batch `<batch_id>-cNN` and cached like any
+# other run (backtest_cache.py). When a chunk finishes, its result and the
+# portfolio it ended with (realized P&L, positions still open) go to a
+# checkpoint file, BACKTEST_CHECKPOINT_DIR/<batch_id>.json, replaced
+# atomically.
+#
+# Run the same batch again after a crash or a container restart and it
+# resumes: finished chunks are skipped, and whatever an unfinished chunk
+# wrote to the DB is deleted (dedupe_batches.dedupe(purge=True)) before
+# that chunk runs again, so no partial algo_run rows are left behind as
+# duplicates.
+#
+# The engine starts every run flat, so chunks don't hand state to each
+# other. The checkpoint carries the portfolio forward instead: realized P&L
+# accumulates chunk by chunk in date order. A position a chunk ends with is
+# lost to the next chunk, which starts without it, so it is marked to market
+# at the chunk's last day (the bar store's close, else the last price the
+# chunk traded it at) and that unrealized P&L is added to net_profit. Such a
+# summary says `approximate`: an unchunked run would have held the position
+# and closed it at some other price. Intraday strategies end each day flat
+# and split exactly; for others, pick chunks long enough that the few
+# boundary positions don't matter.
+#
+# Chunks run one at a time by default. With `workers` > 1 up to that many
+# run at once: each is a full backtest with its own memory and data
+# downloads, so it buys wall time with CPU, memory and data-source load. The
+# results are the same either way.
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+import backtest_cache
+
+CHECKPOINT_DIR = os.getenv("BACKTEST_CHECKPOINT_DIR", "liu_samples/.checkpoints")
+CHUNK_DAYS     = int(os.getenv("BACKTEST_CHUNK_DAYS", 20))
+
+
+def trading_days(start_date, end_date):
+    days = np.arange(np.datetime64(str(start_date)[:10]),
+                     np.datetime64(str(end_date)[:10]) + 1, dtype="datetime64[D]")
+    return days[np.is_busday(days)]
+
+
+def split(start_date, end_date, days=CHUNK_DAYS):
+    """[(start, end), …] ISO dates, `days` trading days per chunk."""
+    td = trading_days(start_date, end_date)
+    days = max(1, int(days))
+    return [(str(c[0]), str(c[-1])) for c in (td[i:i + days] for i in range(0, len(td), days))]
+
+
+def chunk_batch(batch_id, idx):
+    return f"{batch_id}-c{idx:02d}"
+
+
+def chunk_diagnostics_path(diagnostics, idx):
+    dg = Path(diagnostics)
+    return str(dg.with_name(f"{dg.stem}.c{idx:02d}{dg.suffix}"))
+
+
+def portfolio(trades):
+    """What a chunk ended with: trade counts, realized P&L, open positions."""
+    trades = trades or []
+    closed = [t for t in trades if t.get("sell_price") is not None]
+    # the last price each symbol traded at, to mark what is still open
+    last = {}
+    for t in sorted(trades, key=lambda t: str(t.get("sell_time") or t["buy_time"])):
+        last[t["symbol"]] = float(t["sell_price"] if t.get("sell_price") is not None
+                                  else t["buy_price"])
+    return {
+        "trades":       len(trades),
+        "closed":       len(closed),
+        "realized_pnl": round(float(sum((float(t["sell_price"]) - float(t["buy_price"])) * t["qty"]
+                                        for t in closed)), 2),
+        "open":         [{"symbol": t["symbol"], "qty": t["qty"], "buy_price": float(t["buy_price"]),
+                          "buy_time": str(t["buy_time"]), "last_price": last[t["symbol"]]}
+                         for t in trades if t.get("sell_price") is None],
+    }
+
+
+def mark(positions, end, store=None):
+    """Unrealized P&L of `positions` held at the close of `end`: the bar
+    store's last close up to that day, else the last price the chunk traded
+    the symbol at. Returns (pnl, positions with their mark and its source)."""
+    from bar_store import BarStore
+    store = store or BarStore()
+    day = np.datetime64(str(end)[:10])
+    pnl, marked = 0.0, []
+    for o in positions:
+        try:
+            bars = store.read_lineage(o["symbol"], str(day - 14), f"{day}T23:59:59", columns=["close"])
+        except Exception:
+            bars = None
+        if bars is not None and len(bars):
+            price, source = float(bars["close"].iloc[-1]), "bars"
+        else:
+            price, source = o.get("last_price", o["buy_price"]), "last_fill"
+        pnl += (price - o["buy_price"]) * o["qty"]
+        marked.append({**o, "mark": price, "mark_source": source})
+    return round(pnl, 2), marked
+
+
+# ————— checkpoint file —————
+class Checkpoint:
+    """Progress of one chunked batch, saved after every change."""
+
+    def __init__(self, batch_id, root=None):
+        self.path  = Path(root or CHECKPOINT_DIR) / f"{batch_id}.json"
+        self.data  = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        try:
+            self.data = json.loads(self.path.read_text())
+        except (FileNotFoundError, ValueError):
+            self.data = None
+        return self.data
+
+    def start(self, params, chunks, restart=False):
+        """Resume the saved run if it was made with the same `params`.
+
+        Raises ValueError when a checkpoint exists for different params
+        (another tradeplan, symbol set or range) unless restart is set.
+        """
+        saved = None if restart else self.load()
+        if saved is not None and saved["params"] != params:
+            raise ValueError(f"{self.path} was written for {saved['params']}; "
+                             f"rerun with a new batch id or restart it")
+        if saved is None:
+            self.data = {
+                "params":  params,
+                "created": datetime.utcnow().isoformat(),
+                "chunks":  [{"chunk": i, "batch_id": chunk_batch(params["batch_id"], i),
+                             "start": s, "end": e, "status": "pending"}
+                            for i, (s, e) in enumerate(chunks)],
+            }
+            self.save()
+        return self.data
+
+    def update(self, idx, **fields):
+        with self._lock:
+            self.data["chunks"][idx].update(fields)
+            self.data["updated"] = datetime.utcnow().isoformat()
+            self.save()
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(self.data, f, indent=2, default=str)
+            os.replace(tmp, self.path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def remove(self):
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+# ————— running —————
+def purge_partial(dsn, batch_ids):
+    # rows an interrupted chunk already wrote; it is about to run again
+    if not dsn or not batch_ids:
+        return 0
+    import dedupe_batches
+    done = dedupe_batches.dedupe(dsn, list(batch_ids), purge=True)
+    if done["runs"]:
+        print(f"🗑️ Removed {done['runs']} partial run(s), {done['trades']:,} trades "
+              f"of unfinished chunks")
+    return done["runs"]
+
+
+def run_chunk(tool, ckpt, chunk, cmd_for, *, tradeplan, symbols, diagnostics, bypass, **kwargs):
+    idx, sub_batch = chunk["chunk"], chunk["batch_id"]
+    dg = chunk_diagnostics_path(diagnostics, idx) if diagnostics else None
+    cmd = cmd_for(chunk["start"], chunk["end"], sub_batch, dg)
+    print(f"🚀 [chunk {idx:02d}] {chunk['start']} → {chunk['end']} → {sub_batch}")
+    ckpt.update(idx, status="running", started_at=datetime.utcnow().isoformat())
+    t0 = time.monotonic()
+    try:
+        proc = backtest_cache.run(
+            tool, cmd, tradeplan=tradeplan, symbols=symbols,
+            start_date=chunk["start"], end_date=chunk["end"],
+            batch_id=sub_batch, diagnostics=dg, bypass=bypass, **kwargs,
+        )
+    except Exception as e:
+        ckpt.update(idx, status="failed", error=f"could not launch backtest: {e}")
+        return -1, None
+    duration = round(time.monotonic() - t0, 3)
+    if proc.returncode != 0:
+        ckpt.update(idx, status="failed", returncode=proc.returncode, duration_s=duration,
+                    error=(proc.stderr or "")[-2000:])
+        return proc.returncode, proc
+    cache = proc.cache or {}
+    trades = cache.get("trades")
+    if trades is None:
+        try:
+            trades = backtest_cache.fetch_trades(sub_batch)
+        except Exception as e:
+            print(f"⚠️ [chunk {idx:02d}] could not read trades: {e}", file=sys.stderr)
+    issues = []
+    if dg and Path(dg).exists():
+        try:
+            issues = json.loads(Path(dg).read_text()).get("issues", [])
+        except ValueError:
+            pass
+    ckpt.update(idx, status="done", returncode=0, duration_s=duration,
+                cached=bool(cache.get("hit")), issues=issues,
+                finished_at=datetime.utcnow().isoformat(),
+                portfolio=portfolio(trades) if trades is not None else None)
+    return 0, proc
+
+
+def merge(ckpt, wall_s):
+    """One summary for the whole batch from its chunks, in date order."""
+    chunks, issues = ckpt.data["chunks"], []
+    realized, unrealized, carried = 0.0, 0.0, None
+    for n, c in enumerate(chunks):
+        issues += [f"[{c['batch_id']}] {i}" for i in c.get("issues", [])]
+        pf = c.get("portfolio")
+        c.pop("carried_in", None)
+        c.pop("unrealized_pnl", None)
+        if carried:
+            c["carried_in"] = carried
+            held = ", ".join(f"{o['qty']} {o['symbol']} @ {o['mark']:.2f} ({o['mark_source']})"
+                             for o in carried)
+            issues.append(f"[{c['batch_id']}] started flat, but the previous chunk ended holding "
+                          f"{held}; counted as unrealized P&L")
+        carried = None
+        if pf is not None:
+            realized += pf["realized_pnl"]
+            # the last chunk's open positions would be open after an unchunked run too
+            if pf["open"] and n < len(chunks) - 1:
+                pnl, carried = mark(pf["open"], c["end"])
+                unrealized += pnl
+                c["unrealized_pnl"] = pnl
+            c["cumulative_pnl"] = round(realized + unrealized, 2)
+    last = chunks[-1].get("portfolio") if chunks else None
+    known = [c["portfolio"]["trades"] for c in chunks if c.get("portfolio")]
+    chunk_s = sum(c.get("duration_s", 0) for c in chunks)
+    p = ckpt.data["params"]
+    return {
+        "batch_id":       p["batch_id"],
+        "chunk_days":     p["chunk_days"],
+        "issues":         issues,
+        "trade_count":    sum(known) if len(known) == len(chunks) else None,
+        "realized_pnl":   round(realized, 2),
+        "unrealized_pnl": round(unrealized, 2),
+        "net_profit":     round(realized + unrealized, 2),
+        "approximate":    any(c.get("carried_in") for c in chunks),
+        "open_at_end":    last["open"] if last else [],
+        "chunks":         chunks,
+        "wall_s":         round(wall_s, 3),
+        "chunk_s":        round(chunk_s, 3),
+        "checkpoint":     str(ckpt.path),
+        "timestamp":      datetime.utcnow().isoformat(),
+    }
+
+
+def run(tool, cmd_for, *, tradeplan, symbols, start_date, end_date, batch_id,
+        chunk_days=CHUNK_DAYS, workers=1, diagnostics=None, bypass=False,
+        restart=False, dsn=None, **kwargs):
+    """Run [start_date, end_date] in chunks, resuming from the checkpoint.
+
+    cmd_for(start, end, sub_batch, diagnostics) builds one chunk's command.
+    Returns (summary, returncode): the first non-zero chunk exit code, or 0
+    when every chunk is done. Failed chunks stay in the checkpoint for the
+    next attempt.
+    """
+    dsn = dsn if dsn is not None else os.getenv("DSN", "")
+    chunks = split(start_date, end_date, chunk_days)
+    params = {"batch_id": batch_id, "tradeplan": str(tradeplan), "symbols": symbols,
+              "start_date": str(start_date)[:10], "end_date": str(end_date)[:10],
+              "chunk_days": int(chunk_days)}
+    ckpt = Checkpoint(batch_id)
+    data = ckpt.start(params, chunks, restart)
+    todo = [c for c in data["chunks"] if c["status"] != "done"]
+    done = len(data["chunks"]) - len(todo)
+    print(f"🧩 {len(data['chunks'])} chunk(s) of {params['chunk_days']} trading days"
+          + (f", resuming after {done} done" if done else ""))
+
+    # a chunk that got as far as "running" may have left rows behind
+    purge_partial(dsn, [c["batch_id"] for c in todo if restart or c["status"] != "pending"])
+
+    t0 = time.monotonic()
+    if todo:
+        # each worker thread just waits on its own backtest subprocess
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(todo)))) as pool:
+            results = list(pool.map(
+                lambda c: run_chunk(tool, ckpt, c, cmd_for, tradeplan=tradeplan, symbols=symbols,
+                                    diagnostics=diagnostics, bypass=bypass, **kwargs),
+                todo))
+    else:
+        results = []
+    wall_s = time.monotonic() - t0
+
+    fresh = [c["batch_id"] for c, (rc, proc) in zip(todo, results)
+             if rc == 0 and not (proc.cache or {}).get("hit")]
+    summary = merge(ckpt, wall_s)
+    summary["ran"] = fresh
+    rc = next((rc for rc, _ in results if rc != 0), 0)
+    return summary, rc
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Show or clear backtest checkpoints")
+    p.add_argument("batch_id", nargs="?", help="Batch to show (default: list all)")
+    p.add_argument("--checkpoint-dir", default=CHECKPOINT_DIR)
+    p.add_argument("--clear", action="store_true",
+                   help="Delete the checkpoint, so the next run starts over")
+    args = p.parse_args(argv)
+
+    root = Path(args.checkpoint_dir)
+    if not args.batch_id:
+        for f in sorted(root.glob("*.json")):
+            data = json.loads(f.read_text())
+            chunks = data["chunks"]
+            done = sum(c["status"] == "done" for c in chunks)
+            print(f"{f.stem:<32} {data['params']['start_date']} → {data['params']['end_date']}  "
+                  f"{done}/{len(chunks)} chunks done  (updated {data.get('updated', data['created'])})")
+        return
+
+    ckpt = Checkpoint(args.batch_id, root)
+    if ckpt.load() is None:
+        print(f"❌ No checkpoint for {args.batch_id} in {root}", file=sys.stderr)
+        sys.exit(1)
+    if args.clear:
+        ckpt.remove()
+        print(f"🗑️ Cleared checkpoint for {args.batch_id}")
+        return
+    for c in ckpt.data["chunks"]:
+        pf = c.get("portfolio") or {}
+        print(f"{c['batch_id']:<36} {c['start']} → {c['end']}  {c['status']:<8}"
+              + (f"  {pf['trades']:>5} trades  pnl {pf['realized_pnl']:>10.2f}"
+                 f"  {len(pf['open'])} open" if pf else ""))
+    summary = merge(ckpt, 0)
+    print(f"📊 net {summary['net_profit']:.2f} = realized {summary['realized_pnl']:.2f}"
+          f" + unrealized {summary['unrealized_pnl']:.2f} on positions held across chunks"
+          + (" (approximate)" if summary["approximate"] else ""))
+
+
+if __name__ == "__main__":
+    main()
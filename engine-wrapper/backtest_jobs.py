@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+# Backtest job queue (database/add_backtest_jobs.sql).
+#
+# The dashboards submit() a job and poll get()/recent(); nothing long-running
+# happens inside a Streamlit script. `backtest_jobs.py worker --workers N`
+# runs N slots, each claiming one job at a time, so at most N backtests run
+# per worker process however many are queued. Runs go through
+# backtest_cache, so resubmitting an identical backtest is instant. A job
+# with the chunk_days option runs through backtest_chunks: when its worker
+# dies and the job is re-queued, the next attempt resumes from the last
+# finished chunk. A worker whose job was re-queued under it (its heartbeat
+# went missing for JOB_STALE_S) terminates the backtest and leaves the job's
+# row to whoever claimed it next.
+import os
+import sys
+import json
+import socket
+import argparse
+import threading
+import time
+from pathlib import Path
+
+import backtest_analytics
+import backtest_cache
+import backtest_logs
+import metrics
+from db_pool import connection
+
+POLL_S      = float(os.getenv("JOB_POLL_S", 2))
+HEARTBEAT_S = float(os.getenv("JOB_HEARTBEAT_S", 15))
+STALE_S     = float(os.getenv("JOB_STALE_S", 90))
+TAIL_CHARS  = 20_000
+
+PRIORITIES = {"low": -10, "normal": 0, "high": 10}
+
+JOB_COLUMNS = """
+    job_id, status, priority, submitted_by, tradeplan, symbols, start_date,
+    end_date, batch_id, options, attempts, worker, submitted_at, started_at,
+    finished_at, returncode, result
+"""
+
+CLAIM_SQL = f"""
+    UPDATE backtest_jobs
+       SET status       = 'running',
+           attempts     = attempts + 1,
+           worker       = %s,
+           started_at   = now(),
+           heartbeat_at = now()
+     WHERE job_id = (
+            SELECT job_id
+              FROM backtest_jobs
+             WHERE status = 'queued'
+             ORDER BY priority DESC, job_id
+             LIMIT 1
+               FOR UPDATE SKIP LOCKED
+           )
+    RETURNING {JOB_COLUMNS}
+"""
+
+# jobs whose worker died: back in the queue, or failed once out of attempts
+REQUEUE_SQL = """
+    UPDATE backtest_jobs
+       SET status      = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END,
+           finished_at = CASE WHEN attempts >= max_attempts THEN now() END,
+           result      = CASE WHEN attempts >= max_attempts
+                              THEN jsonb_build_object('error', 'worker ' || worker || ' stopped responding')
+                         END,
+           worker      = NULL
+     WHERE status = 'running'
+       AND heartbeat_at < now() - make_interval(secs => %s)
+    RETURNING job_id, status
+"""
+
+
+def _rows(cur):
+    cols = [c.name for c in cur.description]
+    return [dict(zip(cols, r)) for r in cur.fetchall()]
+
+
+# ————— Client side (dashboards) —————
+def submit(dsn, submitted_by, tradeplan, symbols, start_date, end_date, batch_id,
+           priority=0, **options):
+    # options: diagnostics, log_level, no_cache, chunk_days, chunk_workers
+    with connection(dsn) as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO backtest_jobs
+                   (submitted_by, tradeplan, symbols, start_date, end_date, batch_id, priority, options)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            RETURNING job_id
+            """,
+            (submitted_by, str(tradeplan), symbols, start_date, end_date, batch_id,
+             priority, json.dumps(options)),
+        )
+        return cur.fetchone()[0]
+
+
+def get(dsn, job_id):
+    with connection(dsn) as conn, conn.cursor() as cur:
+        cur.execute(f"SELECT {JOB_COLUMNS} FROM backtest_jobs WHERE job_id = %s", (job_id,))
+        rows = _rows(cur)
+    return rows[0] if rows else None
+
+
+def recent(dsn, n=20, submitted_by=None):
+    with connection(dsn) as conn, conn.cursor() as cur:
+        cur.execute(
+            f"""
+            SELECT {JOB_COLUMNS},
+                   CASE WHEN j.status = 'queued' THEN
+                       (SELECT COUNT(*) FROM backtest_jobs q
+                         WHERE q.status = 'queued'
+                           AND (q.priority, -q.job_id) > (j.priority, -j.job_id))
+                   END AS ahead
+              FROM backtest_jobs j
+             WHERE %(by)s::text IS NULL OR submitted_by = %(by)s
+             ORDER BY job_id DESC
+             LIMIT %(n)s
+            """,
+            {"by": submitted_by, "n": n},
+        )
+        return _rows(cur)
+
+
+def cancel(dsn, job_id):
+    # only queued jobs; a running backtest is left to finish
+    with connection(dsn) as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            UPDATE backtest_jobs
+               SET status = 'cancelled', finished_at = now()
+             WHERE job_id = %s AND status = 'queued'
+            """,
+            (job_id,),
+        )
+        return cur.rowcount == 1
+
+
+# ————— Worker side —————
+def backtest_cmd(job):
+    opts = job["options"] or {}
+    cmd = [
+        "python3", "-m", "liualgotrader.enhanced_backtest",
+        "--tradeplan",  job["tradeplan"],
+        "--symbols",    job["symbols"],
+        "--start-date", job["start_date"].isoformat(),
+        "--end-date",   job["end_date"].isoformat(),
+        "--batch-id",   job["batch_id"],
+    ]
+    if opts.get("diagnostics"):
+        cmd += ["--diagnostics", opts["diagnostics"]]
+    if opts.get("log_level"):
+        cmd += ["--log-level", opts["log_level"]]
+    return cmd
+
+
+def run_chunked(job, on_start=None):
+    import backtest_chunks
+    opts = job["options"] or {}
+
+    def cmd_for(start, end, sub_batch, dg):
+        return backtest_cmd({**job, "start_date": start, "end_date": end, "batch_id": sub_batch,
+                             "options": {**opts, "diagnostics": dg}})
+
+    try:
+        summary, rc = backtest_chunks.run(
+            f"worker:{job['submitted_by']}", cmd_for,
+            tradeplan=job["tradeplan"], symbols=job["symbols"],
+            start_date=job["start_date"], end_date=job["end_date"],
+            batch_id=job["batch_id"], chunk_days=opts["chunk_days"],
+            # each chunk is a backtest; a job normally holds one slot's worth
+            workers=int(opts.get("chunk_workers") or 1),
+            diagnostics=opts.get("diagnostics"), bypass=bool(opts.get("no_cache")),
+            capture_output=True, text=True, on_start=on_start,
+            cwd=str(Path(job["tradeplan"]).parent),
+        )
+    except Exception as e:
+        return -1, {"error": f"chunked backtest failed: {e}"}
+    failed = [c for c in summary["chunks"] if c["status"] == "failed"]
+    return rc, {
+        "chunks":      [{k: c.get(k) for k in ("batch_id", "start", "end", "status", "cached",
+                                                "duration_s", "cumulative_pnl", "unrealized_pnl")}
+                        for c in summary["chunks"]],
+        "stderr":      failed[0].get("error", "")[-TAIL_CHARS:] if failed else "",
+        "summary":     {"trades": summary["trade_count"], "net_profit": summary["net_profit"],
+                        "unrealized_pnl": summary["unrealized_pnl"],
+                        "approximate": summary["approximate"]},
+        "issues":      summary["issues"],
+        "checkpoint":  summary["checkpoint"],
+        "ran":         summary["ran"],
+    }
+
+
+def run_job(job, on_start=None):
+    # on_start(popen) sees each backtest subprocess the job starts
+    opts = job["options"] or {}
+    if opts.get("chunk_days"):
+        return run_chunked(job, on_start)
+    cmd = backtest_cmd(job)
+    try:
+        proc = backtest_cache.run(
+            f"worker:{job['submitted_by']}", cmd,
+            tradeplan=job["tradeplan"], symbols=job["symbols"],
+            start_date=job["start_date"], end_date=job["end_date"],
+            batch_id=job["batch_id"], diagnostics=opts.get("diagnostics"),
+            bypass=bool(opts.get("no_cache")),
+            capture_output=True, text=True, on_start=on_start,
+            cwd=str(Path(job["tradeplan"]).parent),
+        )
+    except Exception as e:
+        return -1, {"error": f"could not launch backtest: {e}", "cmd": cmd}
+    cache = proc.cache or {}
+    index = getattr(proc, "log_index", None)
+    return proc.returncode, {
+        "cmd":         cmd,
+        "stdout":      (proc.stdout or "")[-TAIL_CHARS:],
+        "stderr":      (proc.stderr or "")[-TAIL_CHARS:],
+        "cached":      bool(cache.get("hit")),
+        "cache_batch": cache.get("batch_id"),
+        "summary":     cache.get("summary"),
+        "log_dir":     getattr(proc, "log_dir", None),
+        "phases":      backtest_logs.phase_rows(index) if index else None,
+        "log_lines":   index.get("lines") if index else None,
+    }
+
+
+class Worker:
+    def __init__(self, dsn, slots):
+        self.dsn   = dsn
+        self.slots = slots
+        self.name  = f"{socket.gethostname()}:{os.getpid()}"
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self.procs = {}         # job_id → backtest subprocesses started for it
+        self.lost  = set()      # job_ids re-queued while running here
+
+    def claim(self):
+        with connection(self.dsn) as conn, conn.cursor() as cur:
+            cur.execute(CLAIM_SQL, (self.name,))
+            rows = _rows(cur)
+        return rows[0] if rows else None
+
+    def finish(self, job, returncode, result):
+        """Record the job's outcome; False when it is no longer ours to record."""
+        with connection(self.dsn) as conn, conn.cursor() as cur:
+            cur.execute(
+                """
+                UPDATE backtest_jobs
+                   SET status      = %s,
+                       returncode  = %s,
+                       result      = %s,
+                       finished_at = now()
+                 WHERE job_id = %s AND worker = %s
+                """,
+                ("done" if returncode == 0 else "failed", returncode,
+                 json.dumps(result, default=str), job["job_id"], self.name),
+            )
+            if cur.rowcount:
+                return True
+            # REQUEUE_SQL handed the job to someone else while it ran here;
+            # their run owns the row now
+            cur.execute("SELECT status, worker FROM backtest_jobs WHERE job_id = %s",
+                        (job["job_id"],))
+            status, worker = cur.fetchone() or (None, None)
+        print(f"⚠️ job {job['job_id']} was re-queued while running on {self.name} "
+              f"(now {status or 'deleted'}{f' on {worker}' if worker else ''}); "
+              f"result not recorded", file=sys.stderr)
+        return False
+
+    def track(self, job_id, proc):
+        # on_start hook: remember the subprocess, or stop it right away when
+        # the job was already taken from us
+        with self._lock:
+            self.procs.setdefault(job_id, []).append(proc)
+            lost = job_id in self.lost
+        if lost:
+            proc.terminate()
+
+    def release(self, job_ids):
+        # jobs no longer running under our name: stop their backtests
+        with self._lock:
+            self.lost |= set(job_ids)
+            procs = [p for j in job_ids for p in self.procs.get(j, ())]
+        for proc in procs:
+            if proc.poll() is None:
+                proc.terminate()
+
+    def slot(self, idx):
+        while not self._stop.is_set():
+            try:
+                job = self.claim()
+            except Exception as e:
+                print(f"⚠️ [slot {idx}] claim failed: {e}", file=sys.stderr)
+                job = None
+            if job is None:
+                self._stop.wait(POLL_S)
+                continue
+            print(f"🚀 [slot {idx}] job {job['job_id']} ({job['submitted_by']}, "
+                  f"prio {job['priority']}): {job['symbols']} {job['start_date']}→{job['end_date']}")
+            t0 = time.monotonic()
+            with self._lock:
+                self.procs[job["job_id"]] = []
+            rc, result = run_job(job, on_start=lambda proc: self.track(job["job_id"], proc))
+            with self._lock:
+                del self.procs[job["job_id"]]
+                lost = job["job_id"] in self.lost
+                self.lost.discard(job["job_id"])
+            result["duration_s"] = round(time.monotonic() - t0, 3)
+            if lost:
+                print(f"🛑 [slot {idx}] job {job['job_id']} was taken over by another worker; "
+                      f"its backtest was stopped", file=sys.stderr)
+                continue
+            if rc == 0 and "ran" in result:
+                try:
+                    rows = backtest_analytics.refresh(self.dsn, result["ran"]) if result["ran"] else {}
+                    result["analytics"] = {bid: {k: v for k, v in row.items() if k != "per_symbol"}
+                                           for bid, row in rows.items()}
+                except Exception as e:
+                    print(f"⚠️ [slot {idx}] analytics for {job['batch_id']} failed: {e}",
+                          file=sys.stderr)
+            elif rc == 0 and not result.get("cached"):
+                try:
+                    row = backtest_analytics.refresh(self.dsn, [job["batch_id"]])[job["batch_id"]]
+                    result["analytics"] = {k: v for k, v in row.items() if k != "per_symbol"}
+                except Exception as e:
+                    print(f"⚠️ [slot {idx}] analytics for {job['batch_id']} failed: {e}",
+                          file=sys.stderr)
+            try:
+                if not self.finish(job, rc, result):
+                    continue
+            except Exception as e:
+                # the heartbeat stops with us; the job will be re-queued
+                print(f"❌ [slot {idx}] could not record job {job['job_id']}: {e}", file=sys.stderr)
+            print(f"{'✅' if rc == 0 else '❌'} [slot {idx}] job {job['job_id']} exited {rc} "
+                  f"in {result['duration_s']}s")
+
+    def heartbeat(self):
+        while not self._stop.wait(HEARTBEAT_S):
+            try:
+                with connection(self.dsn) as conn, conn.cursor() as cur:
+                    cur.execute(
+                        "UPDATE backtest_jobs SET heartbeat_at = now() "
+                        "WHERE status = 'running' AND worker = %s RETURNING job_id",
+                        (self.name,),
+                    )
+                    ours = {r[0] for r in cur.fetchall()}
+                    with self._lock:
+                        lost = [j for j in self.procs if j not in ours and j not in self.lost]
+                    if lost:
+                        print(f"🛑 job(s) {', '.join(map(str, lost))} no longer running "
+                              f"on {self.name}; stopping their backtests", file=sys.stderr)
+                        self.release(lost)
+                    cur.execute(REQUEUE_SQL, (STALE_S,))
+                    for job_id, status in cur.fetchall():
+                        print(f"♻️ job {job_id} lost its worker → {status}")
+            except Exception as e:
+                print(f"⚠️ heartbeat failed: {e}", file=sys.stderr)
+
+    def run(self):
+        print(f"👷 {self.name}: {self.slots} slot(s), polling every {POLL_S}s")
+        threads = [threading.Thread(target=self.heartbeat, daemon=True)]
+        threads += [threading.Thread(target=self.slot, args=(i,), daemon=True)
+                    for i in range(self.slots)]
+        for t in threads:
+            t.start()
+        try:
+            while any(t.is_alive() for t in threads[1:]):
+                time.sleep(1)
+        except KeyboardInterrupt:
+            print("🛑 Stopping after the running jobs finish…")
+            self._stop.set()
+            for t in threads[1:]:
+                t.join()
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Backtest job queue")
+    sub = p.add_subparsers(dest="cmd", required=True)
+
+    w = sub.add_parser("worker", help="Run queued backtests")
+    w.add_argument("--workers", type=int, default=int(os.getenv("JOB_WORKERS", 2)),
+                   help="Backtests run concurrently by this process")
+
+    s = sub.add_parser("submit", help="Queue a backtest")
+    s.add_argument("--tradeplan",  default="liu_samples/tradeplan.toml")
+    s.add_argument("--symbols",    required=True)
+    s.add_argument("--start-date", required=True)
+    s.add_argument("--end-date",   required=True)
+    s.add_argument("--batch-id",   required=True)
+    s.add_argument("--priority",   choices=list(PRIORITIES), default="normal")
+    s.add_argument("--no-cache",   action="store_true")
+    s.add_argument("--chunk-days", type=int, default=0,
+                   help="Checkpointed run in chunks of N trading days (resumes after a crash)")
+
+    ls = sub.add_parser("status", help="Show recent jobs")
+    ls.add_argument("-n", type=int, default=20)
+
+    args = p.parse_args(argv)
+    dsn = os.getenv("DSN", "")
+    if not dsn:
+        print("❌ DSN not set", file=sys.stderr)
+        sys.exit(1)
+
+    if args.cmd == "worker":
+        metrics.serve()     # METRICS_PORT
+        Worker(dsn, args.workers).run()
+    elif args.cmd == "submit":
+        job_id = submit(dsn, "cli", str(Path(args.tradeplan).resolve()), args.symbols,
+                        args.start_date, args.end_date, args.batch_id,
+                        PRIORITIES[args.priority], no_cache=args.no_cache,
+                        chunk_days=args.chunk_days)
+        print(f"📨 Queued job {job_id}")
+    else:
+        for j in recent(dsn, args.n):
+            print(f"{j['job_id']:>6}  {j['status']:<9} prio {j['priority']:>3}  "
+                  f"{j['submitted_by']:<22} {j['batch_id']:<28} rc={j['returncode']}")
+
+
+if __name__ == "__main__":
+    main()
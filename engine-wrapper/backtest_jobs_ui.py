@@ -0,0 +1,87 @@
+# engine-wrapper/backtest_jobs_ui.py
+# The "Backtest Jobs" panel shared by dashboard_diagnostics.py and
+# dashboard_fixer.py: the app's recent jobs (backtest_jobs.py), with queue
+# position and cancel for a queued job, live phases and chunk progress for a
+# running one, and the stored result for a finished one.
+import streamlit as st
+import pandas as pd
+from psycopg2 import errors
+
+import metrics
+import backtest_jobs
+import backtest_logs
+
+JOB_TABLE = ["job_id", "status", "ahead", "priority", "batch_id", "symbols",
+             "submitted_at", "started_at", "finished_at", "returncode"]
+
+
+def render_jobs(dsn, app, n=10):
+    st.subheader("🧾 Backtest Jobs")
+    st.button("🔄 Refresh jobs")
+    try:
+        with metrics.query_timer(app, "backtest_jobs"):
+            jobs = backtest_jobs.recent(dsn, n, app)
+    except errors.UndefinedTable:
+        st.info("No backtest_jobs table — apply database/add_backtest_jobs.sql")
+        return
+    except Exception as e:
+        st.error(f"Could not load backtest jobs: {e}")
+        return
+    if not jobs:
+        st.info("No backtests submitted from here yet.")
+        return
+
+    st.dataframe(pd.DataFrame(jobs)[JOB_TABLE], use_container_width=True)
+    pick_job = st.selectbox("Job", [j["job_id"] for j in jobs])
+    job = next(j for j in jobs if j["job_id"] == pick_job)
+    if job["status"] == "queued":
+        st.info(f"Waiting for a worker — {job['ahead']} job(s) ahead.")
+        if st.button("✖️ Cancel job"):
+            if backtest_jobs.cancel(dsn, pick_job):
+                st.success(f"Cancelled job {pick_job}")
+    elif job["status"] == "running":
+        _running(job)
+    elif job["result"]:
+        _finished(job)
+
+
+def _running(job):
+    st.info(f"Running on {job['worker']} since {job['started_at']:%H:%M:%S}.")
+    if (job["options"] or {}).get("chunk_days"):
+        import backtest_chunks
+        ckpt = backtest_chunks.Checkpoint(job["batch_id"]).load()
+        if ckpt:
+            done = sum(c["status"] == "done" for c in ckpt["chunks"])
+            st.progress(done / len(ckpt["chunks"]), text=f"{done}/{len(ckpt['chunks'])} chunks done")
+    live = backtest_logs.read_index(job["batch_id"])
+    if live:
+        st.caption(f"⏱️ {live['duration_s']:.0f}s, {live['lines']:,} log lines, "
+                   f"now in `{live.get('current')}`")
+        st.dataframe(pd.DataFrame(backtest_logs.phase_rows(live)), use_container_width=True)
+
+
+def _finished(job):
+    res = job["result"]
+    if res.get("cached"):
+        st.info(f"♻️ Served from cache: batch `{res['cache_batch']}` — "
+                f"nothing was written under `{job['batch_id']}`.")
+    if res.get("summary"):
+        st.json(res["summary"])
+    if res.get("chunks"):
+        st.dataframe(pd.DataFrame(res["chunks"]), use_container_width=True)
+    if res.get("analytics"):
+        st.json(res["analytics"])
+    if res.get("error"):
+        st.error(res["error"])
+    if job["status"] == "done":
+        st.success("Backtest completed successfully! ✅")
+    else:
+        st.error(f"Backtest exited with code {job['returncode']}")
+    if res.get("phases"):
+        st.subheader("⏱️ Phase timings")
+        st.dataframe(pd.DataFrame(res["phases"]), use_container_width=True)
+    if res.get("log_dir"):
+        st.caption(f"Full log ({res.get('log_lines') or 0:,} lines): `{res['log_dir']}`")
+    st.text_area("STDOUT & STDERR (tail)",
+                 value=res.get("stdout", "") + "\n\n" + res.get("stderr", ""),
+                 height=300)
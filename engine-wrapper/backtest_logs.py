@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+# Streaming capture of enhanced_backtest output.
+#
+# run() is a drop-in for subprocess.run(cmd, capture_output=True, text=True):
+# stdout and stderr are read line by line as the backtest produces them and
+# written to gzip segments under BACKTEST_LOG_DIR/<name>/, rotated every
+# BACKTEST_LOG_SEGMENT_MB of text. Only the last BACKTEST_LOG_TAIL lines of
+# each stream stay in memory and come back as proc.stdout / proc.stderr.
+#
+# While reading, every line is classified into a phase (data load, scanner,
+# strategy, order simulation) by keyword and the wall time between lines is
+# charged to the phase that was running, and lines naming one of the
+# backtest's symbols count as progress for it. The result is the small
+# index.json next to the segments (rewritten every few seconds so a running
+# backtest can be watched) and proc.log_index.
+import os
+import re
+import sys
+import gzip
+import json
+import shutil
+import argparse
+import threading
+import subprocess
+import time
+from collections import deque
+from pathlib import Path
+
+LOG_DIR      = os.getenv("BACKTEST_LOG_DIR", "liu_samples/logs")
+SEGMENT_MB   = float(os.getenv("BACKTEST_LOG_SEGMENT_MB", 64))
+KEEP_SEGS    = int(os.getenv("BACKTEST_LOG_KEEP_SEGMENTS", 8))
+KEEP_RUNS    = int(os.getenv("BACKTEST_LOG_KEEP_RUNS", 200))
+TAIL_LINES   = int(os.getenv("BACKTEST_LOG_TAIL", 400))
+INDEX_EVERY  = 5.0
+
+# liualgotrader doesn't tag its log lines with a phase, so this goes by the
+# words its loaders, scanners and strategies log; first match wins
+PHASES = [
+    ("data_load",  re.compile(r"load(ing|ed)? (data|bars|ohlc)|data ?loader|fetch(ing)? (data|bars)|"
+                              r"polygon|alpaca.*(bars|data)|\[data\]", re.I)),
+    ("scanner",    re.compile(r"scann(er|ing)|scan\b", re.I)),
+    ("order_sim",  re.compile(r"\border\b|submit|fill(ed)?\b|execut(e|ion)|sell|buy\b", re.I)),
+    ("strategy",   re.compile(r"strateg(y|ies)|\brun\(|signal", re.I)),
+]
+LEVEL = re.compile(r"\b(DEBUG|INFO|WARNING|ERROR|CRITICAL)\b")
+SAFE_NAME = re.compile(r"[^A-Za-z0-9._-]+")
+
+
+def run_dir(name, root=None):
+    return Path(root or LOG_DIR) / SAFE_NAME.sub("_", name)
+
+
+def prune_runs(root, keep=KEEP_RUNS):
+    # oldest run directories go first
+    root = Path(root)
+    if not root.is_dir():
+        return
+    runs = sorted((d for d in root.iterdir() if d.is_dir()), key=lambda d: d.stat().st_mtime)
+    for d in runs[:max(0, len(runs) - keep)]:
+        shutil.rmtree(d, ignore_errors=True)
+
+
+def symbols_from(cmd):
+    if "--symbols" in cmd:
+        i = cmd.index("--symbols")
+        if i + 1 < len(cmd):
+            return [s.strip().upper() for s in cmd[i + 1].split(",") if s.strip()]
+    return []
+
+
+class PhaseIndex:
+    """Per-phase wall time and per-symbol progress, fed one line at a time."""
+
+    def __init__(self, symbols=()):
+        self.t0      = time.monotonic()
+        self.last    = self.t0
+        self.phase   = "startup"
+        self.phases  = {}
+        self.symbols = {s: {"lines": 0, "first_s": None, "last_s": None} for s in symbols}
+        self.levels  = {}
+        self.lines   = 0
+        self.bytes   = 0
+        self._sym_re = (re.compile(r"\b(" + "|".join(map(re.escape, sorted(symbols, key=len, reverse=True)))
+                                   + r")\b") if symbols else None)
+
+    def _charge(self, now):
+        p = self.phases.setdefault(self.phase, {"seconds": 0.0, "lines": 0, "first_s": None})
+        p["seconds"] += now - self.last
+        self.last = now
+
+    def feed(self, line, now=None):
+        now = time.monotonic() if now is None else now
+        self.lines += 1
+        self.bytes += len(line)
+        self._charge(now)
+        for phase, rx in PHASES:
+            if rx.search(line):
+                self.phase = phase
+                break
+        p = self.phases.setdefault(self.phase, {"seconds": 0.0, "lines": 0, "first_s": None})
+        p["lines"] += 1
+        if p["first_s"] is None:
+            p["first_s"] = round(now - self.t0, 3)
+        m = LEVEL.search(line)
+        if m:
+            self.levels[m.group(1)] = self.levels.get(m.group(1), 0) + 1
+        if self._sym_re:
+            for sym in set(self._sym_re.findall(line)):
+                s = self.symbols[sym]
+                s["lines"] += 1
+                t = round(now - self.t0, 3)
+                if s["first_s"] is None:
+                    s["first_s"] = t
+                s["last_s"] = t
+
+    def snapshot(self, now=None):
+        now = time.monotonic() if now is None else now
+        self._charge(now)
+        return {
+            "duration_s": round(now - self.t0, 3),
+            "lines":      self.lines,
+            "bytes":      self.bytes,
+            "levels":     dict(self.levels),
+            "phases":     {k: {**v, "seconds": round(v["seconds"], 3)} for k, v in self.phases.items()},
+            "symbols":    {k: dict(v) for k, v in self.symbols.items()},
+            "current":    self.phase,
+        }
+
+
+class SegmentWriter:
+    """gzip segments 000.log.gz, 001.log.gz, … keeping the newest `keep`."""
+
+    def __init__(self, directory, segment_bytes, keep):
+        self.dir      = Path(directory)
+        self.limit    = segment_bytes
+        self.keep     = keep
+        self.seq      = -1
+        self.written  = 0
+        self.segments = []
+        self.f        = None
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self._rotate()
+
+    def _rotate(self):
+        if self.f:
+            self.f.close()
+        self.seq += 1
+        path = self.dir / f"{self.seq:03d}.log.gz"
+        self.f = gzip.open(path, "wt", compresslevel=5, encoding="utf-8")
+        self.segments.append(path.name)
+        self.written = 0
+        while len(self.segments) > self.keep:
+            (self.dir / self.segments.pop(0)).unlink(missing_ok=True)
+
+    def write(self, text):
+        if self.written >= self.limit:
+            self._rotate()
+        self.f.write(text)
+        self.written += len(text)
+
+    def close(self):
+        if self.f:
+            self.f.close()
+            self.f = None
+
+
+def _write_index(path, index):
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_text(json.dumps(index, indent=2))
+    os.replace(tmp, path)
+
+
+def run(cmd, name, *, symbols=None, log_dir=None, tail_lines=TAIL_LINES,
+        segment_mb=SEGMENT_MB, keep_segments=KEEP_SEGS, env=None, on_start=None, **kwargs):
+    """subprocess.run(cmd, capture_output=True, text=True) without the memory.
+
+    Returns a CompletedProcess whose stdout/stderr are the last `tail_lines`
+    lines of each stream, plus `log_dir` (where the segments and index.json
+    are) and `log_index`. on_start(popen) is called once the child is
+    running, so a caller can terminate it.
+    """
+    for k in ("capture_output", "text", "universal_newlines", "stdout", "stderr"):
+        kwargs.pop(k, None)
+    root = Path(log_dir or LOG_DIR)
+    prune_runs(root)
+    out_dir = run_dir(name, root)
+    if out_dir.exists():
+        shutil.rmtree(out_dir)      # a re-run of the same batch replaces its log
+
+    symbols = symbols if symbols is not None else symbols_from(cmd)
+    index   = PhaseIndex(symbols)
+    seg     = SegmentWriter(out_dir, int(segment_mb * 1024 * 1024), keep_segments)
+    tails   = {"out": deque(maxlen=tail_lines), "err": deque(maxlen=tail_lines)}
+    lock    = threading.Lock()
+    idx_path = out_dir / "index.json"
+
+    # without this the engine block-buffers into the pipe and the phase
+    # timings measure buffer flushes instead of work
+    child_env = {**(env if env is not None else os.environ), "PYTHONUNBUFFERED": "1"}
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+                            errors="replace", bufsize=1, env=child_env, **kwargs)
+    if on_start:
+        on_start(proc)
+
+    def pump(stream, tag):
+        for line in stream:
+            now = time.monotonic()
+            with lock:
+                tails[tag].append(line)
+                seg.write(f"{now - index.t0:10.3f} {tag} {line}")
+                index.feed(line, now)
+        stream.close()
+
+    readers = [threading.Thread(target=pump, args=(proc.stdout, "out"), daemon=True),
+               threading.Thread(target=pump, args=(proc.stderr, "err"), daemon=True)]
+    for t in readers:
+        t.start()
+    while True:
+        alive = [t for t in readers if t.is_alive()]
+        if not alive:
+            break
+        alive[0].join(INDEX_EVERY)
+        with lock:
+            snap = index.snapshot()
+        _write_index(idx_path, {**snap, "running": True})
+    rc = proc.wait()
+
+    with lock:
+        seg.close()
+        final = {**index.snapshot(), "running": False, "returncode": rc,
+                 "segments": list(seg.segments), "cmd": list(cmd)}
+        del final["current"]
+    _write_index(idx_path, final)
+
+    result = subprocess.CompletedProcess(cmd, rc, "".join(tails["out"]), "".join(tails["err"]))
+    result.log_dir   = str(out_dir)
+    result.log_index = final
+    return result
+
+
+def read_index(name, log_dir=None):
+    path = run_dir(name, log_dir) / "index.json"
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def phase_rows(index):
+    # for st.dataframe / printing: slowest phase first
+    total = sum(p["seconds"] for p in index.get("phases", {}).values()) or 1
+    return sorted(
+        ({"phase": k, "seconds": v["seconds"], "share": round(v["seconds"] / total, 3),
+          "lines": v["lines"]} for k, v in index.get("phases", {}).items()),
+        key=lambda r: -r["seconds"],
+    )
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Show or follow captured backtest logs")
+    p.add_argument("name", nargs="?", help="Batch id / run name (omit to list runs)")
+    p.add_argument("--log-dir", default=LOG_DIR)
+    p.add_argument("--cat", action="store_true", help="Print the retained log text")
+    args = p.parse_args(argv)
+
+    root = Path(args.log_dir)
+    if not args.name:
+        for d in sorted((d for d in root.iterdir() if d.is_dir()), key=lambda d: d.stat().st_mtime) \
+                if root.is_dir() else []:
+            idx = read_index(d.name, root) or {}
+            state = "running" if idx.get("running") else f"rc={idx.get('returncode')}"
+            print(f"{d.name:<40} {idx.get('duration_s', 0):>9.1f}s  {idx.get('lines', 0):>10,} lines  {state}")
+        return
+
+    idx = read_index(args.name, root)
+    if idx is None:
+        print(f"❌ No log index for {args.name} under {root}", file=sys.stderr)
+        sys.exit(1)
+    if args.cat:
+        for seg in idx.get("segments", []):
+            with gzip.open(run_dir(args.name, root) / seg, "rt", encoding="utf-8") as f:
+                shutil.copyfileobj(f, sys.stdout)
+        return
+    print(f"⏱️  {args.name}: {idx['duration_s']}s, {idx['lines']:,} lines, levels {idx['levels']}")
+    for r in phase_rows(idx):
+        print(f"   {r['phase']:<10} {r['seconds']:>9.1f}s  {r['share']:>6.1%}  {r['lines']:>10,} lines")
+    for sym, s in sorted(idx.get("symbols", {}).items()):
+        print(f"   {sym:<8} {s['lines']:>8,} lines  first {s['first_s']}s  last {s['last_s']}s")
+
+
+if __name__ == "__main__":
+    main()
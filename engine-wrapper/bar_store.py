@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+# Local columnar OHLC bar store.
+#
+# Layout: BAR_STORE_DIR/<SYMBOL>/<period>.npy, one file per symbol per month
+# (daily bars) or per day (intraday bars). Each file is a (6, n) float64
+# array in C order, so every column (ts, open, high, low, close, volume) is
+# contiguous on disk and a range read is a memory-mapped slice found with
+# searchsorted on ts (epoch seconds, UTC). Writers replace whole partition
+# files with os.replace(), so readers never see a half-written one.
+#
+# <SYMBOL>/index.json records the partitions with their row counts and
+# first/last bar, plus the gaps found in the series, so coverage questions
+# don't have to touch the bars themselves.
+#
+# Bars stay under the ticker they traded as. read_lineage() stitches an
+# instrument's tickers together across renames and mergers
+# (symbol_renames.py): one range read per ticker, prices and volume
+# restated in the current ticker's shares.
+import os
+import sys
+import json
+import argparse
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import symbol_renames
+
+STORE_DIR = os.getenv("BAR_STORE_DIR", "liu_samples/bars")
+COLUMNS   = ("ts", "open", "high", "low", "close", "volume")
+DAY_S     = 86400
+EPOCH     = pd.Timestamp(0, tz="UTC")
+
+STOCK_OHLC_SQL = """
+    SELECT symbol, symbol_date, open, high, low, close, volume
+      FROM stock_ohlc
+     WHERE (%(symbols)s::text[] IS NULL OR symbol = ANY(%(symbols)s))
+       AND (%(start)s::date IS NULL OR symbol_date >= %(start)s)
+       AND (%(end)s::date IS NULL OR symbol_date <= %(end)s)
+     ORDER BY symbol, symbol_date
+"""
+
+
+def _utc(value):
+    if value is None:
+        return None
+    ts = pd.Timestamp(value)
+    return ts.tz_localize("UTC") if ts.tzinfo is None else ts
+
+
+def _epoch(value):
+    return None if value is None else _utc(value).timestamp()
+
+
+def _periods(ts, partition):
+    # "YYYY-MM" / "YYYY-MM-DD" partition names for an array of epoch seconds
+    unit = "M" if partition == "month" else "D"
+    return ts.astype("int64").astype("datetime64[s]").astype(f"datetime64[{unit}]").astype(str)
+
+
+def _save_atomic(path, obj, save):
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            save(f, obj)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def find_gaps(ts, interval_s):
+    # daily bars: missing weekdays, ignoring single-day holidays;
+    # intraday bars: holes inside a session, not overnight/weekend jumps
+    if len(ts) < 2:
+        return []
+    gaps = []
+    if interval_s >= DAY_S:
+        days = (ts // DAY_S).astype("int64").astype("datetime64[D]")
+        missing = np.busday_count(days[:-1] + 1, days[1:])
+        for i in np.flatnonzero(missing >= 2):
+            gaps.append([float(ts[i]), float(ts[i + 1]), int(missing[i])])
+    else:
+        step = np.diff(ts)
+        same_day = (ts[:-1] // DAY_S) == (ts[1:] // DAY_S)
+        for i in np.flatnonzero(same_day & (step > 1.5 * interval_s)):
+            gaps.append([float(ts[i]), float(ts[i + 1]), int(step[i] // interval_s) - 1])
+    return gaps
+
+
+class BarStore:
+    def __init__(self, root=None):
+        self.root = Path(root or STORE_DIR)
+
+    # ————— reading —————
+    def symbols(self):
+        if not self.root.exists():
+            return []
+        return sorted(p.name for p in self.root.iterdir() if (p / "index.json").exists())
+
+    def index(self, symbol):
+        p = self.root / symbol.upper() / "index.json"
+        if not p.exists():
+            return None
+        return json.loads(p.read_text())
+
+    def _partition(self, symbol, period):
+        return np.load(self.root / symbol / f"{period}.npy", mmap_mode="r")
+
+    def read_arrays(self, symbol, start=None, end=None):
+        # {column: ndarray} for start <= ts <= end; single-partition reads
+        # are zero-copy views of the memory map
+        symbol = symbol.upper()
+        idx = self.index(symbol)
+        if not idx:
+            return {c: np.empty(0) for c in COLUMNS}
+        lo, hi = _epoch(start), _epoch(end)
+        parts = []
+        for period, meta in sorted(idx["partitions"].items()):
+            if (lo is not None and meta["last"] < lo) or (hi is not None and meta["first"] > hi):
+                continue
+            bars = self._partition(symbol, period)
+            i = 0 if lo is None else np.searchsorted(bars[0], lo, "left")
+            j = bars.shape[1] if hi is None else np.searchsorted(bars[0], hi, "right")
+            if j > i:
+                parts.append(bars[:, i:j])
+        if not parts:
+            return {c: np.empty(0) for c in COLUMNS}
+        bars = parts[0] if len(parts) == 1 else np.concatenate(parts, axis=1)
+        return dict(zip(COLUMNS, bars))
+
+    def read(self, symbol, start=None, end=None, columns=None):
+        cols = self.read_arrays(symbol, start, end)
+        return _frame(cols, columns)
+
+    def read_lineage(self, symbol, start=None, end=None, columns=None, renames=None):
+        # bars of every ticker the instrument traded under in [start, end],
+        # adjusted to its canonical ticker's shares
+        renames = renames or symbol_renames.default()
+        lo, hi = _utc(start), _utc(end)
+        parts = []
+        for seg in renames.segments(symbol, start, end):
+            s_lo = _utc(seg.start)
+            s_hi = None if seg.end is None else _utc(seg.end) - pd.Timedelta(milliseconds=1)
+            cols = self.read_arrays(seg.symbol, max(filter(None, (lo, s_lo)), default=None),
+                                    min(filter(None, (hi, s_hi)), default=None))
+            if seg.ratio != 1 or seg.cash:
+                cols = {c: (v if c == "ts" else seg.qty(v) if c == "volume" else seg.price(v))
+                        for c, v in cols.items()}
+            parts.append(cols)
+        if len(parts) > 1:
+            cols = {c: np.concatenate([p[c] for p in parts]) for c in COLUMNS}
+        else:
+            cols = parts[0] if parts else {c: np.empty(0) for c in COLUMNS}
+        return _frame(cols, columns)
+
+    def gaps(self, symbol, start=None, end=None):
+        idx = self.index(symbol) or {"gaps": []}
+        lo, hi = _epoch(start), _epoch(end)
+        return [g for g in idx["gaps"]
+                if (lo is None or g[1] >= lo) and (hi is None or g[0] <= hi)]
+
+    # ————— writing —————
+    def write(self, symbol, df, partition=None):
+        # df: ts (anything pd.Timestamp understands) + OHLCV columns.
+        # Rows for a ts already stored replace the old bar.
+        symbol = symbol.upper()
+        if df.empty:
+            return 0
+        d = self.root / symbol
+        d.mkdir(parents=True, exist_ok=True)
+        idx = self.index(symbol) or {}
+
+        ts = (pd.to_datetime(df["ts"], utc=True) - EPOCH) / pd.Timedelta(seconds=1)
+        bars = np.vstack([ts.to_numpy()] + [df[c].to_numpy(dtype="float64") for c in COLUMNS[1:]])
+        bars = bars[:, np.argsort(bars[0], kind="stable")]
+        if partition is None:
+            spacing = _spacing(bars[0])
+            partition = idx.get("partition") or ("day" if spacing and spacing < DAY_S else "month")
+
+        periods = _periods(bars[0], partition)
+        for period in np.unique(periods):
+            new = bars[:, periods == period]
+            path = d / f"{period}.npy"
+            if path.exists():
+                new = np.concatenate([np.load(path), new], axis=1)
+            # stable sort + keep the last occurrence of each ts
+            new = new[:, np.argsort(new[0], kind="stable")]
+            keep = np.append(new[0, 1:] != new[0, :-1], True)
+            _save_atomic(path, np.ascontiguousarray(new[:, keep]), np.save)
+        self.reindex(symbol, partition)
+        return bars.shape[1]
+
+    def reindex(self, symbol, partition=None):
+        symbol = symbol.upper()
+        d = self.root / symbol
+        old = self.index(symbol) or {}
+        partitions, ts = {}, []
+        for path in sorted(d.glob("*.npy")):
+            bars = np.load(path, mmap_mode="r")
+            if not bars.shape[1]:
+                continue
+            partitions[path.stem] = {
+                "rows":  int(bars.shape[1]),
+                "first": float(bars[0, 0]),
+                "last":  float(bars[0, -1]),
+            }
+            ts.append(np.asarray(bars[0]))
+        ts = np.concatenate(ts) if ts else np.empty(0)
+        interval = _spacing(ts)
+        idx = {
+            "symbol":     symbol,
+            "partition":  partition or old.get("partition", "month"),
+            "interval_s": interval,
+            "rows":       int(len(ts)),
+            "partitions": partitions,
+            "gaps":       find_gaps(ts, interval) if interval else [],
+            "updated":    datetime.utcnow().isoformat(),
+        }
+        _save_atomic(d / "index.json", idx,
+                     lambda f, o: f.write(json.dumps(o, indent=2).encode()))
+        return idx
+
+
+def _frame(cols, columns=None):
+    df = pd.DataFrame({c: cols[c] for c in (columns or COLUMNS[1:])})
+    df.index = pd.to_datetime(cols["ts"], unit="s", utc=True)
+    df.index.name = "ts"
+    return df
+
+
+def _spacing(ts):
+    # the typical bar interval: median step, so gaps don't skew it
+    if len(ts) < 2:
+        return None
+    return float(np.median(np.diff(ts)))
+
+
+# ————— Importers —————
+def import_db(store, dsn, symbols=None, start=None, end=None, chunk=50_000, follow_renames=True):
+    import psycopg2
+    total = 0
+    if symbols and follow_renames:
+        # every ticker the symbols traded under in the range, in one query
+        wanted = symbol_renames.default().tickers(symbols, start, end)
+        if set(wanted) != set(symbols):
+            print(f"📋 {', '.join(symbols)} → {', '.join(wanted)} (renames)")
+        symbols = wanted
+    conn = psycopg2.connect(dsn)
+    try:
+        # named cursor: rows stream from the server in chunks
+        with conn.cursor(name="bar_store_import") as cur:
+            cur.itersize = chunk
+            cur.execute(STOCK_OHLC_SQL, {"symbols": symbols, "start": start, "end": end})
+            while True:
+                rows = cur.fetchmany(chunk)
+                if not rows:
+                    break
+                df = pd.DataFrame(rows, columns=["symbol", "ts", *COLUMNS[1:]])
+                for sym, g in df.groupby("symbol", sort=False):
+                    total += store.write(sym, g, partition="month")
+                print(f"📥 {total} bars imported…")
+    finally:
+        conn.close()
+    return total
+
+
+def import_csv(store, path, symbol=None, chunk=500_000):
+    total = 0
+    for df in pd.read_csv(path, chunksize=chunk):
+        df.columns = [c.strip().lower() for c in df.columns]
+        ts_col = next((c for c in ("ts", "timestamp", "datetime", "date", "symbol_date")
+                       if c in df.columns), None)
+        if ts_col is None:
+            raise ValueError(f"{path}: no timestamp column")
+        df = df.rename(columns={ts_col: "ts"})
+        if symbol:
+            df["symbol"] = symbol
+        elif "symbol" not in df.columns:
+            raise ValueError(f"{path}: no symbol column; pass --symbol")
+        for sym, g in df.groupby("symbol", sort=False):
+            total += store.write(sym, g)
+        print(f"📥 {total} bars imported…")
+    return total
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Local columnar OHLC bar store")
+    p.add_argument("--root", default=STORE_DIR, help="Store directory (BAR_STORE_DIR)")
+    sub = p.add_subparsers(dest="cmd", required=True)
+
+    db = sub.add_parser("import-db", help="Import bars from stock_ohlc")
+    db.add_argument("--symbols", help="Comma-separated list of tickers (default: all)")
+    db.add_argument("--start-date", help="YYYY-MM-DD")
+    db.add_argument("--end-date",   help="YYYY-MM-DD")
+    db.add_argument("--no-renames", action="store_true",
+                    help="Only these tickers, not their former/later ones")
+
+    csv = sub.add_parser("import-csv", help="Import bars from a CSV file")
+    csv.add_argument("path")
+    csv.add_argument("--symbol", help="Ticker, if the file has no symbol column")
+
+    gaps = sub.add_parser("gaps", help="List gaps for a symbol")
+    gaps.add_argument("symbol")
+    gaps.add_argument("--start-date")
+    gaps.add_argument("--end-date")
+
+    sub.add_parser("info", help="Summarize stored symbols")
+
+    args = p.parse_args(argv)
+    store = BarStore(args.root)
+
+    if args.cmd == "import-db":
+        dsn = os.getenv("DSN", "")
+        if not dsn:
+            print("❌ DSN not set", file=sys.stderr)
+            sys.exit(1)
+        syms = [s.strip().upper() for s in args.symbols.split(",")] if args.symbols else None
+        n = import_db(store, dsn, syms, args.start_date, args.end_date,
+                      follow_renames=not args.no_renames)
+        print(f"✅ {n} bars from stock_ohlc → {store.root}")
+    elif args.cmd == "import-csv":
+        n = import_csv(store, args.path, args.symbol)
+        print(f"✅ {n} bars from {args.path} → {store.root}")
+    elif args.cmd == "gaps":
+        found = store.gaps(args.symbol, args.start_date, args.end_date)
+        for a, b, missing in found:
+            print(f"⚠️ {pd.Timestamp(a, unit='s')} → {pd.Timestamp(b, unit='s')}: "
+                  f"{missing} bar(s) missing")
+        if not found:
+            print("✅ No gaps")
+    else:
+        for sym in store.symbols():
+            idx = store.index(sym)
+            print(f"{sym:<8} {idx['rows']:>10} bars  {len(idx['partitions']):>4} partitions  "
+                  f"{len(idx['gaps']):>4} gaps  every {idx['interval_s']}s")
+
+
+if __name__ == "__main__":
+    main()
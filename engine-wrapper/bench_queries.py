@@ -0,0 +1,555 @@
+#!/usr/bin/env python3
+# Query benchmarks for the dashboards against synthetic data.
+#
+#   BENCH_DSN=postgresql://…/liu_bench python bench_queries.py init
+#   BENCH_DSN=… python bench_queries.py generate --trades 5000000 --batches 5000
+#   BENCH_DSN=… python bench_queries.py run --out bench-$(git rev-parse --short HEAD).json
+#   python bench_queries.py compare bench-old.json bench-new.json
+#
+# `init` applies database/schema.sql to an empty database. `generate` fills
+# algo_run / trades / new_trades / backtests / backtest_jobs server-side
+# (INSERT … SELECT generate_series, one chunk per transaction), seeded so
+# the same arguments give the same data. `run` times what the dashboards
+# load — the executions feed, the charts, the risk monitor, recent
+# backtests and jobs, collect_diagnostics — plus the Fixer's duplicate
+# cleanup (the estimate, and the bulk delete rolled back), through the same
+# modules and SQL they use, and writes one JSON document. `compare` lines two of those up.
+#
+# Only ever point BENCH_DSN at a throwaway database: DSN is not read here.
+import os
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import warnings
+import subprocess
+from contextlib import redirect_stderr
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import psycopg2
+from psycopg2 import errors
+from psycopg2.extras import execute_values
+
+import dedupe_batches
+import diagnostics
+from db_pool import connection
+
+HERE   = Path(__file__).resolve().parent
+SCHEMA = HERE.parent / "database" / "schema.sql"
+# the live-UI loaders live next to the Streamlit apps
+sys.path.append(str(HERE.parent / "streamlit" / "app"))
+
+CHUNK   = int(os.getenv("BENCH_CHUNK", 500_000))
+SYMBOLS = ["AAPL", "MSFT", "GOOG", "AMZN", "NVDA", "META", "TSLA", "AMD", "NFLX", "INTC",
+           "SPY", "QQQ", "IWM", "JPM", "BAC", "XOM", "CVX", "KO", "PEP", "DIS"]
+
+# ————— Generator SQL —————
+# One row per trade g in [lo, hi]. Trades are spread evenly over the time
+# span in trade_id order (rows arrive in time order, as the BRIN indexes
+# expect) and handed to runs in contiguous blocks, so every run's trades
+# fall inside its own stretch of time.
+TRADES_SQL = """
+    INSERT INTO trades (algo_run_id, is_win, symbol, qty, buy_price, buy_indicators, buy_time,
+                        sell_price, sell_indicators, sell_time)
+    SELECT r.algo_run_id,
+           CASE WHEN NOT s.open THEN s.sell > s.buy END,
+           s.symbol, s.qty, s.buy,
+           jsonb_build_object('rsi', round((s.u2 * 100)::numeric, 1),
+                              'macd', round((s.u3 - 0.5)::numeric, 3), 'vwap', s.buy),
+           s.buy_time,
+           CASE WHEN NOT s.open THEN s.sell END,
+           CASE WHEN NOT s.open THEN jsonb_build_object('reason', CASE WHEN s.sell > s.buy
+                                                                       THEN 'target' ELSE 'stop' END) END,
+           CASE WHEN NOT s.open THEN s.buy_time + make_interval(mins => 1 + floor(s.u4 * 240)::int) END
+      FROM (
+            SELECT g, u2, u3, u4,
+                   (%(symbols)s::text[])[k]                                             AS symbol,
+                   1 + floor(u4 * 200)::int                                             AS qty,
+                   round(((10 + (k * 37) %% 490) * (1 + (u2 - 0.5) / 10))::numeric, 2)   AS buy,
+                   round(((10 + (k * 37) %% 490) * (1 + (u2 - 0.5) / 10)
+                          * (1 + (u3 - 0.48) / 25))::numeric, 2)                        AS sell,
+                   %(t0)s::timestamp + make_interval(secs => g * %(step)s)             AS buy_time,
+                   u5 < %(open)s                                                        AS open
+              FROM (
+                    SELECT g,
+                           1 + floor(power(random(), 2) * %(nsym)s)::int AS k,   -- skewed to the first symbols
+                           random() AS u2, random() AS u3, random() AS u4, random() AS u5
+                      FROM generate_series(%(lo)s::bigint, %(hi)s::bigint) g
+                   ) u
+           ) s
+      JOIN bench_runs r ON r.idx = (s.g - 1) * %(runs)s / %(n)s
+"""
+
+# the order-level view of every `every`-th trade: its buy and its sell
+NEW_TRADES_SQL = """
+    INSERT INTO new_trades (algo_run_id, symbol, operation, qty, price, indicators,
+                            client_time, tstamp, stop_price, target_price)
+    SELECT algo_run_id, symbol, 'buy'::trade_operation, qty, buy_price, buy_indicators, buy_time::text, buy_time,
+           round(buy_price * 0.97, 2), round(buy_price * 1.05, 2)
+      FROM trades
+     WHERE trade_id BETWEEN %(lo)s AND %(hi)s AND trade_id %% %(every)s = 0
+    UNION ALL
+    SELECT algo_run_id, symbol, 'sell'::trade_operation, qty, sell_price, sell_indicators, sell_time::text, sell_time,
+           NULL, NULL
+      FROM trades
+     WHERE trade_id BETWEEN %(lo)s AND %(hi)s AND trade_id %% %(every)s = 0
+       AND sell_time IS NOT NULL
+"""
+
+# what the executions triggers would have written, for a range of trades
+EXECUTIONS_SQL = """
+    INSERT INTO executions (trade_id, algo_run_id, symbol, side, qty, price, ts)
+    SELECT trade_id, algo_run_id, symbol, side, qty, price, ts
+      FROM (
+        SELECT trade_id, algo_run_id, symbol, 'buy' AS side, qty, buy_price AS price, buy_time AS ts
+          FROM trades
+         WHERE trade_id BETWEEN %(lo)s AND %(hi)s
+        UNION ALL
+        SELECT trade_id, algo_run_id, symbol, 'sell' AS side, qty, sell_price AS price, sell_time AS ts
+          FROM trades
+         WHERE trade_id BETWEEN %(lo)s AND %(hi)s AND sell_time IS NOT NULL
+      ) ev
+     ORDER BY ts
+    ON CONFLICT (trade_id, side) DO NOTHING
+"""
+
+BACKTESTS_SQL = """
+    INSERT INTO backtests (batch_id, run_at, symbols, win_rate, net_profit)
+    SELECT ar.batch_id,
+           MAX(ar.start_time),
+           (array_agg(DISTINCT t.symbol))[1:10],
+           COALESCE(AVG(t.is_win::int), 0),
+           COALESCE(SUM((t.sell_price - t.buy_price) * t.qty), 0)
+      FROM algo_run ar
+      JOIN bench_runs r ON r.algo_run_id = ar.algo_run_id
+      LEFT JOIN trades t ON t.algo_run_id = ar.algo_run_id
+     WHERE ar.batch_id <> ''
+     GROUP BY ar.batch_id
+    ON CONFLICT (batch_id) DO NOTHING
+"""
+
+JOBS_SQL = """
+    INSERT INTO backtest_jobs (status, submitted_by, tradeplan, symbols, start_date, end_date,
+                               batch_id, attempts, submitted_at, started_at, finished_at,
+                               returncode, result)
+    SELECT CASE WHEN random() < %(queued)s THEN 'queued' ELSE 'done' END,
+           'bench', '/app/liu_samples/tradeplan.toml', 'AAPL,MSFT', start_time::date,
+           start_time::date + 1, batch_id, 1, start_time, start_time, start_time, 0,
+           '{"stdout": "", "stderr": ""}'
+      FROM algo_run ar
+      JOIN bench_runs r USING (algo_run_id)
+     WHERE ar.batch_id <> ''
+     ORDER BY algo_run_id
+"""
+
+# flow_tester.load_backtests
+RECENT_BACKTESTS_SQL = """
+      SELECT batch_id, run_at, symbols, win_rate, net_profit
+        FROM backtests
+       ORDER BY run_at DESC
+       LIMIT %s
+"""
+
+SCALE_SQL = """
+    SELECT (SELECT COUNT(*) FROM algo_run),
+           (SELECT COUNT(DISTINCT batch_id) FROM algo_run WHERE batch_id <> ''),
+           (SELECT COUNT(*) FROM (SELECT 1 FROM algo_run WHERE batch_id <> ''
+                                   GROUP BY batch_id HAVING COUNT(*) > 1) d),
+           (SELECT COUNT(*) FROM trades),
+           (SELECT COUNT(*) FROM new_trades),
+           (SELECT COUNT(*) FROM executions),
+           (SELECT COUNT(*) FROM backtests),
+           (SELECT COUNT(*) FROM backtest_jobs)
+"""
+SCALE_KEYS = ["algo_runs", "batches", "duplicate_batches", "trades", "new_trades",
+              "executions", "backtests", "backtest_jobs"]
+
+
+def _dsn(args):
+    dsn = args.dsn or os.getenv("BENCH_DSN", "")
+    if not dsn:
+        print("❌ BENCH_DSN not set (use a scratch database, never the live one)", file=sys.stderr)
+        sys.exit(1)
+    return dsn
+
+
+def _has_table(cur, name):
+    cur.execute("SELECT to_regclass(%s) IS NOT NULL", (name,))
+    return cur.fetchone()[0]
+
+
+# ————— init —————
+def init(dsn, schema=SCHEMA):
+    conn = psycopg2.connect(dsn)
+    conn.autocommit = True
+    conn.set_client_encoding("UTF8")    # the schema's comments aren't ASCII
+    try:
+        with conn.cursor() as cur:
+            if _has_table(cur, "algo_run"):
+                print("❌ algo_run already exists — init wants an empty database", file=sys.stderr)
+                sys.exit(1)
+            t0 = time.monotonic()
+            cur.execute(Path(schema).read_text())
+            print(f"✅ Applied {schema} in {time.monotonic() - t0:.1f}s")
+    finally:
+        conn.close()
+
+
+# ————— generate —————
+def plan_runs(batches, dup_ratio, live_runs, days, seed):
+    """(algo_env, batch_id, start_time) per run, oldest first.
+
+    Every batch gets one run, `dup_ratio` of them a second or third one
+    later on (what the Fixer cleans up), and `live_runs` PAPER sessions
+    without a batch_id are spread in between; the newest run is live, so
+    the risk monitor has a session in progress.
+    """
+    rnd = random.Random(seed)
+    runs = [("BACKTEST", f"bench-{i:06d}") for i in range(batches)]
+    runs += [("BACKTEST", f"bench-{i:06d}")
+             for i in rnd.sample(range(batches), int(batches * dup_ratio))
+             for _ in range(rnd.choice((1, 2)))]
+    runs += [("PAPER", "")] * max(live_runs - 1, 0)
+    rnd.shuffle(runs)
+    runs.append(("PAPER", ""))
+    end = datetime.now().replace(microsecond=0)
+    start = end - timedelta(days=days)
+    step = (end - start) / len(runs)
+    return [(env, bid, start + i * step) for i, (env, bid) in enumerate(runs)], start, end
+
+
+def _chunks(n, size):
+    for lo in range(1, n + 1, size):
+        yield lo, min(lo + size - 1, n)
+
+
+def generate(dsn, trades, batches, dup_ratio=0.05, live_runs=60, days=90, open_ratio=0.05,
+             new_trades_every=2, queued=0.02, seed=42, force=False):
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn.cursor() as cur:
+            if not _has_table(cur, "algo_run"):
+                print("❌ No schema — run `init` first", file=sys.stderr)
+                sys.exit(1)
+            cur.execute("SELECT EXISTS (SELECT 1 FROM algo_run)")
+            if cur.fetchone()[0] and not force:
+                print("❌ algo_run is not empty (pass --force to add to it)", file=sys.stderr)
+                sys.exit(1)
+            # skip the per-row executions trigger and FK checks; executions
+            # is filled in bulk afterwards. Needs a superuser.
+            try:
+                cur.execute("SET session_replication_role = replica")
+                bulk = True
+            except errors.InsufficientPrivilege:
+                conn.rollback()
+                bulk = False
+                print("⚠️ not a superuser: triggers stay on, generation will be slower")
+            cur.execute("SELECT setseed(%s)", (((seed % 1000) / 1000.0),))
+
+            runs, start, end = plan_runs(batches, dup_ratio, live_runs, days, seed)
+            cur.execute("CREATE TEMP TABLE bench_runs (idx bigint PRIMARY KEY, algo_run_id integer)")
+            ids = execute_values(cur, """
+                INSERT INTO algo_run (algo_name, algo_env, build_number, parameters,
+                                      start_time, end_time, end_reason, batch_id)
+                VALUES %s RETURNING algo_run_id
+            """, [("momentum_long", env, "bench", json.dumps({"seed": seed}), t,
+                   t + timedelta(hours=1), "bench", bid) for env, bid, t in runs],
+                fetch=True, page_size=5000)
+            execute_values(cur, "INSERT INTO bench_runs VALUES %s",
+                           [(i, rid) for i, (rid,) in enumerate(ids)], page_size=5000)
+            cur.execute("SELECT COALESCE(MAX(trade_id), 0) FROM trades")
+            base = cur.fetchone()[0]
+            conn.commit()
+            print(f"🧱 {len(runs):,} runs ({batches:,} batches) over {start:%Y-%m-%d} → {end:%Y-%m-%d}")
+
+            t0 = time.monotonic()
+            step = (end - start).total_seconds() / trades
+            for lo, hi in _chunks(trades, CHUNK):
+                cur.execute(TRADES_SQL, {"symbols": SYMBOLS, "nsym": len(SYMBOLS), "t0": start,
+                                         "step": step, "open": open_ratio, "lo": lo, "hi": hi,
+                                         "runs": len(runs), "n": trades})
+                conn.commit()
+                rate = hi / (time.monotonic() - t0)
+                print(f"📥 trades {hi:,}/{trades:,} ({rate:,.0f}/s)")
+
+            last = base + trades
+            for lo, hi in _chunks(last - base, CHUNK):
+                params = {"lo": base + lo, "hi": base + hi, "every": new_trades_every}
+                if new_trades_every:
+                    cur.execute(NEW_TRADES_SQL, params)
+                if bulk:
+                    cur.execute(EXECUTIONS_SQL, params)
+                conn.commit()
+                print(f"📥 new_trades{' / executions' if bulk else ''} {hi:,}/{trades:,}")
+
+            cur.execute(BACKTESTS_SQL)
+            print(f"📥 backtests: {cur.rowcount:,}")
+            if _has_table(cur, "backtest_jobs"):
+                cur.execute(JOBS_SQL, {"queued": queued})
+                print(f"📥 backtest_jobs: {cur.rowcount:,}")
+            conn.commit()
+
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute("ANALYZE")
+        print(f"✅ Generated in {time.monotonic() - t0:.0f}s")
+    finally:
+        conn.close()
+
+
+# ————— run —————
+class Bench:
+    """The timed cases. Each returns the number of rows it produced."""
+
+    def __init__(self, dsn):
+        self.dsn = dsn
+        self.env = {"DSN": dsn, "TRADEPLAN_DIR": os.getenv("TRADEPLAN_DIR", "")}
+        self.previous = None
+        with connection(dsn) as conn, conn.cursor() as cur:
+            cur.execute("SELECT MIN(ts), MAX(ts) FROM executions")
+            self.first, self.last = cur.fetchone()
+            cur.execute("SELECT symbol FROM executions GROUP BY symbol ORDER BY COUNT(*) DESC LIMIT 1")
+            self.symbol = (cur.fetchone() or [None])[0]
+            cur.execute("""
+                SELECT EXISTS (SELECT 1 FROM algo_run WHERE batch_id <> ''
+                                GROUP BY batch_id HAVING COUNT(*) > 1)
+            """)
+            self.dupes = cur.fetchone()[0]
+
+    def cases(self):
+        import downsample
+        out = {
+            "backtests_recent":        self.backtests_recent,
+            "diagnostics_full":        self.diagnostics_full,
+            "diagnostics_incremental": self.diagnostics_incremental,
+        }
+        try:
+            import backtest_jobs
+            out["backtest_jobs_recent"] = lambda: len(backtest_jobs.recent(self.dsn, 10))
+        except ImportError:
+            pass
+        try:
+            from executions_feed import ExecutionsFeed, LEGACY_SQL
+            from risk_monitor import RiskMonitor
+        except ImportError as e:
+            print(f"⚠️ live-UI cases skipped: {e}", file=sys.stderr)
+        else:
+            out["executions_feed_cold"] = lambda: len(ExecutionsFeed(self.dsn, 200).refresh())
+            out["executions_legacy"]    = lambda: self._rows(LEGACY_SQL, (200,))
+            self._risk_monitor = RiskMonitor
+            out["risk_monitor_cold"]    = self.risk_monitor_cold
+        if self.last is not None:
+            for label in ("1 day", "1 month"):
+                key = label.replace(" ", "_")
+                out[f"chart_price_{key}"] = lambda label=label: len(
+                    downsample.price_series(self.dsn, *self._window(label), self.symbol, 500))
+                out[f"chart_qty_{key}"] = lambda label=label: len(
+                    downsample.qty_series(self.dsn, *self._window(label), self.symbol, 120))
+            out["chart_symbols_1_month"] = lambda: len(
+                downsample.symbols(self.dsn, *self._window("1 month")))
+        if self.dupes:
+            out["dedupe_estimate"] = lambda: dedupe_batches.totals(
+                dedupe_batches.estimate(self.dsn)[0])["runs"]
+            out["dedupe_all"] = lambda: dedupe_batches.dedupe(self.dsn, rollback=True)["runs"]
+        return out
+
+    def _plan(self):
+        return {"portfolio_value": 25000.0, "risk": 0.001, "market_liquidation_end_time_minutes": 15}
+
+    def _window(self, label):
+        import downsample
+        start, end = downsample.window(self.last, label)
+        return max(start, self.first), end
+
+    def _rows(self, sql, params=None):
+        with connection(self.dsn) as conn, conn.cursor() as cur:
+            cur.execute(sql, params)
+            return len(cur.fetchall())
+
+    def risk_monitor_cold(self):
+        # synthetic sessions trip every limit; keep the alerts off the terminal
+        with redirect_stderr(open(os.devnull, "w")) as quiet:
+            try:
+                return self._risk_monitor(self.dsn, plan=self._plan()).poll()
+            finally:
+                quiet.close()
+
+    def backtests_recent(self):
+        return self._rows(RECENT_BACKTESTS_SQL, (50,))
+
+    def diagnostics_full(self):
+        diag = diagnostics.collect_diagnostics(self.env)
+        if any(i.startswith("DSN connection error") for i in diag["issues"]):
+            raise RuntimeError(diag["issues"][-1])
+        self.previous = diag
+        return len(diag["batches"])
+
+    def diagnostics_incremental(self):
+        diag = diagnostics.collect_diagnostics(self.env, self.previous)
+        return diag["scan"]["examined"]
+
+
+def timed(fn, repeat):
+    times, rows, error = [], None, None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        try:
+            rows = fn()
+        except Exception as e:
+            error = f"{type(e).__name__}: {str(e).strip().splitlines()[0] if str(e).strip() else ''}"
+            break
+        times.append(time.perf_counter() - t0)
+    out = {"rows": rows, "runs": len(times)}
+    if times:
+        t = np.array(times)
+        out.update({
+            "first_s": round(times[0], 6),
+            "min_s":   round(float(t.min()), 6),
+            "p50_s":   round(float(np.percentile(t, 50)), 6),
+            "p95_s":   round(float(np.percentile(t, 95)), 6),
+            "max_s":   round(float(t.max()), 6),
+        })
+    if error:
+        out["error"] = error
+    return out
+
+
+def _git():
+    def git(*args):
+        try:
+            return subprocess.run(["git", *args], cwd=HERE, capture_output=True, text=True,
+                                  timeout=10).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return ""
+    return {"commit": git("rev-parse", "HEAD") or None,
+            "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def run(dsn, repeat=5, only=None):
+    with connection(dsn) as conn, conn.cursor() as cur:
+        cur.execute("SHOW server_version")
+        version = cur.fetchone()[0]
+        cur.execute(SCALE_SQL)
+        scale = dict(zip(SCALE_KEYS, cur.fetchone()))
+    print("📏 " + "  ".join(f"{k}={v:,}" for k, v in scale.items()))
+
+    # pandas warns about psycopg2 connections on every read_sql
+    warnings.filterwarnings("ignore", message="pandas only supports SQLAlchemy")
+    bench = Bench(dsn)
+    results = {}
+    # the dedupe bumps batch_delete_seq even when rolled back, so it goes
+    # after the diagnostics cases
+    for name, fn in bench.cases().items():
+        if only and name not in only:
+            continue
+        r = results[name] = timed(fn, repeat)
+        shown = f"p50 {r['p50_s'] * 1000:9.1f} ms  p95 {r['p95_s'] * 1000:9.1f} ms" if "p50_s" in r else ""
+        print(f"{'❌' if 'error' in r else '⏱️'} {name:<26} {shown}  {r.get('error', '')}")
+    return {
+        **_git(),
+        "at":       datetime.now().astimezone().isoformat(timespec="seconds"),
+        "host":     socket.gethostname(),
+        "postgres": version,
+        "repeat":   repeat,
+        "scale":    scale,
+        "cases":    results,
+    }
+
+
+# ————— compare —————
+def compare(a, b, threshold, min_ms=5.0):
+    """Print p50s side by side; returns the cases slower than `threshold`.
+
+    Changes under `min_ms` are noise on a laptop and never flagged.
+    """
+    if a.get("scale") != b.get("scale"):
+        print("⚠️ the two runs were taken on different data:")
+        for k in SCALE_KEYS:
+            va, vb = a.get("scale", {}).get(k), b.get("scale", {}).get(k)
+            if va != vb:
+                print(f"   {k}: {va} → {vb}")
+    print(f"{'case':<26} {(a.get('commit') or '?')[:10]:>12} {(b.get('commit') or '?')[:10]:>12}   change")
+    slower = []
+    for name in sorted(set(a["cases"]) | set(b["cases"])):
+        ra, rb = a["cases"].get(name, {}), b["cases"].get(name, {})
+        pa, pb = ra.get("p50_s"), rb.get("p50_s")
+        fmt = lambda p, r: f"{p * 1000:9.1f} ms" if p is not None else f"{'error' if 'error' in r else '—':>12}"
+        change = ""
+        if pa and pb:
+            ratio = pb / pa
+            change = f"{ratio:6.2f}×"
+            if abs(pb - pa) * 1000 < min_ms:
+                pass
+            elif ratio > 1 + threshold:
+                change += "  ▲ slower"
+                slower.append(name)
+            elif ratio < 1 / (1 + threshold):
+                change += "  ▼ faster"
+        elif "error" in rb and "error" not in ra:
+            change = f"  ❌ {rb['error']}"
+            slower.append(name)
+        print(f"{name:<26} {fmt(pa, ra)} {fmt(pb, rb)}   {change}")
+    return slower
+
+
+def main():
+    p = argparse.ArgumentParser(description="Benchmark the dashboard queries on synthetic data")
+    p.add_argument("--dsn", help="Scratch database (default: $BENCH_DSN)")
+    sub = p.add_subparsers(dest="cmd", required=True)
+
+    i = sub.add_parser("init", help="Apply database/schema.sql to an empty database")
+    i.add_argument("--schema", default=SCHEMA, help="Schema file to apply")
+
+    g = sub.add_parser("generate", help="Fill the database with synthetic runs and trades")
+    g.add_argument("--trades", type=int, default=100_000, help="Trades to create (e.g. 10000 … 50000000)")
+    g.add_argument("--batches", type=int, default=1000, help="Distinct backtest batch_ids")
+    g.add_argument("--dup-ratio", type=float, default=0.05,
+                   help="Fraction of batches run more than once")
+    g.add_argument("--live-runs", type=int, default=60, help="PAPER sessions without a batch_id")
+    g.add_argument("--days", type=int, default=90, help="Time span, ending now")
+    g.add_argument("--open-ratio", type=float, default=0.05, help="Fraction of trades never sold")
+    g.add_argument("--new-trades-every", type=int, default=2,
+                   help="Every Nth trade also gets new_trades buy/sell rows (0 = none)")
+    g.add_argument("--seed", type=int, default=42)
+    g.add_argument("--force", action="store_true", help="Add to a database that already has runs")
+
+    r = sub.add_parser("run", help="Time the loaders and write JSON results")
+    r.add_argument("--repeat", type=int, default=5, help="Timed runs per case")
+    r.add_argument("--case", action="append", help="Only this case (repeatable)")
+    r.add_argument("--out", help="Write results here (default: stdout)")
+
+    c = sub.add_parser("compare", help="Compare two `run` results")
+    c.add_argument("before")
+    c.add_argument("after")
+    c.add_argument("--threshold", type=float, default=0.2,
+                   help="Flag p50 changes beyond this fraction (exit 1 on slowdowns)")
+    c.add_argument("--min-ms", type=float, default=5.0,
+                   help="Ignore p50 changes smaller than this")
+    args = p.parse_args()
+
+    if args.cmd == "compare":
+        before, after = (json.loads(Path(f).read_text()) for f in (args.before, args.after))
+        sys.exit(1 if compare(before, after, args.threshold, args.min_ms) else 0)
+
+    dsn = _dsn(args)
+    if args.cmd == "init":
+        init(dsn, args.schema)
+    elif args.cmd == "generate":
+        generate(dsn, args.trades, args.batches, args.dup_ratio, args.live_runs, args.days,
+                 args.open_ratio, args.new_trades_every, seed=args.seed, force=args.force)
+    else:
+        result = run(dsn, args.repeat, args.case)
+        text = json.dumps(result, indent=2, default=str)
+        if args.out:
+            Path(args.out).write_text(text + "\n")
+            print(f"📝 Wrote {args.out}")
+        else:
+            print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# Bulk loader for trades / new_trades / stock_ohlc / gain_loss.
+#
+# A reader thread parses the CSV into batches and hands them over a bounded
+# queue, so it blocks (backpressure) whenever the database falls behind.
+# Each batch is COPYed into a temp staging table holding just the file's
+# columns, then moved into the target with one INSERT … SELECT … ON CONFLICT
+# and committed. The header row names the target columns.
+import os
+import sys
+import csv
+import io
+import time
+import queue
+import argparse
+import threading
+
+import psycopg2
+from psycopg2 import sql
+
+TABLES = ("trades", "new_trades", "stock_ohlc", "gain_loss")
+SERIAL_COLUMNS = {"trade_id", "symbol_id", "gain_loss_id"}
+
+_DONE = object()
+
+
+def read_batches(path, batch_size, out, columns=None):
+    f = sys.stdin if path == "-" else open(path, newline="")
+    try:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            raise ValueError(f"{path}: empty file")
+        out.put([c.strip() for c in (columns or header)])
+        batch = []
+        for row in reader:
+            if not row:
+                continue
+            batch.append(row)
+            if len(batch) >= batch_size:
+                out.put(batch)      # blocks while --max-pending batches are queued
+                batch = []
+        if batch:
+            out.put(batch)
+    except BaseException as e:
+        out.put(e)
+        return
+    finally:
+        if f is not sys.stdin:
+            f.close()
+    out.put(_DONE)
+
+
+def table_columns(cur, table):
+    cur.execute(
+        """
+        SELECT column_name
+          FROM information_schema.columns
+         WHERE table_schema = current_schema()
+           AND table_name = %s
+        """,
+        (table,),
+    )
+    return {r[0] for r in cur.fetchall()}
+
+
+def conflict_key(cur, table, columns):
+    # the primary key, else the first UNIQUE constraint, the file fully covers
+    # (trades: (trade_id, buy_time) once partitioned; stock_ohlc: (symbol, symbol_date))
+    cur.execute(
+        """
+        SELECT array_agg(a.attname::text ORDER BY k.ord)
+          FROM pg_constraint c
+         CROSS JOIN unnest(c.conkey) WITH ORDINALITY AS k(attnum, ord)
+          JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = k.attnum
+         WHERE c.conrelid = %s::regclass
+           AND c.contype IN ('p', 'u')
+         GROUP BY c.oid, c.contype
+         ORDER BY c.contype
+        """,
+        (table,),
+    )
+    return next((k for (k,) in cur.fetchall() if set(k) <= set(columns)), [])
+
+
+def merge_sql(table, columns, key, on_conflict):
+    cols = sql.SQL(", ").join(map(sql.Identifier, columns))
+    if not key or on_conflict == "error":
+        conflict = sql.SQL("")
+    elif on_conflict == "ignore":
+        conflict = sql.SQL("ON CONFLICT ({}) DO NOTHING").format(
+            sql.SQL(", ").join(map(sql.Identifier, key)))
+    else:
+        updates = [c for c in columns if c not in key]
+        conflict = sql.SQL("ON CONFLICT ({}) DO {}").format(
+            sql.SQL(", ").join(map(sql.Identifier, key)),
+            sql.SQL("UPDATE SET {}").format(sql.SQL(", ").join(
+                sql.SQL("{0} = EXCLUDED.{0}").format(sql.Identifier(c)) for c in updates))
+            if updates else sql.SQL("NOTHING"),
+        )
+    # a key repeated inside one batch would make ON CONFLICT DO UPDATE fail;
+    # the last row in the file wins, as it would row-at-a-time
+    dedupe = order = sql.SQL("")
+    if key:
+        k = sql.SQL(", ").join(map(sql.Identifier, key))
+        dedupe = sql.SQL("DISTINCT ON ({})").format(k)
+        order = sql.SQL("ORDER BY {}, ctid DESC").format(k)
+    return sql.SQL("INSERT INTO {t} ({c}) SELECT {d} {c} FROM bulk_stage {o} {x}").format(
+        t=sql.Identifier(table), c=cols, d=dedupe, o=order, x=conflict)
+
+
+def load(dsn, table, path, batch_size=10_000, max_pending=4, key=None,
+         on_conflict="update", columns=None):
+    q = queue.Queue(maxsize=max_pending)
+    reader = threading.Thread(target=read_batches, args=(path, batch_size, q, columns),
+                              daemon=True)
+    reader.start()
+
+    columns = q.get()
+    if isinstance(columns, BaseException):
+        raise columns
+    conn = psycopg2.connect(dsn)
+    total, t0 = 0, time.perf_counter()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SET statement_timeout = 0")
+            missing = set(columns) - table_columns(cur, table)
+            if missing:
+                raise ValueError(f"{table} has no column(s): {', '.join(sorted(missing))}")
+            if key is None:
+                key = conflict_key(cur, table, columns)
+            if not set(key) <= set(columns):
+                raise ValueError(f"upsert key {key} is not in the file")
+            cur.execute(sql.SQL(
+                "CREATE TEMP TABLE bulk_stage ON COMMIT DELETE ROWS AS "
+                "SELECT {c} FROM {t} WITH NO DATA").format(
+                    c=sql.SQL(", ").join(map(sql.Identifier, columns)),
+                    t=sql.Identifier(table)))
+            conn.commit()
+
+            copy = sql.SQL("COPY bulk_stage ({}) FROM STDIN WITH (FORMAT csv)").format(
+                sql.SQL(", ").join(map(sql.Identifier, columns))).as_string(conn)
+            merge = merge_sql(table, columns, key, on_conflict)
+
+            while True:
+                batch = q.get()
+                if batch is _DONE:
+                    break
+                if isinstance(batch, BaseException):
+                    raise batch
+                buf = io.StringIO()
+                csv.writer(buf).writerows(batch)
+                buf.seek(0)
+                cur.copy_expert(copy, buf)
+                cur.execute(merge)
+                conn.commit()
+                total += len(batch)
+                elapsed = time.perf_counter() - t0
+                print(f"📥 {total:,} rows  {total / elapsed:,.0f} rows/s  "
+                      f"(queue {q.qsize()}/{max_pending})")
+
+            # explicit ids leave the serial behind; move it past them
+            for col in SERIAL_COLUMNS & set(columns):
+                cur.execute(
+                    sql.SQL("SELECT setval(pg_get_serial_sequence(%s, %s), "
+                            "GREATEST((SELECT MAX({c}) FROM {t}), 1))").format(
+                        c=sql.Identifier(col), t=sql.Identifier(table)),
+                    (table, col),
+                )
+            conn.commit()
+    finally:
+        conn.close()
+    elapsed = time.perf_counter() - t0
+    return total, elapsed
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="COPY-based bulk loader for trade and bar tables")
+    p.add_argument("table", help=f"Target table ({', '.join(TABLES)} or any other)")
+    p.add_argument("path", help="CSV file with a header row, or - for stdin")
+    p.add_argument("--batch-size", type=int, default=int(os.getenv("BULK_BATCH_SIZE", 10_000)),
+                   help="Rows per COPY/commit")
+    p.add_argument("--max-pending", type=int, default=4,
+                   help="Parsed batches allowed to queue up before the reader waits")
+    p.add_argument("--key", help="Comma-separated upsert key (default: the table's "
+                                 "primary key or unique constraint)")
+    p.add_argument("--on-conflict", choices=["update", "ignore", "error"], default="update")
+    p.add_argument("--columns", help="Comma-separated column names, overriding the header row")
+    args = p.parse_args(argv)
+
+    dsn = os.getenv("DSN", "")
+    if not dsn:
+        print("❌ DSN not set", file=sys.stderr)
+        sys.exit(1)
+
+    try:
+        total, elapsed = load(
+            dsn, args.table, args.path,
+            batch_size=args.batch_size, max_pending=args.max_pending,
+            key=args.key.split(",") if args.key else None,
+            on_conflict=args.on_conflict,
+            columns=args.columns.split(",") if args.columns else None,
+        )
+    except (ValueError, psycopg2.Error) as e:
+        print(f"❌ Load failed: {e}", file=sys.stderr)
+        sys.exit(1)
+    rate = total / elapsed if elapsed > 0 else 0
+    print(f"✅ {total:,} rows into {args.table} in {elapsed:.1f}s ({rate:,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,35 @@
 import os
-import subprocess
-import json
 from datetime import datetime
 from pathlib import Path
 
+import rerun_profile
+prof = rerun_profile.start("dashboard_diagnostics")
+
 import streamlit as st
-import toml
-import importlib
 import pandas as pd
-from sqlalchemy import create_engine, inspect, text
+from psycopg2 import errors
+
+import diagnostics
+import metrics
+import backtest_jobs
+import backtest_jobs_ui
+import indicators
+from db_pool import connection
+
+prof.mark("imports")
 
 # ————— Page config —————
 st.set_page_config(page_title="LiuAlgoTrader Diagnostics", layout="wide")
 st.title("🔍 LiuAlgoTrader Environment Diagnostics")
+metrics.serve()     # METRICS_PORT; once per process
 
 # ————— Sidebar: Run Health Check button —————
 if "health_check" not in st.session_state:
     st.session_state.health_check = True
+full_rebuild = st.sidebar.checkbox(
+    "Full rebuild", value=False,
+    help="Re-examine every batch instead of only those changed since the last diagnostics.json",
+)
 if st.sidebar.button("🔄 Run Health Check"):
     st.session_state.health_check = True
 
@@ -27,102 +40,17 @@ env = {k: os.getenv(k, "") for k in required_env}
 st.subheader("📦 Environment Variables")
 env_df = pd.DataFrame(list(env.items()), columns=["Variable", "Value"]).set_index("Variable")
 st.table(env_df)
+prof.mark("environment")
 
-# ————— 2a) Cache a single DB engine instance —————
-@st.cache_resource
-def get_engine(dsn: str):
-    return create_engine(dsn)
-
-# ————— 2b) Diagnostics logic —————
-@st.cache_data(ttl=0)
-def collect_diagnostics(env: dict):
-    issues = []
-    batches = []
-    backtests = []
-
-    # 2.1) DSN check
-    dsn = env["DSN"]
-    engine = None
-    if not dsn:
-        issues.append("DSN not set")
-    else:
-        try:
-            engine = get_engine(dsn)
-            with engine.connect():
-                pass  # simple round‐trip
-        except Exception as e:
-            issues.append(f"DSN connection error: {e}")
-
-    # 2.2) TRADEPLAN_DIR + TOML parse
-    tp_dir = env["TRADEPLAN_DIR"]
-    if not tp_dir:
-        issues.append("TRADEPLAN_DIR not set")
-    else:
-        tp = Path(tp_dir)
-        tp_toml = tp / "tradeplan.toml"
-        if not tp.exists():
-            issues.append(f"TRADEPLAN_DIR does not exist: {tp}")
-        elif not tp_toml.exists():
-            issues.append(f"tradeplan.toml not found in {tp}")
-@@ -105,77 +106,109 @@ def collect_diagnostics(env: dict):
-                tc = engine.execute(
-                    text(
-                        """
-                        SELECT COUNT(*) FROM trades t
-                          JOIN algo_run ar
-                            ON t.algo_run_id = ar.algo_run_id
-                         WHERE ar.batch_id = :bid
-                        """
-                    ),
-                    {"bid": bid},
-                ).scalar() or 0
-
-                batches.append({
-                    "batch_id":    bid,
-                    "run_count":   rc,
-                    "trade_count": int(tc),
-                })
-
-                # flag duplicates
-                if rc > 1:
-                    issues.append(f"batch_id '{bid}' appears {rc}×")
-                # flag empty runs
-                if tc == 0:
-                    issues.append(f"No trades found for batch_id '{bid}'")
-
-        # optional backtests table
-        if insp.has_table("backtests"):
-            try:
-                bt_df = pd.read_sql(
-                    """
-                    SELECT batch_id,
-                           run_at,
-                           symbols,
-                           win_rate,
-                           net_profit
-                      FROM backtests
-                     ORDER BY run_at DESC
-                     LIMIT 5
-                    """,
-                    engine,
-                )
-                backtests = bt_df.to_dict("records")
-            except Exception as e:
-                issues.append(f"Error reading backtests: {e}")
-        else:
-            issues.append("Missing table: backtests")
-
-    return {
-        "env":       env,
-        "issues":    issues,
-        "batches":   batches,
-        "backtests": backtests,
-        "timestamp": datetime.utcnow().isoformat(),
-    }
+# ————— 2) Diagnostics (see diagnostics.py) —————
+out_path = Path(__file__).parent / "diagnostics.json"
 
 # ————— 3) Display diagnostics if needed —————
 if st.session_state.health_check:
-    diag = collect_diagnostics(env)
+    previous = None if full_rebuild else diagnostics.load(out_path)
+    with metrics.query_timer("dashboard_diagnostics", "collect_diagnostics"):
+        diag = diagnostics.collect_diagnostics(env, previous)
+    metrics.record_issues(diag["issues"])
 
     st.subheader("🕒 Recent Batch IDs (with run_count / trade_count)")
     if diag["batches"]:
@@ -132,6 +60,8 @@ if st.session_state.health_check:
         )
     else:
         st.info("No batches found in algo_run.")
+    st.caption(f"Batch scan: {diag['scan']['mode']}, "
+               f"{diag['scan']['examined']} batch(es) re-examined")
 
     st.subheader("🚨 Detected Issues")
     if diag["issues"]:
@@ -149,10 +79,8 @@ if st.session_state.health_check:
     else:
         st.info("No backtests found (or table is missing).")
 
-    # write out diagnostics.json
-    out_path = Path(__file__).parent / "diagnostics.json"
-    with open(out_path, "w") as f:
-        json.dump(diag, f, indent=2)
+    # write out diagnostics.json (atomically — the Fixer may be reading it)
+    diagnostics.write_atomic(out_path, diag)
     st.caption(f"Diagnostics written to `{out_path}`")
 
     # download button
@@ -166,6 +94,7 @@ if st.session_state.health_check:
 
     # reset the flag until next click
     st.session_state.health_check = False
+prof.mark("diagnostics")
 
 # ————— Sidebar: ⚡ Run Backtest —————
 st.sidebar.markdown("---")
@@ -173,4 +102,64 @@ st.sidebar.header("⚡ Run Backtest")
 
 default_tp = Path(env.get("TRADEPLAN_DIR", ".")) / "tradeplan.toml"
 
-with st.sidebar.form("run_backtest", clear_on_submit=False):
\ No newline at end of file
+with st.sidebar.form("run_backtest", clear_on_submit=False):
+    tp_in    = st.text_input("Tradeplan TOML", str(default_tp))
+    syms_in  = st.text_input("Symbols (comma-separated)", "AAPL,MSFT,GOOG")
+    dt0      = st.date_input("Start Date", datetime.today())
+    dt1      = st.date_input("End Date",   datetime.today())
+    batch_in = st.text_input("Batch ID", f"run-{datetime.now():%Y%m%d-%H%M%S}")
+    prio_in  = st.selectbox("Priority", list(backtest_jobs.PRIORITIES), index=1)
+    no_cache = st.checkbox("Bypass result cache", value=False)
+    go_bt    = st.form_submit_button("▶️ Queue Backtest")
+
+if go_bt:
+    try:
+        job_id = backtest_jobs.submit(env["DSN"], "dashboard_diagnostics", tp_in, syms_in, dt0, dt1, batch_in,
+                                      backtest_jobs.PRIORITIES[prio_in], no_cache=no_cache)
+        st.sidebar.success(f"📨 Queued job {job_id}")
+    except errors.UndefinedTable:
+        st.sidebar.error("No backtest_jobs table — apply database/add_backtest_jobs.sql")
+    except Exception as e:
+        st.sidebar.error(f"Could not queue backtest: {e}")
+prof.mark("run_backtest")
+
+# ————— Backtest jobs (run by `backtest_jobs.py worker`) —————
+backtest_jobs_ui.render_jobs(env["DSN"], "dashboard_diagnostics")
+prof.mark("jobs")
+
+# ————— Indicator breakdown (keys promoted by `indicators.py promote`) —————
+st.subheader("📐 Indicator Breakdown")
+try:
+    with metrics.query_timer("dashboard_diagnostics", "indicator_columns"), \
+            connection(env["DSN"]) as conn, conn.cursor() as cur:
+        promoted = indicators.registry(cur)
+except errors.UndefinedTable:
+    promoted = None
+except Exception as e:
+    promoted = []
+    st.error(f"Could not read indicator columns: {e}")
+if promoted is None:
+    st.info("Indicator columns not installed — apply database/add_indicator_columns.sql")
+elif not promoted:
+    st.info("No indicator keys promoted yet — `python indicators.py promote trades.buy_indicators rsi`")
+else:
+    choices = [f"{r['source']} · {r['key']}" for r in promoted]
+    c1, c2, c3 = st.columns([3, 1, 2])
+    picked = promoted[choices.index(c1.selectbox("Indicator", choices))]
+    bins = c2.number_input("Buckets", 2, 50, 10)
+    where = c3.text_input("Filter", "", help='e.g. "macd>0, rsi<70"')
+    if picked["backfill_end"] is not None:
+        st.warning(f"Backfill in progress ({picked['backfilled_to']:,}/{picked['backfill_end']:,}); "
+                   "older rows are missing")
+    try:
+        with metrics.query_timer("dashboard_diagnostics", "indicator_breakdown"):
+            stats = indicators.aggregate(env["DSN"], picked["source"], picked["key"], bins,
+                                         [w for w in where.split(",") if w.strip()])
+        st.dataframe(stats, use_container_width=True)
+        metric = next((m for m in ("win_rate", "avg_return", "avg_price") if m in stats), None)
+        if metric and not stats.empty:
+            st.bar_chart(stats.set_index(stats.columns[0])[metric], height=250)
+    except ValueError as e:
+        st.error(str(e))
+prof.mark("indicators")
+prof.finish()
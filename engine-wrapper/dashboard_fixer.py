@@ -1,19 +1,26 @@
 # engine-wrapper/dashboard_fixer.py
-import os
-import subprocess
 import json
 from datetime import datetime
 from pathlib import Path
 
+import rerun_profile
+prof = rerun_profile.start("dashboard_fixer")
+
 import streamlit as st
-import toml
-import importlib
 import pandas as pd
-from sqlalchemy import create_engine, inspect, text
+from psycopg2 import errors
+
+import metrics
+import backtest_jobs
+import backtest_jobs_ui
+import dedupe_batches
+
+prof.mark("imports")
 
 # ————— Page config —————
 st.set_page_config(page_title="LiuAlgoTrader Fixer", layout="wide")
 st.title("🔧 LiuAlgoTrader Environment & Data Fixer")
+metrics.serve()     # METRICS_PORT; once per process
 
 # ————— Load diagnostics.json (auto-refresh on re-run) —————
 diag_path = Path(__file__).parent / "diagnostics.json"
@@ -21,6 +28,7 @@ if diag_path.exists():
     diagnostics = json.loads(diag_path.read_text())
 else:
     st.error("No diagnostics.json found — run the Diagnostics app first.")
+    prof.finish()
     st.stop()
 
 # ————— Fix Summary —————
@@ -63,6 +71,7 @@ if st.sidebar.button("💾 Save ENV to ~/.bashrc"):
     st.sidebar.success("✅ Wrote to ~/.bashrc — open a new shell to pick up.")
 
 st.sidebar.markdown("---")
+prof.mark("environment")
 
 # ————— Duplicate Batch Cleanup —————
 st.subheader("🗑️ Duplicate Batch Cleanup")
@@ -70,41 +79,39 @@ batches = pd.DataFrame(diagnostics["batches"])
 dupes = batches.loc[batches["run_count"] > 1]
 if not dupes.empty:
     st.table(dupes)
-    pick = st.selectbox("Pick batch_id to dedupe", dupes["batch_id"].tolist())
-    if st.button("🗑️ Remove old duplicates"):
+    picked = st.multiselect("Limit to batch_ids (empty = all duplicated batches)",
+                            dupes["batch_id"].tolist())
+    c1, c2 = st.columns(2)
+    if c1.button("🔍 Estimate (dry run)"):
         try:
-            engine = create_engine(env["DSN"])
-            delete_sql = text("""
-                -- delete dependent trades first
-                DELETE FROM trades
-                 WHERE algo_run_id IN (
-                   SELECT algo_run_id
-                     FROM algo_run
-                    WHERE batch_id = :bid
-                      AND algo_run_id <> (
-                        SELECT MAX(algo_run_id)
-                          FROM algo_run
-                         WHERE batch_id = :bid
-                      )
-                 );
-                -- then remove old algo_run entries
-                DELETE FROM algo_run
-                 WHERE batch_id = :bid
-                   AND algo_run_id <> (
-                     SELECT MAX(algo_run_id)
-                       FROM algo_run
-                      WHERE batch_id = :bid
-                   );
-            """)
-            with engine.begin() as conn:
-                conn.execute(delete_sql, {"bid": pick})
-            st.success(f"Cleaned duplicates for {pick}")
+            plan, est = dedupe_batches.estimate(env["DSN"], picked or None)
+            st.info(f"Would delete {est['runs']:,} runs of {est['batches']:,} batches: "
+                    f"{est['trades']:,} trades, {est['new_trades']:,} new_trades.")
+            if plan:
+                st.dataframe(pd.DataFrame(plan).assign(runs=lambda d: d["runs"].map(len)),
+                             use_container_width=True)
+        except Exception as e:
+            st.error(f"Estimate failed: {e}")
+    if c2.button("🗑️ Remove old duplicates"):
+        bar = st.progress(0.0, text="Finding duplicated batches…")
+
+        def report(done, total, bid):
+            bar.progress(min(done / total, 1.0) if total else 1.0,
+                         text=f"{done:,}/{total:,} rows — {bid}")
+
+        try:
+            done = dedupe_batches.dedupe(env["DSN"], picked or None, progress=report)
+            bar.progress(1.0, text="Done")
+            st.success(f"Deleted {done['runs']:,} old runs of {done['batches']:,} batches "
+                       f"({done['trades']:,} trades, {done['new_trades']:,} new_trades) "
+                       f"in {done['seconds']:.1f}s — re-run Diagnostics to refresh the list.")
         except Exception as e:
             st.error(f"Failed to clean duplicates: {e}")
 else:
     st.info("No duplicate batch_ids detected.")
 
 st.markdown("---")
+prof.mark("duplicates")
 
 # ————— Tradeplan Editor —————
 st.subheader("📝 Tradeplan Editor")
@@ -122,6 +129,7 @@ if st.button("💾 Save tradeplan.toml"):
         st.error(f"Failed to save TOML: {e}")
 
 st.markdown("---")
+prof.mark("tradeplan")
 
 # ————— Sidebar: ⚡ Run Backtest —————
 st.sidebar.header("⚡ Run Backtest")
@@ -132,31 +140,25 @@ with st.sidebar.form("run_backtest", clear_on_submit=False):
     dt0      = st.date_input("Start Date", datetime.today())
     dt1      = st.date_input("End Date",   datetime.today())
     batch_in = st.text_input("Batch ID", f"run-{datetime.now():%Y%m%d-%H%M%S}")
-    go_bt    = st.form_submit_button("▶️ Run Backtest")
+    prio_in  = st.selectbox("Priority", list(backtest_jobs.PRIORITIES), index=1)
+    no_cache = st.checkbox("Bypass result cache", value=False)
+    chunk_in = st.number_input("Chunk (trading days, 0 = one run)", min_value=0, value=0, step=5,
+                               help="Checkpointed run: resumes from the last finished chunk")
+    go_bt    = st.form_submit_button("▶️ Queue Backtest")
 
 if go_bt:
-    cmd = [
-        "python", "-m", "liualgotrader.enhanced_backtest",
-        "--tradeplan", tp_in,
-        "--symbols",  syms_in,
-        "--start-date", dt0.strftime("%Y-%m-%d"),
-        "--end-date",   dt1.strftime("%Y-%m-%d"),
-        "--batch-id",   batch_in,
-    ]
-    st.info("Running backtest… this may take a minute.")
-    st.code(" ".join(cmd), language="bash")
     try:
-        res = subprocess.run(cmd, capture_output=True, text=True,
-                             env=os.environ,
-                             cwd=str(Path(tp_in).parent))
-        st.subheader("📟 Backtest Output")
-        st.text_area("STDOUT & STDERR",
-                     value=res.stdout + "\n\n" + res.stderr,
-                     height=300)
-        if res.returncode == 0:
-            st.success("Backtest completed successfully! ✅")
-        else:
-            st.error(f"Backtest exited with code {res.returncode}")
+        job_id = backtest_jobs.submit(env["DSN"], "dashboard_fixer", tp_in, syms_in, dt0, dt1, batch_in,
+                                      backtest_jobs.PRIORITIES[prio_in], no_cache=no_cache,
+                                      chunk_days=int(chunk_in))
+        st.sidebar.success(f"📨 Queued job {job_id}")
+    except errors.UndefinedTable:
+        st.sidebar.error("No backtest_jobs table — apply database/add_backtest_jobs.sql")
     except Exception as e:
-        st.exception(f"Error launching backtest: {e}")
-    st.warning("When it’s done, click **Run Diagnostics** in the other app to re-validate tables.")
+        st.sidebar.error(f"Could not queue backtest: {e}")
+prof.mark("run_backtest")
+
+# ————— Backtest jobs (run by `backtest_jobs.py worker`) —————
+backtest_jobs_ui.render_jobs(env["DSN"], "dashboard_fixer")
+prof.mark("jobs")
+prof.finish()
@@ -0,0 +1,191 @@
+# Shared Postgres connection pool for the dashboards and tools.
+#
+#   from db_pool import connection
+#   with connection(DSN) as conn:
+#       df = pd.read_sql(sql, conn)
+#
+# One pool per DSN per process. Connections are opened lazily, health-checked
+# when they have been idle for a while, and carry a server-side
+# statement_timeout. Tunables come from the environment:
+#   DB_POOL_SIZE             max open connections        (default 5)
+#   DB_POOL_TIMEOUT_S        max wait for a free one     (default 10)
+#   DB_STATEMENT_TIMEOUT_MS  per-statement limit, 0=off  (default 15000)
+#   DB_HEALTHCHECK_S         idle time before SELECT 1   (default 30)
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import extensions
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class Pool:
+    def __init__(self, dsn, size=None, timeout=None, statement_timeout_ms=None,
+                 healthcheck_s=None):
+        self.dsn                  = dsn
+        self.size                 = (size if size is not None
+                                     else int(os.getenv("DB_POOL_SIZE", 5)))
+        self.timeout              = (timeout if timeout is not None
+                                     else float(os.getenv("DB_POOL_TIMEOUT_S", 10)))
+        self.statement_timeout_ms = (statement_timeout_ms if statement_timeout_ms is not None
+                                     else int(os.getenv("DB_STATEMENT_TIMEOUT_MS", 15000)))
+        self.healthcheck_s        = (healthcheck_s if healthcheck_s is not None
+                                     else float(os.getenv("DB_HEALTHCHECK_S", 30)))
+
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock  = threading.Lock()
+        self._idle  = []    # [(conn, returned_at)]
+        self._stats = {
+            "in_use":          0,
+            "waits":           0,
+            "wait_s_total":    0.0,
+            "timeouts":        0,
+            "connects":        0,
+            "connect_s_total": 0.0,
+            "connect_s_last":  0.0,
+            "discarded":       0,
+        }
+
+    # ————— internals —————
+    def _connect(self):
+        t0 = time.monotonic()
+        opts = {}
+        if self.statement_timeout_ms:
+            opts["options"] = f"-c statement_timeout={self.statement_timeout_ms}"
+        conn = psycopg2.connect(self.dsn, **opts)
+        dt = time.monotonic() - t0
+        with self._lock:
+            self._stats["connects"] += 1
+            self._stats["connect_s_total"] += dt
+            self._stats["connect_s_last"] = dt
+        return conn
+
+    def _healthy(self, conn, idle_s):
+        if conn.closed:
+            return False
+        if idle_s < self.healthcheck_s:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, conn):
+        with self._lock:
+            self._stats["discarded"] += 1
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    def _checkout(self):
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                conn, returned_at = self._idle.pop()
+            if self._healthy(conn, time.monotonic() - returned_at):
+                return conn
+            self._discard(conn)
+        return self._connect()
+
+    def _checkin(self, conn):
+        if conn.closed or conn.get_transaction_status() == extensions.TRANSACTION_STATUS_UNKNOWN:
+            self._discard(conn)
+            return
+        if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            conn.rollback()
+        with self._lock:
+            self._idle.append((conn, time.monotonic()))
+
+    # ————— public —————
+    @contextmanager
+    def connection(self, statement_timeout_ms=None):
+        # same semantics as `with psycopg2.connect(...) as conn`: commit on
+        # success, roll back on error — but the connection goes back to the pool.
+        # statement_timeout_ms overrides the pool default for this block only
+        # (0 = no limit, for maintenance jobs).
+        t0 = time.monotonic()
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._stats["waits"] += 1
+            ok = self._slots.acquire(timeout=self.timeout)
+            with self._lock:
+                self._stats["wait_s_total"] += time.monotonic() - t0
+                if not ok:
+                    self._stats["timeouts"] += 1
+            if not ok:
+                raise PoolTimeout(f"no free connection after {self.timeout}s "
+                                  f"(pool size {self.size})")
+        try:
+            conn = self._checkout()
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._stats["in_use"] += 1
+        try:
+            if statement_timeout_ms is not None:
+                with conn.cursor() as cur:
+                    cur.execute("SET LOCAL statement_timeout = %s", (int(statement_timeout_ms),))
+            yield conn
+            if not conn.closed:
+                conn.commit()
+        except Exception:
+            if not conn.closed:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    conn.close()
+            raise
+        finally:
+            with self._lock:
+                self._stats["in_use"] -= 1
+            self._checkin(conn)
+            self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            s = dict(self._stats)
+            s["idle"] = len(self._idle)
+        s["size"] = self.size
+        s["open"] = s["in_use"] + s["idle"]
+        s["connect_s_avg"] = s["connect_s_total"] / s["connects"] if s["connects"] else 0.0
+        return s
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            conn.close()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(dsn):
+    with _pools_lock:
+        if dsn not in _pools:
+            _pools[dsn] = Pool(dsn)
+        return _pools[dsn]
+
+def connection(dsn, statement_timeout_ms=None):
+    return get_pool(dsn).connection(statement_timeout_ms)
+
+def all_stats():
+    with _pools_lock:
+        pools = dict(_pools)
+    # key by host/db only; DSNs may carry passwords
+    out = {}
+    for dsn, p in pools.items():
+        parts = extensions.parse_dsn(dsn)
+        out[f"{parts.get('host', 'local')}/{parts.get('dbname', '')}"] = p.stats()
+    return out
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+# Bulk cleanup of backtest batches that were run more than once.
+#
+# Each duplicated batch_id keeps its newest algo_run (highest algo_run_id).
+# Every older run is deleted along with the rows that hang off it: trades
+# (and their executions, via the trades trigger), new_trades, gain_loss and
+# trade_analysis. One window query over algo_run finds the losing runs of
+# all duplicated batches. The deletes then go `--chunk` rows at a time, each
+# chunk in its own short transaction with a lock_timeout. Nothing holds row
+# locks for long, and a delete that can't get a lock backs off and retries
+# instead of making the live trader's inserts queue up behind it.
+import os
+import sys
+import time
+import argparse
+
+import psycopg2
+from psycopg2 import errors
+
+CHUNK           = int(os.getenv("DEDUPE_CHUNK", 5000))
+RUN_GROUP       = 200       # losing runs handled together
+LOCK_TIMEOUT_MS = int(os.getenv("DEDUPE_LOCK_TIMEOUT_MS", 2000))
+RETRIES         = 6
+
+# Runs to delete: every run of a batch but its newest, and the run that
+# stays (`keep`). With purge, every run of the batch goes and none stays.
+LOSERS_SQL = """
+    SELECT algo_run_id, batch_id, CASE WHEN NOT %(purge)s THEN keep END
+      FROM (
+            SELECT algo_run_id, batch_id,
+                   MAX(algo_run_id) OVER (PARTITION BY batch_id) AS keep
+              FROM algo_run
+             WHERE batch_id <> ''
+               AND (%(only)s::text[] IS NULL OR batch_id = ANY(%(only)s))
+           ) r
+     WHERE %(purge)s OR algo_run_id <> keep
+     ORDER BY batch_id, algo_run_id
+"""
+
+COUNT_SQL = """
+    SELECT algo_run_id, COUNT(*)
+      FROM {table}
+     WHERE algo_run_id = ANY(%(runs)s)
+     GROUP BY algo_run_id
+"""
+
+# trades and new_trades can be huge: a bounded slice per statement
+CHUNK_SQL = """
+    DELETE FROM {table}
+     WHERE trade_id IN (SELECT trade_id
+                          FROM {table}
+                         WHERE algo_run_id = ANY(%(runs)s)
+                         LIMIT %(n)s)
+"""
+
+# at most a row per symbol per run
+SMALL_SQL = "DELETE FROM {table} WHERE algo_run_id = ANY(%(runs)s)"
+
+# runs pointing at a deleted run point at the batch's surviving one instead
+# (none, when the batch was purged)
+REPOINT_SQL = """
+    UPDATE algo_run a
+       SET ref_algo_run = m.keep
+      FROM unnest(%(runs)s::int[], %(keep)s::int[]) AS m(run, keep)
+     WHERE a.ref_algo_run = m.run
+"""
+
+RUNS_SQL = "DELETE FROM algo_run WHERE algo_run_id = ANY(%(runs)s)"
+
+CHUNKED = ("trades", "new_trades")
+SMALL   = ("gain_loss", "trade_analysis")
+
+
+def _present(cur, tables):
+    cur.execute("SELECT t FROM unnest(%s::text[]) t WHERE to_regclass(t) IS NOT NULL", (list(tables),))
+    return [r[0] for r in cur.fetchall()]
+
+
+def plan(cur, batch_ids=None, purge=False):
+    """Losing runs grouped by batch, with the rows each would take along.
+
+    Returns a list of {"batch_id", "keep", "runs", "trades", "new_trades"}
+    ordered by batch_id, where `runs` are the algo_run_ids to delete. With
+    purge (only together with batch_ids), all runs of those batches lose.
+    """
+    if purge and not batch_ids:
+        raise ValueError("purge needs batch_ids")
+    cur.execute(LOSERS_SQL, {"only": list(batch_ids) if batch_ids else None, "purge": purge})
+    losers = cur.fetchall()
+    runs = [r for r, _, _ in losers]
+    counts = {}
+    for table in _present(cur, CHUNKED):
+        cur.execute(COUNT_SQL.format(table=table), {"runs": runs})
+        counts[table] = dict(cur.fetchall())
+    batches = {}
+    for run, bid, keep in losers:
+        b = batches.setdefault(bid, {"batch_id": bid, "keep": keep, "runs": [],
+                                     "trades": 0, "new_trades": 0})
+        b["runs"].append(run)
+        for table in CHUNKED:
+            b[table] += counts.get(table, {}).get(run, 0)
+    return list(batches.values())
+
+
+def totals(batches):
+    return {
+        "batches":    len(batches),
+        "runs":       sum(len(b["runs"]) for b in batches),
+        "trades":     sum(b["trades"] for b in batches),
+        "new_trades": sum(b["new_trades"] for b in batches),
+    }
+
+
+def estimate(dsn, batch_ids=None):
+    """Dry run: what dedupe() would delete, changing nothing."""
+    with psycopg2.connect(dsn) as conn, conn.cursor() as cur:
+        cur.execute("SET TRANSACTION READ ONLY")
+        batches = plan(cur, batch_ids)
+    conn.close()
+    return batches, totals(batches)
+
+
+class _Session:
+    """One connection; every statement is its own transaction, retried when
+    it runs into lock_timeout. With rollback=True everything stays in one
+    transaction that is rolled back at the end (timing on a scratch copy)."""
+
+    def __init__(self, dsn, rollback=False):
+        self.conn     = psycopg2.connect(dsn)
+        self.rollback = rollback
+        self.waits    = 0
+        with self.conn.cursor() as cur:
+            cur.execute("SET statement_timeout = 0")
+            if not rollback:
+                cur.execute("SET lock_timeout = %s", (LOCK_TIMEOUT_MS,))
+        self.conn.commit()
+
+    def execute(self, sql, params):
+        for attempt in range(RETRIES):
+            try:
+                with self.conn.cursor() as cur:
+                    cur.execute(sql, params)
+                    n = cur.rowcount
+                if not self.rollback:
+                    self.conn.commit()
+                return n
+            except errors.LockNotAvailable:
+                if self.rollback or attempt == RETRIES - 1:
+                    raise
+                self.conn.rollback()
+                self.waits += 1
+                time.sleep(0.25 * 2 ** attempt)
+
+    def close(self):
+        if self.rollback:
+            self.conn.rollback()
+        self.conn.close()
+
+
+def dedupe(dsn, batch_ids=None, chunk=CHUNK, progress=None, rollback=False, purge=False):
+    """Delete the older runs of every duplicated batch (or of `batch_ids`).
+
+    purge=True deletes every run of `batch_ids`, e.g. what an interrupted
+    backtest wrote before it is run again.
+
+    progress(done, total, batch_id) is called after every chunk with the
+    trades + new_trades rows deleted so far. Returns the totals actually
+    deleted plus `seconds` and `lock_waits`.
+    """
+    t0 = time.monotonic()
+    session = _Session(dsn, rollback)
+    try:
+        with session.conn.cursor() as cur:
+            batches = plan(cur, batch_ids, purge)
+            chunked = _present(cur, CHUNKED)
+            small = _present(cur, SMALL)
+        if not session.rollback:
+            session.conn.commit()
+        est = totals(batches)
+        total = est["trades"] + est["new_trades"]
+        done = {"batches": 0, "runs": 0, "trades": 0, "new_trades": 0,
+                "gain_loss": 0, "trade_analysis": 0}
+
+        def clear(runs, bid):
+            for table in chunked:
+                while True:
+                    n = session.execute(CHUNK_SQL.format(table=table), {"runs": runs, "n": chunk})
+                    done[table] += n
+                    if progress:
+                        progress(done["trades"] + done["new_trades"], total, bid)
+                    if n < chunk:
+                        break
+            for table in small:
+                done[table] += session.execute(SMALL_SQL.format(table=table), {"runs": runs})
+
+        # groups of whole batches, so a batch is never left half-cleaned
+        group = []
+        for i, b in enumerate(batches):
+            group.append(b)
+            if sum(len(g["runs"]) for g in group) < RUN_GROUP and i < len(batches) - 1:
+                continue
+            runs = [r for g in group for r in g["runs"]]
+            keep = [g["keep"] for g in group for _ in g["runs"]]
+            clear(runs, b["batch_id"])
+            session.execute(REPOINT_SQL, {"runs": runs, "keep": keep})
+            try:
+                done["runs"] += session.execute(RUNS_SQL, {"runs": runs})
+            except errors.ForeignKeyViolation:
+                # a run that was still writing trades; sweep once more
+                session.conn.rollback()
+                if session.rollback:
+                    raise
+                clear(runs, b["batch_id"])
+                done["runs"] += session.execute(RUNS_SQL, {"runs": runs})
+            done["batches"] += len(group)
+            group = []
+    finally:
+        session.close()
+    done["seconds"] = round(time.monotonic() - t0, 3)
+    done["lock_waits"] = session.waits
+    return done
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Delete the older runs of duplicated backtest batches")
+    p.add_argument("--batch-id", action="append", help="Only this batch (repeatable; default: all)")
+    p.add_argument("--dry-run", action="store_true", help="Show what would be deleted")
+    p.add_argument("--chunk", type=int, default=CHUNK, help="Rows per delete statement")
+    p.add_argument("--rollback", action="store_true",
+                   help="Run every delete in one transaction and roll it back (for timing)")
+    args = p.parse_args(argv)
+
+    dsn = os.getenv("DSN", "")
+    if not dsn:
+        print("❌ DSN not set", file=sys.stderr)
+        sys.exit(1)
+
+    batches, est = estimate(dsn, args.batch_id)
+    for b in sorted(batches, key=lambda b: -b["trades"])[:20]:
+        print(f"{b['batch_id']:<32} keep {b['keep']:>8}  delete {len(b['runs']):>3} run(s)  "
+              f"{b['trades']:>10,} trades  {b['new_trades']:>10,} new_trades")
+    print(f"📋 {est['batches']:,} duplicated batches: {est['runs']:,} runs, "
+          f"{est['trades']:,} trades, {est['new_trades']:,} new_trades to delete")
+    if args.dry_run or not batches:
+        return
+
+    t0, last = time.monotonic(), 0.0
+
+    def report(done, total, bid):
+        nonlocal last
+        now = time.monotonic()
+        if now - last >= 1 or done == total:
+            last = now
+            print(f"🗑️ {done:,}/{total:,} rows ({done / max(now - t0, 1e-9):,.0f}/s) — {bid}")
+
+    try:
+        done = dedupe(dsn, args.batch_id, args.chunk, report, args.rollback)
+    except psycopg2.Error as e:
+        print(f"❌ Cleanup failed: {e}", file=sys.stderr)
+        sys.exit(1)
+    verb = "rolled back" if args.rollback else "deleted"
+    print(f"✅ {done['runs']:,} runs of {done['batches']:,} batches {verb} "
+          f"({done['trades']:,} trades, {done['new_trades']:,} new_trades) in {done['seconds']:.1f}s"
+          + (f", {done['lock_waits']} lock wait(s)" if done["lock_waits"] else ""))
+
+
+if __name__ == "__main__":
+    main()
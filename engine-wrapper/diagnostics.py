@@ -0,0 +1,226 @@
+# Health checks behind the Diagnostics dashboard (dashboard_diagnostics.py).
+#
+# Kept free of Streamlit so the CLI tools can run the same checks. Batch
+# statistics come from one aggregate query. Given the previous
+# diagnostics.json, only batches whose algo_run/trades rows are newer than
+# that snapshot's watermarks are re-examined; a delete on either table since
+# then (counted by database/add_diagnostics_watermark.sql) forces a full
+# rebuild, as does a database without that migration.
+#
+# Ids are handed out at insert, not at commit: a backtest that commits after
+# a higher id was already counted sits below the watermark. Each incremental
+# pass therefore also re-examines the last DIAGNOSTICS_RESCAN_RUNS runs and
+# DIAGNOSTICS_RESCAN_TRADES trades below the previous watermarks; a commit
+# later than that is only picked up by the next full rebuild.
+import importlib.util
+import json
+import os
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+from db_pool import connection
+
+REQUIRED_TABLES = ["algo_run", "trades", "new_trades", "backtests"]
+
+RESCAN_RUNS   = int(os.getenv("DIAGNOSTICS_RESCAN_RUNS", 100))
+RESCAN_TRADES = int(os.getenv("DIAGNOSTICS_RESCAN_TRADES", 10_000))
+
+# Watermarks for incremental runs. `deletes` is NULL when the delete
+# counter has not been installed.
+WATERMARK_SQL = """
+    SELECT (SELECT COALESCE(MAX(algo_run_id), 0) FROM algo_run),
+           (SELECT COALESCE(MAX(trade_id), 0)    FROM trades),
+           CASE WHEN to_regclass('batch_delete_seq') IS NOT NULL
+                THEN COALESCE(pg_sequence_last_value(to_regclass('batch_delete_seq')), 0)
+           END
+"""
+
+# One row per batch. Runs without a batch_id (live sessions) are not batches.
+BATCH_SQL = """
+    WITH runs AS (
+        SELECT algo_run_id, batch_id, start_time
+          FROM algo_run
+         WHERE batch_id <> ''
+           {run_filter}
+    ),
+    tc AS (
+        SELECT algo_run_id, COUNT(*) AS n
+          FROM trades
+         WHERE algo_run_id IN (SELECT algo_run_id FROM runs)
+         GROUP BY algo_run_id
+    )
+    SELECT r.batch_id,
+           COUNT(*)               AS run_count,
+           COALESCE(SUM(tc.n), 0) AS trade_count,
+           MAX(r.start_time)      AS last_run
+      FROM runs r
+      LEFT JOIN tc ON tc.algo_run_id = r.algo_run_id
+     GROUP BY r.batch_id
+"""
+
+# Batches touched since the last snapshot: new runs, or new trades on any run.
+# The marks passed in are the previous watermarks less the rescan window.
+CHANGED_FILTER = """
+           AND batch_id IN (
+               SELECT batch_id FROM algo_run WHERE algo_run_id > %(max_run)s
+               UNION
+               SELECT ar.batch_id
+                 FROM trades t
+                 JOIN algo_run ar ON ar.algo_run_id = t.algo_run_id
+                WHERE t.trade_id > %(max_trade)s
+           )
+"""
+
+BACKTESTS_SQL = """
+    SELECT batch_id, run_at, symbols, win_rate, net_profit
+      FROM backtests
+     ORDER BY run_at DESC
+     LIMIT 5
+"""
+
+
+def check_tradeplan(tp_dir):
+    if not tp_dir:
+        return ["TRADEPLAN_DIR not set"]
+    tp = Path(tp_dir)
+    tp_toml = tp / "tradeplan.toml"
+    if not tp.exists():
+        return [f"TRADEPLAN_DIR does not exist: {tp}"]
+    if not tp_toml.exists():
+        return [f"tradeplan.toml not found in {tp}"]
+    import toml
+    try:
+        toml.load(tp_toml)
+    except Exception as e:
+        return [f"tradeplan.toml parse error: {e}"]
+    return []
+
+
+def batch_issues(batches):
+    issues = []
+    for b in batches:
+        # flag duplicates
+        if b["run_count"] > 1:
+            issues.append(f"batch_id '{b['batch_id']}' appears {b['run_count']}×")
+        # flag empty runs
+        if b["trade_count"] == 0:
+            issues.append(f"No trades found for batch_id '{b['batch_id']}'")
+    return issues
+
+
+def scan_batches(cur, previous):
+    cur.execute(WATERMARK_SQL)
+    max_run, max_trade, deletes = cur.fetchone()
+    marks = {"algo_run_id": max_run, "trade_id": max_trade, "deletes": deletes}
+
+    prev_marks = (previous or {}).get("watermarks")
+    incremental = (bool(prev_marks) and deletes is not None
+                   and prev_marks.get("deletes") == deletes)
+    if incremental:
+        cur.execute(BATCH_SQL.format(run_filter=CHANGED_FILTER), {
+            "max_run":   max(prev_marks["algo_run_id"] - RESCAN_RUNS, 0),
+            "max_trade": max(prev_marks["trade_id"] - RESCAN_TRADES, 0),
+        })
+        batches = {b["batch_id"]: b for b in previous.get("batches", [])}
+    else:
+        cur.execute(BATCH_SQL.format(run_filter=""))
+        batches = {}
+
+    rows = cur.fetchall()
+    for bid, rc, tc, last_run in rows:
+        batches[bid] = {
+            "batch_id":    bid,
+            "run_count":   int(rc),
+            "trade_count": int(tc),
+            "last_run":    last_run.isoformat() if last_run else None,
+        }
+    ordered = sorted(batches.values(), key=lambda b: b["last_run"] or "", reverse=True)
+    return ordered, marks, {"mode": "incremental" if incremental else "full",
+                            "examined": len(rows)}
+
+
+def collect_diagnostics(env, previous=None):
+    issues = []
+    batches = []
+    backtests = []
+    watermarks = None
+    scan = {"mode": "skipped", "examined": 0}
+
+    # liualgotrader importable?
+    if importlib.util.find_spec("liualgotrader") is None:
+        issues.append("liualgotrader is not installed")
+
+    # TRADEPLAN_DIR + TOML parse
+    issues += check_tradeplan(env.get("TRADEPLAN_DIR", ""))
+
+    # DSN + tables + batches
+    dsn = env.get("DSN", "")
+    if not dsn:
+        issues.append("DSN not set")
+    else:
+        try:
+            with connection(dsn) as conn, conn.cursor() as cur:
+                # one consistent snapshot for watermarks and aggregates
+                cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+                cur.execute(
+                    """
+                    SELECT table_name
+                      FROM information_schema.tables
+                     WHERE table_schema = current_schema()
+                       AND table_name = ANY(%s)
+                    """,
+                    (REQUIRED_TABLES,),
+                )
+                present = {r[0] for r in cur.fetchall()}
+                issues += [f"Missing table: {t}" for t in REQUIRED_TABLES if t not in present]
+
+                if {"algo_run", "trades"} <= present:
+                    # a snapshot of some other database is no use as a baseline
+                    if previous and previous.get("env", {}).get("DSN") != dsn:
+                        previous = None
+                    batches, watermarks, scan = scan_batches(cur, previous)
+                    issues += batch_issues(batches)
+
+                if "backtests" in present:
+                    cur.execute(BACKTESTS_SQL)
+                    cols = [c.name for c in cur.description]
+                    backtests = [dict(zip(cols, r)) for r in cur.fetchall()]
+        except Exception as e:
+            issues.append(f"DSN connection error: {e}")
+
+    return {
+        "env":        env,
+        "issues":     issues,
+        "batches":    batches,
+        "backtests":  backtests,
+        "watermarks": watermarks,
+        "scan":       scan,
+        "timestamp":  datetime.utcnow().isoformat(),
+    }
+
+
+def load(path):
+    path = Path(path)
+    if not path.exists():
+        return None
+    try:
+        return json.loads(path.read_text())
+    except ValueError:
+        return None
+
+
+def write_atomic(path, diag):
+    # readers (dashboard_fixer.py) only ever see the old or the new file
+    path = Path(path)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        os.chmod(tmp, 0o644)
+        with os.fdopen(fd, "w") as f:
+            json.dump(diag, f, indent=2, default=str)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
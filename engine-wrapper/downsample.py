@@ -0,0 +1,169 @@
+# Downsampling for dashboard time-series charts.
+#
+# Charts get a fixed point budget whatever the time range. Postgres does the
+# first pass: the range is cut into 4 × budget time buckets and each bucket
+# keeps its first, last, lowest and highest price (M4), which keeps every
+# spike a pixel column could show. lttb() then brings that down to the
+# budget. Quantities are summed per bucket in SQL. A narrower range gives
+# the same number of points over less time, which is the zoom. The market
+# price the fills are drawn against comes from the local bar store
+# (bar_store.py), not Postgres.
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from bar_store import BarStore
+from db_pool import connection
+
+# executions.ts is indexed; width_bucket spreads [lo, hi) over n buckets
+_WINDOW = """
+    SELECT ts, symbol, side, qty, price,
+           width_bucket(extract(epoch FROM ts), %(lo)s, %(hi)s, %(buckets)s) AS b
+      FROM executions
+     WHERE ts >= %(start)s AND ts < %(end)s
+       AND price IS NOT NULL
+       AND (%(symbol)s::text IS NULL OR symbol = %(symbol)s)
+"""
+
+M4_SQL = f"""
+    SELECT ts, price
+      FROM (
+            SELECT ts, price,
+                   row_number() OVER (PARTITION BY b ORDER BY ts)               AS r_first,
+                   row_number() OVER (PARTITION BY b ORDER BY ts DESC)          AS r_last,
+                   row_number() OVER (PARTITION BY b ORDER BY price, ts)        AS r_min,
+                   row_number() OVER (PARTITION BY b ORDER BY price DESC, ts)   AS r_max
+              FROM ({_WINDOW}) w
+           ) x
+     WHERE 1 IN (r_first, r_last, r_min, r_max)
+     ORDER BY ts
+"""
+
+QTY_SQL = f"""
+    SELECT b,
+           COALESCE(SUM(qty) FILTER (WHERE side = 'buy'), 0)  AS buy,
+           COALESCE(SUM(qty) FILTER (WHERE side = 'sell'), 0) AS sell
+      FROM ({_WINDOW}) w
+     GROUP BY b
+     ORDER BY b
+"""
+
+RANGE_SQL = """
+    SELECT MIN(ts), MAX(ts)
+      FROM executions
+     WHERE (%(symbol)s::text IS NULL OR symbol = %(symbol)s)
+"""
+
+SYMBOLS_SQL = """
+    SELECT symbol, COUNT(*)
+      FROM executions
+     WHERE ts >= %s AND ts < %s
+     GROUP BY symbol
+     ORDER BY COUNT(*) DESC
+"""
+
+WINDOWS = {
+    "1 hour":   timedelta(hours=1),
+    "1 day":    timedelta(days=1),
+    "1 week":   timedelta(weeks=1),
+    "1 month":  timedelta(days=31),
+    "3 months": timedelta(days=92),
+    "1 year":   timedelta(days=366),
+}
+
+
+def lttb(x, y, n):
+    """Largest-triangle-three-buckets: indices of n points of (x, y).
+
+    Keeps the first and last point; from each of the n − 2 equal-count
+    buckets in between it keeps the point forming the largest triangle with
+    the previously kept point and the mean of the next bucket. One NumPy
+    pass per bucket.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    size = len(x)
+    if n >= size or n < 3:
+        return np.arange(size)
+    edges = np.linspace(1, size - 1, n - 1).astype(np.int64)   # n − 2 buckets
+    # mean of every bucket at once, for the "next bucket" corner
+    csx = np.concatenate(([0.0], np.cumsum(x)))
+    csy = np.concatenate(([0.0], np.cumsum(y)))
+    nxt_lo = np.append(edges[1:-1], size - 1)
+    nxt_hi = np.append(edges[2:], size)
+    count = nxt_hi - nxt_lo
+    mean_x = (csx[nxt_hi] - csx[nxt_lo]) / count
+    mean_y = (csy[nxt_hi] - csy[nxt_lo]) / count
+
+    out = np.empty(n, dtype=np.int64)
+    out[0], out[-1] = 0, size - 1
+    a = 0
+    for i in range(n - 2):
+        lo, hi = edges[i], edges[i + 1]
+        area = np.abs((x[a] - mean_x[i]) * (y[lo:hi] - y[a])
+                      - (x[a] - x[lo:hi]) * (mean_y[i] - y[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+def _epoch(ts):
+    # executions.ts is naive, and so is extract(epoch …) on it
+    return (pd.Timestamp(ts).tz_localize(None) - pd.Timestamp(0)) / pd.Timedelta(seconds=1)
+
+
+def _params(start, end, buckets, symbol):
+    return {"start": start, "end": end, "lo": _epoch(start), "hi": _epoch(end),
+            "buckets": buckets, "symbol": symbol}
+
+
+def price_series(dsn, start, end, symbol=None, points=500):
+    """≤ `points` prices between start and end, indexed by ts."""
+    with connection(dsn) as conn:
+        df = pd.read_sql(M4_SQL, conn, params=_params(start, end, points * 4, symbol))
+    df["ts"] = pd.to_datetime(df["ts"])
+    df["price"] = df["price"].astype(float)
+    if len(df) > points:
+        x = (df["ts"] - pd.Timestamp(0)) / pd.Timedelta(seconds=1)
+        df = df.iloc[lttb(x.to_numpy(), df["price"].to_numpy(), points)]
+    return df.set_index("ts")
+
+
+def market_series(symbol, start, end, points=500, store=None):
+    """≤ `points` closes of `symbol` between start and end from the bar
+    store, across renames, indexed by naive UTC ts like the executions.
+    Empty when the store has no bars there."""
+    df = (store or BarStore()).read_lineage(symbol, start, end, columns=["close"])
+    if len(df) > points:
+        x = (df.index - pd.Timestamp(0, tz="UTC")) / pd.Timedelta(seconds=1)
+        df = df.iloc[lttb(x.to_numpy(), df["close"].to_numpy(), points)]
+    df.index = df.index.tz_convert(None)
+    return df.rename(columns={"close": "market"})
+
+
+def qty_series(dsn, start, end, symbol=None, points=200):
+    """Bought / sold quantity summed over `points` equal time buckets."""
+    with connection(dsn) as conn:
+        df = pd.read_sql(QTY_SQL, conn, params=_params(start, end, points, symbol))
+    width = (pd.Timestamp(end) - pd.Timestamp(start)) / points
+    df["ts"] = pd.Timestamp(start) + (df["b"] - 1) * width
+    return df.drop(columns="b").set_index("ts")
+
+
+def data_range(dsn, symbol=None):
+    with connection(dsn) as conn, conn.cursor() as cur:
+        cur.execute(RANGE_SQL, {"symbol": symbol})
+        return cur.fetchone()
+
+
+def symbols(dsn, start, end):
+    with connection(dsn) as conn, conn.cursor() as cur:
+        cur.execute(SYMBOLS_SQL, (start, end))
+        return [s for s, _ in cur.fetchall()]
+
+
+def window(latest, label):
+    # [latest − window, latest] rounded out to whole minutes
+    end = (pd.Timestamp(latest or datetime.now()).ceil("min") + timedelta(minutes=1)).to_pydatetime()
+    return end - WINDOWS[label], end
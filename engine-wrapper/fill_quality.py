@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+# Backtest-vs-live fill quality (database/add_fill_quality.sql).
+#
+# The same tradeplan run by enhanced_backtest and by `liu run live` leaves
+# two algo_runs of fills in new_trades. Both runs come out of Postgres in
+# one COPY. Each live fill is as-of joined to the nearest simulated fill of
+# the same canonical symbol (symbol_renames.py) and side within
+# --tolerance-s (pd.merge_asof over the whole set, not a loop per fill).
+# A simulated fill takes at most one live fill, the closest; the others are
+# matched again against the simulated fills still free, until a round
+# matches nothing more (sim 1000 and 1010, live 1001 and 1004: both match).
+# What is left counts as extra. Only the time window both runs cover is compared, so a live run
+# that kept going after the backtest's end date doesn't count as all extra.
+#
+# Definitions:
+#   slippage_bps   (live − backtest price) / backtest price · 10⁴, sign
+#                  flipped for sells: positive is a worse fill than simulated
+#   slippage_cost  the same difference in currency, times the live qty
+#   missed/extra   backtest fills without a live fill / live fills without
+#                  a backtest fill
+#   offset_s       live fill time − matched backtest fill time
+#   latency_s      live only: new_trades.tstamp (when the fill was
+#                  recorded) − client_time (the event it answered)
+#
+# Results are stored per (live run, backtest run) pair and reused while
+# neither run has new fills. A live run that is still trading gets
+# recomputed on the next call.
+#
+#   python fill_quality.py compare latest 1234
+#   python fill_quality.py compare 1200 --backtest-batch nightly-0612 --tolerance-s 30
+import os
+import io
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+import symbol_renames
+
+TOLERANCE_S = float(os.getenv("FILL_MATCH_TOLERANCE_S", 60))
+LIVE_ENVS   = ("PAPER", "PROD")
+PCTS        = (50, 90, 95, 99)
+MATCHER     = 2         # bump when matching changes; older cached rows are recomputed
+
+FILLS_COPY = """
+    COPY (
+        SELECT algo_run_id, trade_id, symbol, operation, qty, price, client_time,
+               extract(epoch FROM tstamp) AS recorded_ts
+          FROM new_trades
+         WHERE algo_run_id = ANY(%(runs)s)
+    ) TO STDOUT WITH (FORMAT csv, HEADER)
+"""
+
+STATE_SQL = """
+    SELECT algo_run_id, COUNT(*), MAX(trade_id)
+      FROM new_trades
+     WHERE algo_run_id = ANY(%s)
+     GROUP BY algo_run_id
+"""
+
+CACHED_SQL = """
+    SELECT tolerance_s, live_fills, backtest_fills, live_last_id, backtest_last_id,
+           summary, per_symbol, computed_at
+      FROM fill_quality
+     WHERE live_run_id = %s AND backtest_run_id = %s
+"""
+
+UPSERT_SQL = """
+    INSERT INTO fill_quality
+           (live_run_id, backtest_run_id, tolerance_s, live_fills, backtest_fills,
+            live_last_id, backtest_last_id, matched, missed, extra,
+            slippage_bps_p50, slippage_bps_p95, slippage_cost, latency_s_p50, latency_s_p95,
+            summary, per_symbol, computed_at)
+    VALUES (%(live_run_id)s, %(backtest_run_id)s, %(tolerance_s)s, %(live_fills)s,
+            %(backtest_fills)s, %(live_last_id)s, %(backtest_last_id)s, %(matched)s,
+            %(missed)s, %(extra)s, %(slippage_bps_p50)s, %(slippage_bps_p95)s,
+            %(slippage_cost)s, %(latency_s_p50)s, %(latency_s_p95)s, %(summary)s,
+            %(per_symbol)s, now())
+    ON CONFLICT (live_run_id, backtest_run_id) DO UPDATE
+       SET tolerance_s      = EXCLUDED.tolerance_s,
+           live_fills       = EXCLUDED.live_fills,
+           backtest_fills   = EXCLUDED.backtest_fills,
+           live_last_id     = EXCLUDED.live_last_id,
+           backtest_last_id = EXCLUDED.backtest_last_id,
+           matched          = EXCLUDED.matched,
+           missed           = EXCLUDED.missed,
+           extra            = EXCLUDED.extra,
+           slippage_bps_p50 = EXCLUDED.slippage_bps_p50,
+           slippage_bps_p95 = EXCLUDED.slippage_bps_p95,
+           slippage_cost    = EXCLUDED.slippage_cost,
+           latency_s_p50    = EXCLUDED.latency_s_p50,
+           latency_s_p95    = EXCLUDED.latency_s_p95,
+           summary          = EXCLUDED.summary,
+           per_symbol       = EXCLUDED.per_symbol,
+           computed_at      = now()
+"""
+
+DTYPES = {"algo_run_id": "int64", "trade_id": "int64", "symbol": str, "operation": str,
+          "qty": "float64", "price": "float64", "client_time": str, "recorded_ts": "float64"}
+
+
+def load_fills(conn, runs):
+    """Fills of `runs` as one frame with a `ts` column (epoch seconds)."""
+    with conn.cursor() as cur:
+        buf = io.StringIO()
+        cur.copy_expert(cur.mogrify(FILLS_COPY, {"runs": list(runs)}).decode(), buf)
+    buf.seek(0)
+    df = pd.read_csv(buf, dtype=DTYPES, keep_default_na=False,
+                     na_values={c: [""] for c in ("client_time", "recorded_ts")})
+    # client_time is the strategy's clock (the simulated one in a backtest);
+    # rows written without it fall back to when they were recorded
+    client = pd.to_datetime(df["client_time"], utc=True, errors="coerce", format="ISO8601")
+    client_ts = (client - pd.Timestamp(0, tz="UTC")) / pd.Timedelta(seconds=1)
+    df["client_ts"] = client_ts.to_numpy(dtype="float64", na_value=np.nan)
+    df["ts"] = df["client_ts"].fillna(df["recorded_ts"])
+    return df
+
+
+def _pcts(values):
+    values = values[np.isfinite(values)]
+    out = {"n": int(len(values))}
+    if len(values):
+        out["mean"] = round(float(values.mean()), 4)
+        for q, v in zip(PCTS, np.percentile(values, PCTS)):
+            out[f"p{q}"] = round(float(v), 4)
+    return out
+
+
+def _match(left, right, tolerance_s):
+    """Index into `right` (bt_idx) of the simulated fill each live fill in
+    `left` is matched with, NaN for none. Both frames sorted by time."""
+    bt_idx = np.full(len(left), np.nan)
+    taken = np.zeros(len(right), dtype=bool)
+    pending = np.arange(len(left))
+    while len(pending) and not taken.all():
+        free = right[~taken[right["bt_idx"].to_numpy()]]
+        m = pd.merge_asof(left.iloc[pending], free, left_on="ts", right_on="bt_ts",
+                          by=["symbol", "operation"], direction="nearest",
+                          tolerance=tolerance_s)
+        # one live fill per simulated fill: the nearest keeps it
+        cand = m["bt_idx"].to_numpy(dtype="float64")
+        dist = np.abs(m["ts"].to_numpy() - m["bt_ts"].to_numpy())
+        order = np.lexsort((dist, np.nan_to_num(cand, nan=-1)))
+        ranked = cand[order]
+        dup = np.zeros(len(m), dtype=bool)
+        dup[order[1:]] = ranked[1:] == ranked[:-1]      # NaN never equals NaN
+        won = ~dup & ~np.isnan(cand)
+        if not won.any():
+            break
+        bt_idx[pending[won]] = cand[won]
+        taken[cand[won].astype(np.int64)] = True
+        # no candidate now means none later: the free set only shrinks
+        pending = pending[dup]
+    return bt_idx
+
+
+def compare(fills, live_run, backtest_run, tolerance_s=TOLERANCE_S, renames=None):
+    """Match one run's fills against the other's; returns (summary, per_symbol, pairs).
+
+    `pairs` is the fill-level frame (one row per live fill in the window plus
+    one per missed backtest fill) for anyone who wants to dig further.
+    """
+    renames = renames or symbol_renames.default()
+    # hash the column down to its distinct tickers before resolving them
+    codes, tickers = pd.factorize(fills["symbol"])
+    fills = fills.assign(symbol=renames.canonical_many(np.asarray(tickers, dtype=object))[codes])
+    live = fills[fills["algo_run_id"] == live_run]
+    bt = fills[fills["algo_run_id"] == backtest_run]
+
+    # only the span both runs traded in
+    lo = max(live["ts"].min(), bt["ts"].min()) - tolerance_s if len(live) and len(bt) else np.nan
+    hi = min(live["ts"].max(), bt["ts"].max()) + tolerance_s if len(live) and len(bt) else np.nan
+    live_in = live[(live["ts"] >= lo) & (live["ts"] <= hi)]
+    bt_in = bt[(bt["ts"] >= lo) & (bt["ts"] <= hi)].reset_index(drop=True)
+
+    left = live_in[["trade_id", "symbol", "operation", "qty", "price", "ts", "client_ts",
+                    "recorded_ts"]].sort_values("ts", kind="stable").reset_index(drop=True)
+    right = bt_in[["symbol", "operation", "qty", "price", "ts"]].rename(
+        columns={"qty": "bt_qty", "price": "bt_price", "ts": "bt_ts"})
+    right["bt_idx"] = np.arange(len(right))
+    right = right.sort_values("bt_ts", kind="stable")
+    m = left.assign(bt_idx=_match(left, right, tolerance_s))
+    m = m.join(right.set_index("bt_idx")[["bt_qty", "bt_price", "bt_ts"]], on="bt_idx")
+    matched = m["bt_idx"].notna().to_numpy()
+
+    sign = np.where(m["operation"].to_numpy() == "sell", -1.0, 1.0)
+    diff = (m["price"].to_numpy() - m["bt_price"].to_numpy()) * sign
+    m["slippage_bps"] = diff / m["bt_price"].to_numpy() * 1e4
+    m["slippage_cost"] = diff * m["qty"].to_numpy()
+    m["offset_s"] = m["ts"] - m["bt_ts"]
+    m["latency_s"] = m["recorded_ts"] - m["client_ts"]
+    m["status"] = np.where(matched, "matched", "extra")
+
+    taken = np.zeros(len(bt_in), dtype=bool)
+    taken[m["bt_idx"].dropna().to_numpy(dtype=np.int64)] = True
+    missed = bt_in[~taken][["symbol", "operation", "qty", "price", "ts"]].rename(
+        columns={"qty": "bt_qty", "price": "bt_price", "ts": "bt_ts"}).assign(status="missed")
+    pairs = pd.concat([m.drop(columns="bt_idx"), missed], ignore_index=True)
+
+    mm = m[matched]
+    summary = {
+        "live_run_id":     int(live_run),
+        "backtest_run_id": int(backtest_run),
+        "tolerance_s":     float(tolerance_s),
+        "matcher":         MATCHER,
+        "window":          [None if not np.isfinite(lo) else float(lo + tolerance_s),
+                            None if not np.isfinite(hi) else float(hi - tolerance_s)],
+        "live_fills":      int(len(live)),
+        "backtest_fills":  int(len(bt)),
+        "outside_window":  {"live": int(len(live) - len(live_in)), "backtest": int(len(bt) - len(bt_in))},
+        "matched":         int(matched.sum()),
+        "missed":          int(len(missed)),
+        "extra":           int((~matched).sum()),
+        "qty_mismatch":    int((mm["qty"] != mm["bt_qty"]).sum()),
+        "slippage_bps":    _pcts(mm["slippage_bps"].to_numpy()),
+        "slippage_cost":   round(float(np.nansum(mm["slippage_cost"].to_numpy())), 2),
+        "offset_s":        _pcts(mm["offset_s"].to_numpy()),
+        "latency_s":       _pcts(live_in["recorded_ts"].to_numpy() - live_in["client_ts"].to_numpy()),
+        "by_side":         {side: {"matched": int(len(g)),
+                                   "slippage_bps": _pcts(g["slippage_bps"].to_numpy())}
+                            for side, g in mm.groupby("operation")},
+    }
+    return summary, _per_symbol(pairs), pairs
+
+
+def _per_symbol(pairs):
+    g = pairs.assign(
+        matched=pairs["status"] == "matched",
+        missed=pairs["status"] == "missed",
+        extra=pairs["status"] == "extra",
+    ).groupby("symbol", sort=True)
+    agg = g.agg(matched=("matched", "sum"), missed=("missed", "sum"), extra=("extra", "sum"),
+                slippage_bps=("slippage_bps", "mean"), slippage_cost=("slippage_cost", "sum"),
+                offset_s=("offset_s", "median"))
+    return {sym: {"matched":       int(r.matched),
+                  "missed":        int(r.missed),
+                  "extra":         int(r.extra),
+                  "slippage_bps":  None if pd.isna(r.slippage_bps) else round(float(r.slippage_bps), 4),
+                  "slippage_cost": round(float(r.slippage_cost), 2),
+                  "offset_s":      None if pd.isna(r.offset_s) else round(float(r.offset_s), 3)}
+            for sym, r in agg.iterrows()}
+
+
+# ————— cached per run pair —————
+def _state(cur, runs):
+    cur.execute(STATE_SQL, (list(runs),))
+    return {run: (int(n), last) for run, n, last in cur.fetchall()}
+
+
+def analyze(dsn, live_run, backtest_run, tolerance_s=TOLERANCE_S, refresh=False, save=True):
+    """Summary and per-symbol breakdown for a run pair, from the cache when
+    neither run has new fills. Returns (summary, per_symbol, cached)."""
+    from db_pool import connection
+    with connection(dsn) as conn:
+        with conn.cursor() as cur:
+            state = _state(cur, (live_run, backtest_run))
+            live_n, live_last = state.get(live_run, (0, None))
+            bt_n, bt_last = state.get(backtest_run, (0, None))
+            if not refresh:
+                cur.execute(CACHED_SQL, (live_run, backtest_run))
+                row = cur.fetchone()
+                if (row and row[:5] == (tolerance_s, live_n, bt_n, live_last, bt_last)
+                        and row[5].get("matcher") == MATCHER):
+                    return row[5], row[6], True
+        summary, per_symbol, _ = compare(load_fills(conn, (live_run, backtest_run)),
+                                         live_run, backtest_run, tolerance_s)
+        if save:
+            with conn.cursor() as cur:
+                cur.execute(UPSERT_SQL, {
+                    "live_run_id": live_run, "backtest_run_id": backtest_run,
+                    "tolerance_s": tolerance_s, "live_fills": live_n, "backtest_fills": bt_n,
+                    "live_last_id": live_last, "backtest_last_id": bt_last,
+                    "matched": summary["matched"], "missed": summary["missed"],
+                    "extra": summary["extra"],
+                    "slippage_bps_p50": summary["slippage_bps"].get("p50"),
+                    "slippage_bps_p95": summary["slippage_bps"].get("p95"),
+                    "slippage_cost": summary["slippage_cost"],
+                    "latency_s_p50": summary["latency_s"].get("p50"),
+                    "latency_s_p95": summary["latency_s"].get("p95"),
+                    "summary": json.dumps(summary), "per_symbol": json.dumps(per_symbol),
+                })
+            conn.commit()
+    return summary, per_symbol, False
+
+
+def resolve_run(dsn, run=None, batch_id=None, live=False):
+    """An algo_run_id from an id, `latest` (newest live run) or a batch."""
+    if run is not None and run != "latest":
+        return int(run)
+    from db_pool import connection
+    with connection(dsn) as conn, conn.cursor() as cur:
+        if batch_id:
+            cur.execute("SELECT MAX(algo_run_id) FROM algo_run WHERE batch_id = %s", (batch_id,))
+        else:
+            cur.execute("SELECT MAX(algo_run_id) FROM algo_run WHERE algo_env = ANY(%s)",
+                        (list(LIVE_ENVS if live else ()),))
+        found = cur.fetchone()[0]
+    if found is None:
+        raise LookupError(f"no algo_run for {'batch ' + batch_id if batch_id else 'latest live run'}")
+    return found
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Compare live fills against a backtest's simulated fills")
+    sub = p.add_subparsers(dest="cmd", required=True)
+    c = sub.add_parser("compare", help="Slippage, missed/extra fills and latency for a run pair")
+    c.add_argument("live_run", help="Live algo_run_id, or `latest`")
+    c.add_argument("backtest_run", nargs="?", help="Backtest algo_run_id")
+    c.add_argument("--backtest-batch", help="Use the newest run of this batch as the backtest")
+    c.add_argument("--tolerance-s", type=float, default=TOLERANCE_S,
+                   help="Furthest apart a live and a simulated fill may be and still match")
+    c.add_argument("--refresh", action="store_true", help="Recompute even if cached")
+    c.add_argument("--dry-run", action="store_true", help="Print, don't store")
+    c.add_argument("--pairs", help="Write the fill-level matches to this CSV")
+    args = p.parse_args(argv)
+
+    dsn = os.getenv("DSN", "")
+    if not dsn:
+        print("❌ DSN not set", file=sys.stderr)
+        sys.exit(1)
+    if not args.backtest_run and not args.backtest_batch:
+        print("❌ Give a backtest run id or --backtest-batch", file=sys.stderr)
+        sys.exit(1)
+
+    try:
+        live = resolve_run(dsn, args.live_run, live=True)
+        bt = resolve_run(dsn, args.backtest_run, args.backtest_batch)
+    except LookupError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
+
+    t0 = time.perf_counter()
+    if args.pairs:
+        from db_pool import connection
+        with connection(dsn) as conn:
+            fills = load_fills(conn, (live, bt))
+        summary, per_symbol, pairs = compare(fills, live, bt, args.tolerance_s)
+        pairs.to_csv(args.pairs, index=False)
+        cached = False
+    else:
+        summary, per_symbol, cached = analyze(dsn, live, bt, args.tolerance_s,
+                                              refresh=args.refresh, save=not args.dry_run)
+    elapsed = time.perf_counter() - t0
+
+    for sym, r in sorted(per_symbol.items(), key=lambda kv: -abs(kv[1]["slippage_cost"]))[:20]:
+        print(f"{sym:<8} {r['matched']:>7} matched  {r['missed']:>6} missed  {r['extra']:>6} extra  "
+              f"slip {r['slippage_bps'] if r['slippage_bps'] is not None else '—':>9} bps  "
+              f"cost {r['slippage_cost']:>12,.2f}")
+    sl, lat = summary["slippage_bps"], summary["latency_s"]
+    print(f"📋 live run {live} vs backtest run {bt}: {summary['matched']:,} matched, "
+          f"{summary['missed']:,} missed, {summary['extra']:,} extra "
+          f"(±{summary['tolerance_s']:g}s)")
+    print(f"📈 slippage p50 {sl.get('p50', '—')} / p95 {sl.get('p95', '—')} bps, "
+          f"cost {summary['slippage_cost']:,.2f}; latency p50 {lat.get('p50', '—')} / "
+          f"p95 {lat.get('p95', '—')} s")
+    print(f"✅ {'cached' if cached else 'computed'} in {elapsed:.2f}s"
+          + (f", fills written to {args.pairs}" if args.pairs else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,45 @@
 #!/usr/bin/env python3
 import os
 import sys
-import subprocess
 import json
 import textwrap
 import argparse
+import atexit
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
 
+import metrics
+import backtest_cache
+
 # Default injections
 DATA_BLOCK = textwrap.dedent("""\
 [data]
 source = "yahoo"   # no API key required
 """)
 
-STRAT_BLOCK = textwrap.dedent("""\
+STRAT_SETTINGS = {
+    "lookback":       20,
+    "threshold":      1.5,
+    "allocation_pct": 0.2,
+}
+
+def strat_block(settings):
+    lines = "\n".join(f"  {k:<14} = {json.dumps(v)}" for k, v in settings.items())
+    return textwrap.dedent("""\
 [[strategies]]
 name   = "mean_reversion_auto"
 module = "liualgotrader.strategies.mean_reversion"
   [strategies.settings]
-  lookback       = 20
-  threshold      = 1.5
-  allocation_pct = 0.2
+{settings}
 
 [[strategies.schedule]]
 start    = 0
 duration = 390
-""")
+""").format(settings=lines)
+
+STRAT_BLOCK = strat_block(STRAT_SETTINGS)
 
 def inject_sections(tp: Path):
     text = tp.read_text()
@@ -43,24 +56,239 @@ def inject_sections(tp: Path):
         print("🔍 mean_reversion strategy already present.")
     tp.write_text(text + to_add)
 
-def run_backtest(args):
-    # set TLOG_LEVEL from user flag
-    os.environ["TLOG_LEVEL"] = args.log_level
-
-    cmd = [
+def backtest_cmd(args, symbols, batch_id, diagnostics):
+    return [
         "python3", "-m", "liualgotrader.enhanced_backtest",
         "--tradeplan",   args.tradeplan,
-        "--symbols",     args.symbols,
+        "--symbols",     symbols,
         "--start-date",  args.start_date,
         "--end-date",    args.end_date,
-        "--batch-id",    args.batch_id,
-        "--diagnostics", args.diagnostics,
+        "--batch-id",    batch_id,
+        "--diagnostics", diagnostics,
         "--log-level",   args.log_level
     ]
+
+def cached_run(args, cmd, symbols, batch_id, diagnostics):
+    proc = backtest_cache.run(
+        "fix_it_bot", cmd,
+        tradeplan=args.tradeplan, symbols=symbols,
+        start_date=args.start_date, end_date=args.end_date,
+        batch_id=batch_id, diagnostics=diagnostics, bypass=args.no_cache,
+        capture_output=True, text=True,
+    )
+    if proc.cache and proc.cache["hit"]:
+        print(f"♻️ Cache hit for {batch_id}: reusing batch {proc.cache['batch_id']} "
+              f"({proc.cache['created']})")
+    return proc
+
+def run_backtest(args):
+    # set TLOG_LEVEL from user flag
+    os.environ["TLOG_LEVEL"] = args.log_level
+
+    cmd = backtest_cmd(args, args.symbols, args.batch_id, args.diagnostics)
     print("🚀 Running:", " ".join(cmd))
-    return subprocess.run(cmd, capture_output=True, text=True)
+    return cached_run(args, cmd, args.symbols, args.batch_id, args.diagnostics)
+
+# ————— Sharded (--workers N) mode —————
+def shard_symbols(symbols, n):
+    # round-robin so each shard gets a similar mix of tickers
+    syms = [s.strip() for s in symbols.split(",") if s.strip()]
+    n = max(1, min(n, len(syms)))
+    return [syms[i::n] for i in range(n)]
+
+def shard_diagnostics_path(diagnostics, idx):
+    dg = Path(diagnostics)
+    return str(dg.with_name(f"{dg.stem}.s{idx:02d}{dg.suffix}"))
+
+def run_shard(args, idx, symbols):
+    sub_batch = f"{args.batch_id}-s{idx:02d}"
+    dg = shard_diagnostics_path(args.diagnostics, idx)
+    cmd = backtest_cmd(args, ",".join(symbols), sub_batch, dg)
+    print(f"🚀 [shard {idx:02d}] {len(symbols)} symbols → {sub_batch}")
+    t0 = time.monotonic()
+    proc = cached_run(args, cmd, ",".join(symbols), sub_batch, dg)
+    summary = (proc.cache or {}).get("summary") or {}
+    return {
+        "shard":       idx,
+        "batch_id":    sub_batch,
+        "symbols":     symbols,
+        "diagnostics": dg,
+        "returncode":  proc.returncode,
+        "stderr":      proc.stderr,
+        "duration_s":  round(time.monotonic() - t0, 3),
+        "cached":      bool(proc.cache and proc.cache["hit"]),
+        "cached_trades": summary.get("trades"),
+    }
+
+def count_trades(batch_ids):
+    # trade counts per sub-batch, straight from the DB the backtests wrote to
+    dsn = os.getenv("DSN", "")
+    if not dsn:
+        return {}
+    try:
+        import psycopg2
+        with psycopg2.connect(dsn) as conn, conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT ar.batch_id, COUNT(t.trade_id)
+                  FROM algo_run ar
+                  LEFT JOIN trades t ON t.algo_run_id = ar.algo_run_id
+                 WHERE ar.batch_id = ANY(%s)
+                 GROUP BY ar.batch_id
+                """,
+                (list(batch_ids),),
+            )
+            return {bid: int(n) for bid, n in cur.fetchall()}
+    except Exception as e:
+        print(f"⚠️ Could not count trades: {e}", file=sys.stderr)
+        return {}
+
+def record_analytics(batch_ids):
+    # fill `backtests` for the batches this run wrote; cache hits wrote none
+    dsn = os.getenv("DSN", "")
+    if not dsn or not batch_ids:
+        return
+    try:
+        import backtest_analytics
+        for bid, r in backtest_analytics.refresh(dsn, list(batch_ids)).items():
+            print(f"📈 {bid}: win {r['win_rate']*100:.1f}%  net {r['net_profit']:.2f}  "
+                  f"max dd {r['max_drawdown']:.2f}  sharpe {r['sharpe']}")
+    except Exception as e:
+        print(f"⚠️ Could not record analytics: {e}", file=sys.stderr)
+
+def serial_baseline(args):
+    # wall time of the last uncached run of the whole symbol set (a
+    # --workers 1 run), from its cache entry; None when there isn't one
+    if not backtest_cache.cacheable(args.end_date):
+        return None
+    try:
+        key = backtest_cache.cache_key(args.tradeplan, args.symbols, args.start_date, args.end_date)
+    except OSError:
+        return None
+    return (backtest_cache.BacktestCache().get(key) or {}).get("duration_s")
+
+def merge_shards(args, shards, wall_s):
+    counts = count_trades(s["batch_id"] for s in shards)
+    issues, merged = [], []
+    for s in shards:
+        dg = Path(s["diagnostics"])
+        shard_issues = []
+        if dg.exists():
+            shard_issues = json.loads(dg.read_text()).get("issues", [])
+        issues += [f"[{s['batch_id']}] {i}" for i in shard_issues]
+        merged.append({
+            "batch_id":    s["batch_id"],
+            "symbols":     s["symbols"],
+            "returncode":  s["returncode"],
+            "duration_s":  s["duration_s"],
+            # a cache hit wrote no rows under this sub-batch
+            "trade_count": counts.get(s["batch_id"], s["cached_trades"]),
+            "cached":      s["cached"],
+            "issues":      shard_issues,
+        })
+
+    # shards share the machine, so their summed time is not what one serial
+    # run would take: the speedup is against a real --workers 1 run, and
+    # only when every shard actually ran
+    shard_s  = sum(s["duration_s"] for s in shards)
+    serial_s = serial_baseline(args)
+    measured = serial_s is not None and wall_s > 0 and not any(s["cached"] for s in shards)
+    known = [m["trade_count"] for m in merged if m["trade_count"] is not None]
+    return {
+        "batch_id":    args.batch_id,
+        "workers":     args.workers,
+        "issues":      issues,
+        "trade_count": sum(known) if known else None,
+        "shards":      merged,
+        "wall_s":      round(wall_s, 3),
+        "shard_s":     round(shard_s, 3),
+        "serial_s":    serial_s,
+        "speedup":     round(serial_s / wall_s, 2) if measured else None,
+        "timestamp":   datetime.utcnow().isoformat(),
+    }
+
+def run_sharded(args):
+    os.environ["TLOG_LEVEL"] = args.log_level
+
+    shards = shard_symbols(args.symbols, args.workers)
+    print(f"🧩 Sharding {sum(map(len, shards))} symbols across {len(shards)} workers")
+    t0 = time.monotonic()
+    # each worker thread just waits on its own backtest subprocess
+    with ThreadPoolExecutor(max_workers=len(shards)) as pool:
+        results = list(pool.map(lambda a: run_shard(args, *a), enumerate(shards)))
+    wall_s = time.monotonic() - t0
+
+    for r in results:
+        if r["returncode"] != 0:
+            print(f"❌ [{r['batch_id']}] failed:\n", r["stderr"], file=sys.stderr)
+
+    summary = merge_shards(args, results, wall_s)
+    record_analytics([r["batch_id"] for r in results if r["returncode"] == 0 and not r["cached"]])
+    Path(args.diagnostics).write_text(json.dumps(summary, indent=2))
+    if summary["speedup"] is not None:
+        print(f"⏱️ wall {summary['wall_s']}s vs serial {summary['serial_s']}s "
+              f"(last --workers 1 run) → {summary['speedup']}× speedup")
+    else:
+        print(f"⏱️ wall {summary['wall_s']}s; no speedup measured (needs an uncached "
+              f"--workers 1 run of the same backtest to compare against)")
+    if summary["trade_count"] is not None:
+        print(f"📊 {summary['trade_count']} trades under batch {args.batch_id}")
+    return summary, next((r["returncode"] for r in results if r["returncode"] != 0), 0)
+
+# ————— Chunked (--chunk-days N) mode —————
+def run_chunked(args):
+    import backtest_chunks
+    os.environ["TLOG_LEVEL"] = args.log_level
+
+    def cmd_for(start, end, sub_batch, dg):
+        return [
+            "python3", "-m", "liualgotrader.enhanced_backtest",
+            "--tradeplan",   args.tradeplan,
+            "--symbols",     args.symbols,
+            "--start-date",  start,
+            "--end-date",    end,
+            "--batch-id",    sub_batch,
+            "--diagnostics", dg,
+            "--log-level",   args.log_level
+        ]
+
+    try:
+        summary, rc = backtest_chunks.run(
+            "fix_it_bot", cmd_for,
+            tradeplan=args.tradeplan, symbols=args.symbols,
+            start_date=args.start_date, end_date=args.end_date,
+            batch_id=args.batch_id, chunk_days=args.chunk_days, workers=args.workers,
+            diagnostics=args.diagnostics, bypass=args.no_cache, restart=args.restart,
+            capture_output=True, text=True,
+        )
+    except ValueError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
+
+    for c in summary["chunks"]:
+        if c["status"] == "failed":
+            print(f"❌ [{c['batch_id']}] failed:\n", c.get("error", ""), file=sys.stderr)
+
+    record_analytics(summary["ran"])
+    Path(args.diagnostics).write_text(json.dumps(summary, indent=2, default=str))
+    done = sum(c["status"] == "done" for c in summary["chunks"])
+    print(f"💾 {done}/{len(summary['chunks'])} chunks done, checkpoint {summary['checkpoint']}")
+    if summary["trade_count"] is not None:
+        print(f"📊 {summary['trade_count']} trades, net {summary['net_profit']:.2f} "
+              f"under batch {args.batch_id}")
+    if summary["approximate"]:
+        print(f"⚠️ Approximate: net includes {summary['unrealized_pnl']:.2f} unrealized P&L on "
+              f"positions marked at chunk ends (each chunk starts flat)", file=sys.stderr)
+    return summary, rc
 
 def main():
+    # short-lived: hand durations/exit codes to the Pushgateway on the way out
+    atexit.register(metrics.push, "fix_it_bot")
+
+    if sys.argv[1:2] == ["sweep"]:
+        from param_sweep import main as sweep_main
+        return sweep_main(sys.argv[2:])
+
     p = argparse.ArgumentParser(
         description="Fix-it-bot: inject data+strategy and run backtest"
     )
@@ -89,6 +317,33 @@ def main():
         choices=["DEBUG","INFO","WARNING","ERROR","CRITICAL"],
         help="Logging level (and TLOG_LEVEL envvar)"
     )
+    p.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Shard --symbols across N parallel backtest subprocesses. With "
+             "--chunk-days: run up to N chunks at once (default 1, one after another); "
+             "every chunk is a full backtest, so this trades CPU, memory and "
+             "data-source load for wall time, with the same results"
+    )
+    p.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always run the backtest, ignoring (but refreshing) the result cache"
+    )
+    p.add_argument(
+        "--chunk-days",
+        type=int,
+        default=0,
+        help="Run the range in chunks of N trading days, checkpointed and resumable. "
+             "Each chunk starts flat: positions open at a chunk's end are marked "
+             "to market and the summary is flagged approximate"
+    )
+    p.add_argument(
+        "--restart",
+        action="store_true",
+        help="With --chunk-days: ignore the batch's checkpoint and start over"
+    )
 
     args = p.parse_args()
 
@@ -98,25 +353,41 @@ def main():
         sys.exit(1)
 
     inject_sections(tp)
-    proc = run_backtest(args)
 
-    if proc.returncode != 0:
-        print("❌ Backtest failed:\n", proc.stderr, file=sys.stderr)
-        sys.exit(proc.returncode)
+    if args.chunk_days > 0:
+        summary, rc = run_chunked(args)
+        if rc != 0:
+            print(f"♻️ Rerun with --batch-id {args.batch_id} to resume", file=sys.stderr)
+            sys.exit(rc)
+        issues = summary["issues"]
+    elif args.workers > 1:
+        summary, rc = run_sharded(args)
+        if rc != 0:
+            sys.exit(rc)
+        issues = summary["issues"]
+    else:
+        proc = run_backtest(args)
+
+        if proc.returncode != 0:
+            print("❌ Backtest failed:\n", proc.stderr, file=sys.stderr)
+            sys.exit(proc.returncode)
+        if not (proc.cache and proc.cache["hit"]):
+            record_analytics([args.batch_id])
+
+        dg = Path(args.diagnostics)
+        if not dg.exists():
+            print("✅ No issues detected — diagnostics.json not created.")
+            sys.exit(0)
 
-    dg = Path(args.diagnostics)
-    if not dg.exists():
-        print("✅ No issues detected — diagnostics.json not created.")
-        sys.exit(0)
+        issues = json.loads(dg.read_text()).get("issues", [])
 
-    issues = json.loads(dg.read_text()).get("issues", [])
     if issues:
         print("🚨 Issues detected:")
         for i in issues:
             print(" •", i)
         sys.exit(3)
 
-    print("✅ Backtest OK — diagnostics written to", dg)
+    print("✅ Backtest OK — diagnostics written to", args.diagnostics)
     sys.exit(0)
 
 if __name__ == "__main__":
@@ -0,0 +1,574 @@
+#!/usr/bin/env python3
+# Typed, indexed indicator columns (database/add_indicator_columns.sql).
+#
+# Indicator keys that get queried a lot are promoted out of their JSONB
+# document. Each one becomes a typed column of the source's side table,
+# keyed like the source row. Promotion takes a short lock on the source
+# table: it adds the column, registers it and regenerates the row trigger
+# that keeps the side table current. It then back-fills the existing rows
+# in `--chunk`-sized id ranges, one commit per range, recording progress so
+# an interrupted backfill resumes. Last, it builds the index CONCURRENTLY.
+# Adding a stored generated column to trades instead would rewrite the
+# whole partitioned table under an exclusive lock.
+#
+# frame() and aggregate() filter and group by indicator values: promoted
+# keys go through the side table's index, anything else falls back to
+# JSONB extraction on the source table.
+#
+#   python indicators.py keys trades.buy_indicators
+#   python indicators.py promote trades.buy_indicators rsi macd
+#   python indicators.py query trades.buy_indicators --where "rsi<30" --limit 20
+#   python indicators.py stats trades.buy_indicators rsi --bins 10
+import os
+import re
+import sys
+import time
+import argparse
+
+import pandas as pd
+import psycopg2
+from psycopg2 import errors, sql
+
+from db_pool import connection
+
+CHUNK           = int(os.getenv("INDICATOR_BACKFILL_CHUNK", 50_000))
+LOCK_TIMEOUT_MS = int(os.getenv("INDICATOR_LOCK_TIMEOUT_MS", 3000))
+
+SOURCES = {
+    "trades.buy_indicators":  {"table": "trades", "doc": "buy_indicators", "id": "trade_id",
+                               "side": "trade_buy_indicators", "time": "buy_time"},
+    "trades.sell_indicators": {"table": "trades", "doc": "sell_indicators", "id": "trade_id",
+                               "side": "trade_sell_indicators", "time": "sell_time"},
+    "new_trades.indicators":  {"table": "new_trades", "doc": "indicators", "id": "trade_id",
+                               "side": "new_trade_indicators", "time": "tstamp"},
+    "stock_ohlc.indicators":  {"table": "stock_ohlc", "doc": "indicators", "id": "symbol_id",
+                               "side": "stock_ohlc_indicators", "time": "symbol_date"},
+}
+
+KINDS = {"numeric": "numeric", "text": "text", "boolean": "boolean"}
+
+# what aggregate() reports per bucket, over the source row `s`
+METRICS = {
+    "trades": {
+        "trades":   "COUNT(*)",
+        "closed":   "COUNT(s.sell_time)",
+        "win_rate": "AVG(s.is_win::int)",
+        "avg_pnl":  "AVG((s.sell_price - s.buy_price) * s.qty)",
+    },
+    "new_trades": {
+        "orders":    "COUNT(*)",
+        "avg_price": "AVG(s.price)",
+    },
+    "stock_ohlc": {
+        "bars":       "COUNT(*)",
+        "avg_return": "AVG((s.close - s.open) / NULLIF(s.open, 0))",
+    },
+}
+
+OPS = {"<", "<=", ">", ">=", "=", "!=", "between", "in"}
+_KEY  = re.compile(r"^[\w\-]+(\.[\w\-]+)*$")
+_COND = re.compile(r"^\s*([\w.]+)\s*(<=|>=|!=|<|>|=)\s*(.+?)\s*$")
+
+REGISTRY_SQL = """
+    SELECT source, key, column_name, kind, backfilled_to, backfill_end, promoted_at
+      FROM indicator_columns
+     WHERE %(source)s::text IS NULL OR source = %(source)s
+     ORDER BY source, key
+"""
+
+
+def _source(name):
+    try:
+        return SOURCES[name]
+    except KeyError:
+        raise ValueError(f"unknown source {name!r} (one of: {', '.join(SOURCES)})")
+
+
+def column_name(key):
+    name = re.sub(r"[^a-z0-9_]+", "_", key.lower()).strip("_") or "key"
+    if name[0].isdigit() or name in ("trade_id", "symbol_id"):
+        name = f"k_{name}"
+    return name[:63]
+
+
+def extract(doc, key, kind):
+    """SQL for `key` (dotted path) of the jsonb `doc`, typed as `kind`.
+
+    Values of the wrong JSON type come out NULL rather than failing the
+    cast, so a stray document can never break an insert on the source.
+    """
+    path = sql.SQL("{}::text[]").format(sql.Literal(key.split(".")))
+    typ = sql.SQL("jsonb_typeof({} #> {})").format(doc, path)
+    text = sql.SQL("({} #>> {})").format(doc, path)
+    if kind == "numeric":
+        return sql.SQL("CASE WHEN {} = 'number' THEN {}::numeric END").format(typ, text)
+    if kind == "boolean":
+        return sql.SQL("CASE WHEN {} = 'boolean' THEN {}::boolean END").format(typ, text)
+    return sql.SQL("CASE WHEN {} IN ('string', 'number', 'boolean') THEN {} END").format(typ, text)
+
+
+def registry(cur, source=None):
+    cur.execute(REGISTRY_SQL, {"source": source})
+    cols = [c.name for c in cur.description]
+    return [dict(zip(cols, r)) for r in cur.fetchall()]
+
+
+def promoted(cur, source):
+    """{key: (column_name, kind)} of the keys promoted for `source`."""
+    try:
+        return {r["key"]: (r["column_name"], r["kind"]) for r in registry(cur, source)}
+    except errors.UndefinedTable:
+        cur.connection.rollback()
+        return {}
+
+
+# ————— Maintenance —————
+def sync_trigger(cur, source):
+    """(Re)generate the row trigger that copies the promoted keys of
+    `source` into its side table; dropped when nothing is promoted."""
+    src = _source(source)
+    rows = registry(cur, source)
+    fn = sql.Identifier(f"{src['side']}_sync")
+    if not rows:
+        cur.execute(sql.SQL("DROP TRIGGER IF EXISTS {} ON {}").format(fn, sql.Identifier(src["table"])))
+        cur.execute(sql.SQL("DROP FUNCTION IF EXISTS {}()").format(fn))
+        return
+    doc = sql.SQL("NEW.{}").format(sql.Identifier(src["doc"]))
+    cols = [sql.Identifier(r["column_name"]) for r in rows]
+    cur.execute(sql.SQL("""
+        CREATE OR REPLACE FUNCTION {fn}()
+            RETURNS TRIGGER
+            LANGUAGE PLPGSQL
+            AS
+        $$
+        BEGIN
+            INSERT INTO {side} ({id}, {cols})
+            VALUES (NEW.{id}, {values})
+            ON CONFLICT ({id}) DO UPDATE SET {updates};
+            RETURN NULL;
+        END;
+        $$
+    """).format(
+        fn=fn,
+        side=sql.Identifier(src["side"]),
+        id=sql.Identifier(src["id"]),
+        cols=sql.SQL(", ").join(cols),
+        values=sql.SQL(", ").join(extract(doc, r["key"], r["kind"]) for r in rows),
+        updates=sql.SQL(", ").join(sql.SQL("{0} = EXCLUDED.{0}").format(c) for c in cols),
+    ))
+    cur.execute("SELECT 1 FROM pg_trigger WHERE tgname = %s AND tgrelid = %s::regclass",
+                (f"{src['side']}_sync", src["table"]))
+    if cur.fetchone() is None:
+        cur.execute(sql.SQL("""
+            CREATE TRIGGER {fn}
+                AFTER INSERT OR UPDATE OF {doc}
+                ON {table}
+                FOR EACH ROW
+                WHEN (NEW.{doc} IS NOT NULL)
+                EXECUTE PROCEDURE {fn}()
+        """).format(fn=fn, doc=sql.Identifier(src["doc"]), table=sql.Identifier(src["table"])))
+
+
+def _lock(cur, table):
+    # blocks writers for the length of the DDL only; give up rather than
+    # queue the live trader behind a long-running reader
+    cur.execute("SET LOCAL lock_timeout = %s", (LOCK_TIMEOUT_MS,))
+    cur.execute(sql.SQL("LOCK TABLE {} IN SHARE ROW EXCLUSIVE MODE").format(sql.Identifier(table)))
+
+
+def promote(dsn, source, keys, kind="numeric", backfill_rows=True, chunk=CHUNK, progress=None):
+    """Promote `keys` of `source` to `kind` columns; returns their names."""
+    src = _source(source)
+    if kind not in KINDS:
+        raise ValueError(f"kind must be one of {', '.join(KINDS)}")
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn.cursor() as cur:
+            _lock(cur, src["table"])
+            # every row up to here predates the trigger and needs a backfill
+            cur.execute(sql.SQL("SELECT COALESCE(MAX({}), 0) FROM {}").format(
+                sql.Identifier(src["id"]), sql.Identifier(src["table"])))
+            end = cur.fetchone()[0]
+            names = []
+            for key in keys:
+                if not _KEY.match(key):
+                    raise ValueError(f"bad key {key!r} (letters, digits, _ - and . for nesting)")
+                name = column_name(key)
+                cur.execute(sql.SQL("ALTER TABLE {} ADD COLUMN IF NOT EXISTS {} {}").format(
+                    sql.Identifier(src["side"]), sql.Identifier(name), sql.SQL(KINDS[kind])))
+                cur.execute("""
+                    INSERT INTO indicator_columns (source, key, column_name, kind, backfill_end)
+                    VALUES (%s, %s, %s, %s, %s)
+                    ON CONFLICT (source, key) DO NOTHING
+                """, (source, key, name, kind, end or None))
+                names.append(name)
+            sync_trigger(cur, source)
+        conn.commit()
+    finally:
+        conn.close()
+    if backfill_rows:
+        backfill(dsn, source, chunk, progress)
+    return names
+
+
+def backfill(dsn, source=None, chunk=CHUNK, progress=None):
+    """Fill promoted columns for rows that predate their promotion, then
+    index them. Resumes from the last committed range."""
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SET statement_timeout = 0")
+            pending = [r for r in registry(cur, source) if r["backfill_end"] is not None]
+        conn.commit()
+        # keys promoted together share their progress and go in one pass
+        groups = {}
+        for r in pending:
+            groups.setdefault((r["source"], r["backfilled_to"], r["backfill_end"]), []).append(r)
+        for (name, lo, end), rows in groups.items():
+            src = _source(name)
+            doc = sql.SQL("s.{}").format(sql.Identifier(src["doc"]))
+            cols = [sql.Identifier(r["column_name"]) for r in rows]
+            exprs = [extract(doc, r["key"], r["kind"]) for r in rows]
+            insert = sql.SQL("""
+                INSERT INTO {side} ({id}, {cols})
+                SELECT * FROM (
+                    SELECT s.{id}, {exprs}
+                      FROM {table} s
+                     WHERE s.{id} > %(lo)s AND s.{id} <= %(hi)s
+                       AND {doc} IS NOT NULL
+                ) v
+                 WHERE {any}
+                ON CONFLICT ({id}) DO UPDATE SET {updates}
+            """).format(
+                side=sql.Identifier(src["side"]), id=sql.Identifier(src["id"]),
+                table=sql.Identifier(src["table"]), doc=doc,
+                cols=sql.SQL(", ").join(cols),
+                exprs=sql.SQL(", ").join(sql.SQL("{} AS {}").format(e, c) for e, c in zip(exprs, cols)),
+                any=sql.SQL(" OR ").join(sql.SQL("{} IS NOT NULL").format(c) for c in cols),
+                updates=sql.SQL(", ").join(sql.SQL("{0} = EXCLUDED.{0}").format(c) for c in cols),
+            )
+            keys = [r["key"] for r in rows]
+            filled = 0
+            while lo < end:
+                hi = min(lo + chunk, end)
+                with conn.cursor() as cur:
+                    cur.execute(insert, {"lo": lo, "hi": hi})
+                    filled += cur.rowcount
+                    cur.execute("""
+                        UPDATE indicator_columns
+                           SET backfilled_to = %s,
+                               backfill_end  = CASE WHEN %s >= backfill_end THEN NULL ELSE backfill_end END
+                         WHERE source = %s AND key = ANY(%s)
+                    """, (hi, hi, name, keys))
+                conn.commit()
+                lo = hi
+                if progress:
+                    progress(name, keys, hi, end, filled)
+        _index(conn, source)
+    finally:
+        conn.close()
+
+
+def _index(conn, source=None):
+    # CONCURRENTLY can't run in a transaction block
+    with conn.cursor() as cur:
+        done = [r for r in registry(cur, source) if r["backfill_end"] is None]
+    conn.commit()
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            for r in done:
+                side = SOURCES[r["source"]]["side"]
+                cur.execute(sql.SQL("CREATE INDEX CONCURRENTLY IF NOT EXISTS {} ON {} ({})").format(
+                    sql.Identifier(f"{side}_{r['column_name']}_idx"[:63]),
+                    sql.Identifier(side), sql.Identifier(r["column_name"])))
+            # fresh statistics, or the planner guesses and skips the indexes
+            for side in {SOURCES[r["source"]]["side"] for r in done}:
+                cur.execute(sql.SQL("ANALYZE {}").format(sql.Identifier(side)))
+    finally:
+        conn.autocommit = False
+
+
+def demote(dsn, source, key):
+    """Drop a promoted key's column (and index); the JSONB is untouched."""
+    src = _source(source)
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn.cursor() as cur:
+            _lock(cur, src["table"])
+            cur.execute("DELETE FROM indicator_columns WHERE source = %s AND key = %s "
+                        "RETURNING column_name", (source, key))
+            row = cur.fetchone()
+            if row is None:
+                raise ValueError(f"{source}: {key!r} is not promoted")
+            sync_trigger(cur, source)
+            cur.execute(sql.SQL("ALTER TABLE {} DROP COLUMN IF EXISTS {}").format(
+                sql.Identifier(src["side"]), sql.Identifier(row[0])))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def keys(dsn, source, sample=10_000):
+    """Top-level keys of the newest `sample` documents: how often each
+    appears, its JSON type(s) and whether it is promoted."""
+    src = _source(source)
+    with connection(dsn) as conn, conn.cursor() as cur:
+        cur.execute(sql.SQL("""
+            SELECT k.key, COUNT(*) AS docs, string_agg(DISTINCT jsonb_typeof(k.value), ',') AS types
+              FROM (SELECT {doc} AS doc
+                      FROM {table}
+                     WHERE {doc} IS NOT NULL
+                     ORDER BY {id} DESC
+                     LIMIT %s) d
+             CROSS JOIN LATERAL jsonb_each(CASE WHEN jsonb_typeof(d.doc) = 'object'
+                                                THEN d.doc ELSE '{{}}' END) k
+             GROUP BY k.key
+             ORDER BY docs DESC, k.key
+        """).format(doc=sql.Identifier(src["doc"]), table=sql.Identifier(src["table"]),
+                    id=sql.Identifier(src["id"])), (sample,))
+        found = cur.fetchall()
+        done = promoted(cur, source)
+    return pd.DataFrame([{"key": k, "docs": n, "types": t, "promoted": k in done}
+                         for k, n, t in found])
+
+
+# ————— Queries —————
+def parse(cond):
+    """"rsi<30" → ("rsi", "<", 30.0); values that aren't numbers stay text."""
+    m = _COND.match(cond)
+    if not m:
+        raise ValueError(f"can't parse condition {cond!r} (expected KEY OP VALUE)")
+    key, op, value = m.groups()
+    try:
+        value = float(value)
+    except ValueError:
+        value = {"true": True, "false": False}.get(value.lower(), value.strip("'\""))
+    return key, op, value
+
+
+def _expr(source, key, promoted_keys):
+    # the side table's column, or the JSONB value cast on the fly
+    if key in promoted_keys:
+        return sql.SQL("i.{}").format(sql.Identifier(promoted_keys[key][0]))
+    doc = sql.SQL("s.{}").format(sql.Identifier(_source(source)["doc"]))
+    return extract(doc, key, "numeric")
+
+
+def _filters(source, where, symbols, since, until, algo_run_ids, promoted_keys):
+    """WHERE parts for the conditions and source filters, and whether
+    they need the side table."""
+    src = _source(source)
+    parts = []
+    for key, op, value in where:
+        if op not in OPS:
+            raise ValueError(f"operator must be one of {', '.join(sorted(OPS))}")
+        e = _expr(source, key, promoted_keys)
+        if not isinstance(value, (int, float, list, tuple)) and key not in promoted_keys:
+            # text / boolean comparison on an unpromoted key
+            e = sql.SQL("(s.{} #>> {}::text[])").format(sql.Identifier(src["doc"]),
+                                                       sql.Literal(key.split(".")))
+            value = str(value).lower() if isinstance(value, bool) else value
+        if op == "between":
+            parts.append(sql.SQL("{} BETWEEN {} AND {}").format(e, sql.Literal(value[0]),
+                                                               sql.Literal(value[1])))
+        elif op == "in":
+            parts.append(sql.SQL("{} = ANY({})").format(e, sql.Literal(list(value))))
+        else:
+            parts.append(sql.SQL("{} {} {}").format(e, sql.SQL(op), sql.Literal(value)))
+    if symbols:
+        parts.append(sql.SQL("s.symbol = ANY({})").format(sql.Literal(list(symbols))))
+    if since is not None:
+        parts.append(sql.SQL("s.{} >= {}").format(sql.Identifier(src["time"]), sql.Literal(since)))
+    if until is not None:
+        parts.append(sql.SQL("s.{} < {}").format(sql.Identifier(src["time"]), sql.Literal(until)))
+    if algo_run_ids and src["table"] != "stock_ohlc":
+        parts.append(sql.SQL("s.algo_run_id = ANY({})").format(sql.Literal(list(algo_run_ids))))
+    return any(k in promoted_keys for k, _, _ in where), parts
+
+
+def _from(source, join, columns_only=False):
+    src = _source(source)
+    table = sql.SQL("{} s").format(sql.Identifier(src["table"]))
+    if not join:
+        return table
+    if columns_only:
+        # promoted keys only shown, not filtered on: keep source rows that
+        # have no side row yet (NULL columns) like the unjoined query would
+        return sql.SQL("{table} LEFT JOIN {side} i ON i.{id} = s.{id}").format(
+            side=sql.Identifier(src["side"]), table=table, id=sql.Identifier(src["id"]))
+    # start from the side table: its index does the filtering
+    return sql.SQL("{side} i JOIN {table} ON s.{id} = i.{id}").format(
+        side=sql.Identifier(src["side"]), table=table, id=sql.Identifier(src["id"]))
+
+
+def _where(parts):
+    return sql.SQL(" WHERE ") + sql.SQL(" AND ").join(parts) if parts else sql.SQL("")
+
+
+def frame(dsn, source, where=(), columns=None, symbols=None, since=None, until=None,
+          algo_run_ids=None, limit=1000):
+    """Source rows matching indicator conditions, newest first.
+
+    `where` is a list of (key, op, value) tuples or "key<value" strings;
+    op is one of < <= > >= = != between in. The result has the source's
+    own columns (minus the JSONB documents) plus one column per promoted
+    key asked for in `columns` or used in `where`.
+    """
+    src = _source(source)
+    where = [parse(w) if isinstance(w, str) else tuple(w) for w in where]
+    with connection(dsn) as conn, conn.cursor() as cur:
+        done = promoted(cur, source)
+        wanted = [k for k in dict.fromkeys(list(columns or []) + [k for k, _, _ in where]) if k in done]
+        filtered, parts = _filters(source, where, symbols, since, until, algo_run_ids, done)
+        cur.execute("""
+            SELECT column_name FROM information_schema.columns
+             WHERE table_schema = current_schema() AND table_name = %s AND data_type <> 'jsonb'
+             ORDER BY ordinal_position
+        """, (src["table"],))
+        base = [sql.SQL("s.{}").format(sql.Identifier(c)) for (c,) in cur.fetchall()]
+        src_sql = _from(source, filtered or bool(wanted), columns_only=not filtered)
+        extra = [sql.SQL("i.{} AS {}").format(sql.Identifier(done[k][0]), sql.Identifier(k)) for k in wanted]
+        query = sql.SQL("SELECT {cols} FROM {src}{where} ORDER BY s.{time} DESC NULLS LAST LIMIT {n}").format(
+            cols=sql.SQL(", ").join(base + extra), src=src_sql, where=_where(parts),
+            time=sql.Identifier(src["time"]), n=sql.Literal(int(limit)))
+        cur.execute(query)
+        names = [c.name for c in cur.description]
+        return pd.DataFrame(cur.fetchall(), columns=names)
+
+
+def aggregate(dsn, source, key, bins=10, where=(), symbols=None, since=None, until=None,
+              algo_run_ids=None):
+    """METRICS of the source table per bucket of `key`.
+
+    Numeric keys are cut into `bins` equal-width buckets between their
+    lowest and highest value under the filters; text and boolean keys are
+    grouped by value.
+    """
+    src = _source(source)
+    where = [parse(w) if isinstance(w, str) else tuple(w) for w in where]
+    with connection(dsn) as conn, conn.cursor() as cur:
+        done = promoted(cur, source)
+        join, parts = _filters(source, where, symbols, since, until, algo_run_ids, done)
+        join = join or key in done
+        value = _expr(source, key, done)
+        kind = done.get(key, (None, "numeric"))[1]
+        metrics = sql.SQL(", ").join(sql.SQL("{} AS {}").format(sql.SQL(m), sql.Identifier(n))
+                                     for n, m in METRICS[src["table"]].items())
+        nonnull = parts + [sql.SQL("{} IS NOT NULL").format(value)]
+        if kind == "numeric":
+            query = sql.SQL("""
+                WITH v AS (SELECT {value} AS x, s.* FROM {src}{where}),
+                     r AS (SELECT MIN(x) AS lo, MAX(x) AS hi FROM v)
+                SELECT CASE WHEN r.hi = r.lo THEN 1
+                            ELSE LEAST(width_bucket(s.x, r.lo, r.hi, {bins}), {bins}) END AS bucket,
+                       MIN(s.x) AS lo, MAX(s.x) AS hi, {metrics}
+                  FROM v s CROSS JOIN r
+                 GROUP BY 1
+                 ORDER BY 1
+            """)
+        else:
+            query = sql.SQL("""
+                WITH v AS (SELECT {value} AS x, s.* FROM {src}{where})
+                SELECT s.x AS value, {metrics}
+                  FROM v s
+                 GROUP BY 1
+                 ORDER BY 1
+            """)
+        cur.execute(query.format(value=value, src=_from(source, join), where=_where(nonnull),
+                                 bins=sql.Literal(int(bins)), metrics=metrics))
+        names = [c.name for c in cur.description]
+        df = pd.DataFrame(cur.fetchall(), columns=names)
+    for c in df.columns:
+        if c not in ("value", "bucket"):
+            df[c] = pd.to_numeric(df[c])    # Decimal → float
+    return df
+
+
+# ————— CLI —————
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Promote JSONB indicator keys to typed, indexed columns")
+    sub = p.add_subparsers(dest="cmd", required=True)
+
+    k = sub.add_parser("keys", help="Keys in the newest documents of a source")
+    k.add_argument("source", choices=SOURCES)
+    k.add_argument("--sample", type=int, default=10_000)
+
+    sub.add_parser("list", help="Promoted keys and their backfill progress")
+
+    pr = sub.add_parser("promote", help="Promote keys to typed columns and back-fill them")
+    pr.add_argument("source", choices=SOURCES)
+    pr.add_argument("keys", nargs="+", help="JSON keys (a.b for nested ones)")
+    pr.add_argument("--kind", choices=KINDS, default="numeric")
+    pr.add_argument("--no-backfill", action="store_true", help="Leave the backfill for later")
+    pr.add_argument("--chunk", type=int, default=CHUNK, help="Source ids per backfill transaction")
+
+    b = sub.add_parser("backfill", help="Resume unfinished backfills")
+    b.add_argument("source", nargs="?", choices=SOURCES)
+    b.add_argument("--chunk", type=int, default=CHUNK)
+
+    d = sub.add_parser("demote", help="Drop a promoted key's column")
+    d.add_argument("source", choices=SOURCES)
+    d.add_argument("key")
+
+    q = sub.add_parser("query", help="Rows matching indicator conditions")
+    s = sub.add_parser("stats", help="Metrics per bucket of an indicator")
+    for x in (q, s):
+        x.add_argument("source", choices=SOURCES)
+        x.add_argument("--where", action="append", default=[], help='e.g. "rsi<30" (repeatable)')
+        x.add_argument("--symbol", action="append", help="Only this symbol (repeatable)")
+        x.add_argument("--since", help="Source time ≥ this")
+        x.add_argument("--until", help="Source time < this")
+    q.add_argument("--column", action="append", help="Promoted key to include (repeatable)")
+    q.add_argument("--limit", type=int, default=50)
+    s.add_argument("key")
+    s.add_argument("--bins", type=int, default=10)
+    args = p.parse_args(argv)
+
+    dsn = os.getenv("DSN", "")
+    if not dsn:
+        print("❌ DSN not set", file=sys.stderr)
+        sys.exit(1)
+
+    t0 = time.perf_counter()
+
+    def report(source, keys, done, end, filled):
+        print(f"📥 {source} {','.join(keys)}: ids ≤ {done:,}/{end:,} ({filled:,} rows filled)")
+
+    try:
+        if args.cmd == "keys":
+            print(keys(dsn, args.source, args.sample).to_string(index=False))
+        elif args.cmd == "list":
+            with connection(dsn) as conn, conn.cursor() as cur:
+                rows = registry(cur)
+            for r in rows:
+                state = ("✅ ready" if r["backfill_end"] is None
+                         else f"⏳ backfilled to {r['backfilled_to']:,}/{r['backfill_end']:,}")
+                print(f"{r['source']:<24} {r['key']:<20} {r['column_name']:<20} {r['kind']:<8} {state}")
+        elif args.cmd == "promote":
+            names = promote(dsn, args.source, args.keys, args.kind, not args.no_backfill,
+                            args.chunk, report)
+            print(f"✅ {args.source}: {', '.join(names)} promoted in {time.perf_counter() - t0:.1f}s")
+        elif args.cmd == "backfill":
+            backfill(dsn, args.source, args.chunk, report)
+            print(f"✅ Backfill done in {time.perf_counter() - t0:.1f}s")
+        elif args.cmd == "demote":
+            demote(dsn, args.source, args.key)
+            print(f"✅ {args.source}: {args.key} demoted")
+        elif args.cmd == "query":
+            df = frame(dsn, args.source, args.where, args.column, args.symbol, args.since,
+                       args.until, limit=args.limit)
+            print(df.to_string(index=False))
+            print(f"✅ {len(df)} rows in {time.perf_counter() - t0:.2f}s")
+        else:
+            df = aggregate(dsn, args.source, args.key, args.bins, args.where, args.symbol,
+                           args.since, args.until)
+            print(df.to_string(index=False))
+            print(f"✅ {len(df)} buckets in {time.perf_counter() - t0:.2f}s")
+    except (ValueError, psycopg2.Error) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
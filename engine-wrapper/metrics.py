@@ -0,0 +1,237 @@
+# Prometheus metrics shared by the dashboards and tools.
+#
+# Long-running processes (the Streamlit apps, metrics_exporter.py) call
+# serve() once and are scraped directly. Short-lived CLIs (fix_it_bot.py)
+# call push() before exiting, which goes to the Pushgateway when
+# PUSHGATEWAY_URL is set. Without prometheus_client installed every helper
+# here is a no-op, so the tools run the same either way.
+import os
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    from prometheus_client import (CollectorRegistry, Counter, Gauge, Histogram,
+                                   push_to_gateway, start_http_server)
+    from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+except ImportError:  # optional dependency
+    CollectorRegistry = None
+
+ENABLED = CollectorRegistry is not None
+
+if ENABLED:
+    REGISTRY = CollectorRegistry(auto_describe=True)
+
+    QUERY_SECONDS = Histogram(
+        "liu_dashboard_query_seconds", "Dashboard loader query latency",
+        ["app", "query"], registry=REGISTRY,
+        buckets=(.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30),
+    )
+    BACKTEST_SECONDS = Histogram(
+        "liu_backtest_duration_seconds", "enhanced_backtest subprocess wall time",
+        ["tool"], registry=REGISTRY,
+        buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600, 7200, 14400),
+    )
+    BACKTEST_EXITS = Counter(
+        "liu_backtest_exit_total", "enhanced_backtest subprocess exits by code",
+        ["tool", "code"], registry=REGISTRY,
+    )
+    FILL_LAG_SECONDS = Histogram(
+        "liu_fill_visible_lag_seconds", "Commit of a fill to it being rendered",
+        ["app"], registry=REGISTRY,
+        buckets=(.05, .1, .25, .5, 1, 2, 5, 10, 30),
+    )
+    BACKTEST_PHASE_SECONDS = Histogram(
+        "liu_backtest_phase_seconds", "enhanced_backtest wall time per phase (from its log)",
+        ["tool", "phase"], registry=REGISTRY,
+        buckets=(.5, 1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600, 7200),
+    )
+    BACKTEST_CACHE = Counter(
+        "liu_backtest_cache_total", "Backtest result cache lookups",
+        ["tool", "result"], registry=REGISTRY,
+    )
+    RISK_EXPOSURE = Gauge(
+        "liu_risk_exposure_dollars", "Live open-position exposure", ["kind"], registry=REGISTRY,
+    )
+    RISK_EXPOSURE_RATIO = Gauge(
+        "liu_risk_exposure_ratio", "Live exposure over the tradeplan's portfolio_value",
+        ["kind"], registry=REGISTRY,
+    )
+    RISK_PNL = Gauge(
+        "liu_risk_pnl_dollars", "Live session P&L", ["kind"], registry=REGISTRY,
+    )
+    RISK_ALERTS = Counter(
+        "liu_risk_alerts_total", "Risk limit breaches raised by the monitor",
+        ["rule"], registry=REGISTRY,
+    )
+    DIAG_ISSUES = Gauge(
+        "liu_diagnostics_issues", "Issues reported by the last collect_diagnostics",
+        ["kind"], registry=REGISTRY,
+    )
+    RERUN_SECONDS = Histogram(
+        "liu_streamlit_rerun_seconds", "Wall time of a whole Streamlit script rerun",
+        ["app"], registry=REGISTRY,
+        buckets=(.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10),
+    )
+    RERUN_SECTION_SECONDS = Histogram(
+        "liu_streamlit_section_seconds", "Wall time of one page section per rerun",
+        ["app", "section"], registry=REGISTRY,
+        buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5),
+    )
+    COLD_START_SECONDS = Gauge(
+        "liu_streamlit_cold_start_seconds",
+        "First rerun of the process: its imports, the whole rerun, and process start → its end",
+        ["app", "phase"], registry=REGISTRY,
+    )
+    SNAPSHOT_REQUESTS = Counter(
+        "liu_snapshot_requests_total", "Snapshot service reads by outcome",
+        ["dataset", "result"], registry=REGISTRY,
+    )
+
+_served = set()
+_lock = threading.Lock()
+_query_hooks = []
+
+
+class _PoolCollector:
+    # db_pool stats, read at scrape time
+    def collect(self):
+        from db_pool import all_stats
+        gauges = {
+            "in_use": GaugeMetricFamily("liu_db_pool_in_use", "Connections checked out", labels=["pool"]),
+            "idle":   GaugeMetricFamily("liu_db_pool_idle", "Idle pooled connections", labels=["pool"]),
+            "size":   GaugeMetricFamily("liu_db_pool_size", "Max pool size", labels=["pool"]),
+        }
+        counters = {
+            "waits":           CounterMetricFamily("liu_db_pool_waits", "Checkouts that had to wait", labels=["pool"]),
+            "wait_s_total":    CounterMetricFamily("liu_db_pool_wait_seconds", "Time spent waiting for a connection", labels=["pool"]),
+            "timeouts":        CounterMetricFamily("liu_db_pool_timeouts", "Checkouts that gave up", labels=["pool"]),
+            "connects":        CounterMetricFamily("liu_db_pool_connects", "New connections opened", labels=["pool"]),
+            "connect_s_total": CounterMetricFamily("liu_db_pool_connect_seconds", "Time spent opening connections", labels=["pool"]),
+        }
+        for pool, s in all_stats().items():
+            for k, m in {**gauges, **counters}.items():
+                m.add_metric([pool], s[k])
+        yield from gauges.values()
+        yield from counters.values()
+
+
+def serve(port=None):
+    # idempotent: Streamlit re-executes the page script on every rerun
+    port = int(port or os.getenv("METRICS_PORT", 0))
+    if not ENABLED or not port:
+        return
+    with _lock:
+        if port in _served:
+            return
+        if not _served:
+            REGISTRY.register(_PoolCollector())
+        start_http_server(port, registry=REGISTRY)
+        _served.add(port)
+
+
+def push(job):
+    url = os.getenv("PUSHGATEWAY_URL", "")
+    if not ENABLED or not url:
+        return
+    try:
+        push_to_gateway(url, job=job, registry=REGISTRY)
+    except Exception as e:
+        print(f"⚠️ Could not push metrics to {url}: {e}")
+
+
+def on_query(hook):
+    # hook(app, query, seconds) after every query_timer block (rerun_profile.py)
+    _query_hooks.append(hook)
+
+
+@contextmanager
+def query_timer(app, query):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        dt = time.perf_counter() - t0
+        if ENABLED:
+            QUERY_SECONDS.labels(app, query).observe(dt)
+        for hook in _query_hooks:
+            hook(app, query, dt)
+
+
+def run_backtest(tool, cmd, log_name=None, **kwargs):
+    # subprocess.run() plus duration / exit-code bookkeeping. With
+    # capture_output=True the output is streamed to disk by backtest_logs
+    # (under log_name, default tool + time) instead of held in memory.
+    t0 = time.perf_counter()
+    if kwargs.get("capture_output"):
+        import backtest_logs
+        proc = backtest_logs.run(cmd, log_name or f"{tool}-{time.strftime('%Y%m%d-%H%M%S')}", **kwargs)
+    else:
+        proc = subprocess.run(cmd, **kwargs)
+    if ENABLED:
+        BACKTEST_SECONDS.labels(tool).observe(time.perf_counter() - t0)
+        BACKTEST_EXITS.labels(tool, str(proc.returncode)).inc()
+        for phase, p in (getattr(proc, "log_index", None) or {}).get("phases", {}).items():
+            BACKTEST_PHASE_SECONDS.labels(tool, phase).observe(p["seconds"])
+    return proc
+
+
+def record_cache(tool, hit):
+    if ENABLED:
+        BACKTEST_CACHE.labels(tool, "hit" if hit else "miss").inc()
+
+
+def record_risk(gross, net, realized, unrealized, portfolio_value):
+    if not ENABLED:
+        return
+    RISK_EXPOSURE.labels("gross").set(gross)
+    RISK_EXPOSURE.labels("net").set(net)
+    if portfolio_value:
+        RISK_EXPOSURE_RATIO.labels("gross").set(gross / portfolio_value)
+        RISK_EXPOSURE_RATIO.labels("net").set(net / portfolio_value)
+    RISK_PNL.labels("realized").set(realized)
+    RISK_PNL.labels("unrealized").set(unrealized)
+
+
+def record_risk_alert(rule):
+    if ENABLED:
+        RISK_ALERTS.labels(rule).inc()
+
+
+def observe_fill_lag(app, seconds):
+    if ENABLED and seconds >= 0:
+        FILL_LAG_SECONDS.labels(app).observe(seconds)
+
+
+def record_issues(issues):
+    if not ENABLED:
+        return
+    kinds = {"duplicate_batch": 0, "empty_batch": 0, "other": 0}
+    for i in issues:
+        if i.startswith("batch_id '"):
+            kinds["duplicate_batch"] += 1
+        elif i.startswith("No trades found"):
+            kinds["empty_batch"] += 1
+        else:
+            kinds["other"] += 1
+    for k, n in kinds.items():
+        DIAG_ISSUES.labels(k).set(n)
+
+
+def record_snapshot(dataset, result):
+    if ENABLED:
+        SNAPSHOT_REQUESTS.labels(dataset, result).inc()
+
+
+def record_rerun(app, total, sections):
+    if not ENABLED:
+        return
+    RERUN_SECONDS.labels(app).observe(total)
+    for section, seconds in sections.items():
+        RERUN_SECTION_SECONDS.labels(app, section).observe(seconds)
+
+
+def record_cold_start(app, phase, seconds):
+    if ENABLED:
+        COLD_START_SECONDS.labels(app, phase).set(seconds)
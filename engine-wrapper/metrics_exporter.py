@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# Stand-alone /metrics endpoint for database-side numbers that no single
+# dashboard owns: trade insert counters and periodic diagnostics issue counts.
+# Runs as the metrics-exporter service in docker-compose.yml.
+import os
+import sys
+import time
+import argparse
+
+import metrics
+import diagnostics
+from db_pool import connection
+
+try:
+    from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+except ImportError:
+    print("❌ prometheus_client is required for the exporter", file=sys.stderr)
+    sys.exit(1)
+
+# n_tup_ins is maintained by the stats collector: no table scans, at the
+# cost of a few seconds of lag, which is fine for a rate(). A partitioned
+# table (database/add_trades_partitioning.sql) has no row of its own, so
+# its partitions are listed under the parent's name.
+INSERTS_SQL = """
+    SELECT COALESCE(p.relname, s.relname), s.relid, s.n_tup_ins
+      FROM pg_stat_user_tables s
+      LEFT JOIN pg_inherits i ON i.inhrelid = s.relid
+      LEFT JOIN pg_class p    ON p.oid = i.inhparent
+     WHERE COALESCE(p.relname, s.relname) IN ('trades', 'new_trades', 'executions')
+"""
+
+JOBS_SQL = """
+    SELECT status, COUNT(*)
+      FROM backtest_jobs
+     WHERE status IN ('queued', 'running')
+     GROUP BY status
+"""
+
+LATEST_FILL_SQL = """
+    SELECT EXTRACT(EPOCH FROM now() - MAX(ts))
+      FROM executions
+"""
+
+
+class TradeCollector:
+    def __init__(self, dsn):
+        self.dsn = dsn
+        self.inserted = {}      # table -> rows counted so far
+        self.last     = {}      # partition relid -> its n_tup_ins at the last scrape
+
+    def count_inserts(self, rows):
+        """Fold per-partition counts into one counter per table that only
+        goes up: an archived partition leaving the sum, or a stats reset,
+        would otherwise look like a counter reset to rate()."""
+        last = {}
+        for table, relid, n in rows:
+            prev = self.last.get(relid, 0)
+            # a new partition counts from 0, a reset one from its new value
+            self.inserted[table] = self.inserted.get(table, 0) + (n if n < prev else n - prev)
+            last[relid] = n
+        self.last = last
+        return self.inserted
+
+    def collect(self):
+        inserts = CounterMetricFamily(
+            "liu_trade_rows_inserted", "Rows inserted into trade tables",
+            labels=["table"],
+        )
+        since = GaugeMetricFamily(
+            "liu_seconds_since_last_fill", "Age of the newest execution",
+        )
+        jobs = GaugeMetricFamily(
+            "liu_backtest_jobs", "Queued/running backtest jobs", labels=["status"],
+        )
+        up = GaugeMetricFamily("liu_db_up", "1 if the exporter can reach Postgres")
+        try:
+            with connection(self.dsn) as conn, conn.cursor() as cur:
+                cur.execute(INSERTS_SQL)
+                for table, n in self.count_inserts(cur.fetchall()).items():
+                    inserts.add_metric([table], n)
+                try:
+                    cur.execute(LATEST_FILL_SQL)
+                    age = cur.fetchone()[0]
+                    if age is not None:
+                        since.add_metric([], float(age))
+                except Exception:
+                    pass    # executions read model not installed
+            with connection(self.dsn) as conn, conn.cursor() as cur:
+                try:
+                    cur.execute(JOBS_SQL)
+                    counts = dict(cur.fetchall())
+                    for status in ("queued", "running"):
+                        jobs.add_metric([status], counts.get(status, 0))
+                except Exception:
+                    pass    # job queue not installed
+            up.add_metric([], 1)
+        except Exception as e:
+            print(f"⚠️ scrape failed: {e}", file=sys.stderr)
+            up.add_metric([], 0)
+        yield inserts
+        yield since
+        yield jobs
+        yield up
+
+
+def main():
+    p = argparse.ArgumentParser(description="Prometheus exporter for the Liu stack")
+    p.add_argument("--port", type=int, default=int(os.getenv("METRICS_PORT", 9105)))
+    p.add_argument("--diagnostics-interval", type=int,
+                   default=int(os.getenv("DIAG_INTERVAL_S", 60)),
+                   help="Seconds between collect_diagnostics runs")
+    args = p.parse_args()
+
+    env = {k: os.getenv(k, "") for k in ["DSN", "TRADEPLAN_DIR", "TLOG_LEVEL"]}
+    if not env["DSN"]:
+        print("❌ DSN not set", file=sys.stderr)
+        sys.exit(1)
+
+    metrics.REGISTRY.register(TradeCollector(env["DSN"]))
+    metrics.serve(args.port)
+    print(f"📈 Serving metrics on :{args.port}/metrics")
+
+    previous = None
+    while True:
+        t0 = time.perf_counter()
+        with metrics.query_timer("exporter", "collect_diagnostics"):
+            previous = diagnostics.collect_diagnostics(env, previous)
+        metrics.record_issues(previous["issues"])
+        time.sleep(max(1.0, args.diagnostics_interval - (time.perf_counter() - t0)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# Parameter sweep for the injected mean_reversion_auto strategy.
+#
+#   python3 fix_it_bot.py sweep --symbols AAPL,MSFT --start-date 2025-01-02 \
+#       --end-date 2025-06-30 --param lookback=10:40:5 \
+#       --param threshold=1.0,1.5,2.0 --param allocation_pct=0.1:0.3:0.1
+#
+# Every combination is run on a short first slice of the date range; only the
+# best --keep fraction goes on to the full range. The slice runs (batch ids
+# ending in -p) are deleted once they are ranked (unless --keep-slices), so
+# they don't pile up in algo_run/trades. Finalists are ranked and upserted
+# into the backtests table. The survivors' full-range runs start over from
+# --start-date, so the first --prune-days are backtested twice for each of
+# them (once scored in the slice, once again in the "Full range" stage).
+import os
+import sys
+import json
+import random
+import argparse
+import itertools
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import backtest_analytics
+import dedupe_batches
+import metrics
+from fix_it_bot import DATA_BLOCK, STRAT_SETTINGS, backtest_cmd, strat_block
+
+# ————— Parameter ranges —————
+def parse_date(v):
+    try:
+        return date.fromisoformat(v)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"bad date {v!r}, want YYYY-MM-DD")
+
+def _num(v):
+    return int(v) if v.lstrip("-").isdigit() else float(v)
+
+def parse_param(spec):
+    # name=a,b,c   → explicit values
+    # name=lo:hi:step → inclusive range
+    name, _, rng = spec.partition("=")
+    if not name or not rng:
+        raise argparse.ArgumentTypeError(f"bad --param {spec!r}, want name=values")
+    if ":" in rng:
+        lo, hi, step = (_num(x) for x in rng.split(":"))
+        if step <= 0:
+            raise argparse.ArgumentTypeError(f"step must be > 0 in {spec!r}")
+        n = int(round((hi - lo) / step)) + 1
+        values = [lo + i * step for i in range(n)]
+        if isinstance(lo, float) or isinstance(step, float):
+            values = [round(v, 10) for v in values]
+    else:
+        values = [_num(x) for x in rng.split(",")]
+    return name.strip(), values
+
+def combinations(params, mode, samples, seed):
+    names = [n for n, _ in params]
+    grid = [v for _, v in params]
+    total = 1
+    for v in grid:
+        total *= len(v)
+    if mode == "grid" or samples >= total:
+        picks = itertools.product(*grid)
+    else:
+        # sample grid indices without materialising the whole product
+        rnd = random.Random(seed)
+        picks = []
+        for idx in rnd.sample(range(total), samples):
+            combo = []
+            for v in reversed(grid):
+                idx, r = divmod(idx, len(v))
+                combo.append(v[r])
+            picks.append(tuple(reversed(combo)))
+    return [dict(zip(names, c)) for c in picks]
+
+# ————— Tradeplan generation —————
+def strip_strategy(text, name="mean_reversion_auto"):
+    # drop every [[strategies]] block (incl. its sub-tables) for `name`
+    out, block = [], None
+    for line in text.splitlines(keepends=True):
+        head = line.strip()
+        if head.startswith("[") and not head.startswith(("[strategies.", "[[strategies.")):
+            if block is not None and name not in "".join(block):
+                out += block
+            block = [line] if head == "[[strategies]]" else None
+            if block is not None:
+                continue
+        if block is not None:
+            block.append(line)
+        else:
+            out.append(line)
+    if block is not None and name not in "".join(block):
+        out += block
+    return "".join(out)
+
+def write_tradeplan(base_text, settings, path):
+    text = strip_strategy(base_text).rstrip() + "\n"
+    if "[data]" not in text:
+        text += "\n" + DATA_BLOCK
+    path.write_text(text + "\n" + strat_block(settings))
+    return path
+
+# ————— Running & scoring —————
+def run_one(args, tradeplan, batch_id, end_date):
+    run_args = argparse.Namespace(**{
+        **vars(args),
+        "tradeplan":  str(tradeplan),
+        "start_date": str(args.start_date),
+        "end_date":   str(end_date),
+    })
+    dg = tradeplan.with_suffix(".diagnostics.json")
+    cmd = backtest_cmd(run_args, args.symbols, batch_id, str(dg))
+    t0 = time.monotonic()
+    proc = metrics.run_backtest("fix_it_bot_sweep", cmd, log_name=batch_id,
+                                capture_output=True, text=True)
+    if proc.returncode != 0:
+        print(f"❌ [{batch_id}] exited {proc.returncode}", file=sys.stderr)
+    return batch_id, proc.returncode, round(time.monotonic() - t0, 3)
+
+def score_batches(dsn, batch_ids, save=False):
+    # backtest_analytics scores all batches in one pass; save=True also
+    # upserts them into `backtests`
+    keep = ("trades", "win_rate", "net_profit", "max_drawdown", "sharpe", "sortino")
+    rows = backtest_analytics.refresh(dsn, list(batch_ids), save=save)
+    return {bid: {k: r[k] for k in keep} for bid, r in rows.items()}
+
+def run_stage(args, label, runs, end_date):
+    # runs: list of (batch_id, tradeplan path)
+    print(f"🚀 {label}: {len(runs)} runs on {args.start_date} → {end_date} "
+          f"({args.workers} workers)")
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        done = list(pool.map(lambda r: run_one(args, r[1], r[0], end_date), runs))
+    ok = [bid for bid, rc, _ in done if rc == 0]
+    scores = score_batches(args.dsn, ok) if ok else {}
+    empty = {"trades": 0, "win_rate": 0.0, "net_profit": 0.0, "max_drawdown": 0.0,
+             "sharpe": None, "sortino": None}
+    return {bid: {**empty, **scores.get(bid, {}), "returncode": rc, "duration_s": dur}
+            for bid, rc, dur in done}
+
+def purge_slices(dsn, batch_ids):
+    # every run of the pruning stage, failed ones included; they were only
+    # written to be ranked and never reach `backtests`
+    try:
+        gone = dedupe_batches.dedupe(dsn, batch_ids, purge=True)
+    except Exception as e:
+        print(f"⚠️ Could not remove the slice runs ({e}); delete batches ending in -p "
+              f"with dedupe_batches.dedupe(purge=True)", file=sys.stderr)
+        return
+    print(f"🗑️ Removed {gone['runs']} slice run(s), {gone['trades']:,} trades")
+
+def rank(results, key):
+    # ratios are None for batches with too few trading days: rank them last
+    return sorted(results, key=lambda r: (r["returncode"] != 0, r[key] is None, -(r[key] or 0)))
+
+def main(argv=None):
+    p = argparse.ArgumentParser(
+        prog="fix_it_bot.py sweep",
+        description="Grid/random search over mean_reversion_auto settings"
+    )
+    p.add_argument("--symbols",     required=True,
+                   help="Comma-separated list of tickers")
+    p.add_argument("--start-date",  required=True, type=parse_date,
+                   help="YYYY-MM-DD")
+    p.add_argument("--end-date",    required=True, type=parse_date,
+                   help="YYYY-MM-DD")
+    p.add_argument("--tradeplan",   default="liu_samples/tradeplan.toml",
+                   help="Base tradeplan.toml (left untouched)")
+    p.add_argument("--param",       action="append", type=parse_param, default=[],
+                   help="name=a,b,c or name=lo:hi:step (repeatable)")
+    p.add_argument("--mode",        default="grid", choices=["grid", "random"])
+    p.add_argument("--samples",     type=int, default=50,
+                   help="Combinations to draw in random mode")
+    p.add_argument("--seed",        type=int, default=None)
+    p.add_argument("--workers",     type=int, default=os.cpu_count() or 1,
+                   help="Max concurrent backtest subprocesses")
+    p.add_argument("--prune-days",  type=int, default=30,
+                   help="Length of the first slice every combination runs on "
+                        "(0 disables pruning)")
+    p.add_argument("--keep",        type=float, default=0.25,
+                   help="Fraction of combinations promoted to the full range")
+    p.add_argument("--keep-slices", action="store_true",
+                   help="Leave the first-slice runs (<batch>-p) in the database")
+    p.add_argument("--rank-by",     default="net_profit",
+                   choices=["net_profit", "win_rate", "sharpe", "sortino"])
+    p.add_argument("--batch-prefix", default=f"sweep-{datetime.now():%Y%m%d-%H%M%S}")
+    p.add_argument("--out",         default=None,
+                   help="Write the ranked results as JSON here")
+    p.add_argument("--log-level",   default="INFO",
+                   choices=["DEBUG","INFO","WARNING","ERROR","CRITICAL"])
+    args = p.parse_args(argv)
+    if args.end_date < args.start_date:
+        p.error("--end-date is before --start-date")
+    args.dsn = os.getenv("DSN", "")
+
+    if not args.dsn:
+        print("❌ DSN not set — sweep results are scored from the trades table.",
+              file=sys.stderr)
+        sys.exit(1)
+
+    tp = Path(args.tradeplan)
+    if not tp.exists():
+        print(f"❌ tradeplan not found at {tp}", file=sys.stderr)
+        sys.exit(1)
+    os.environ["TLOG_LEVEL"] = args.log_level
+
+    params = args.param or [(k, [v]) for k, v in STRAT_SETTINGS.items()]
+    combos = combinations(params, args.mode, args.samples, args.seed)
+    # unspecified settings keep their defaults
+    combos = [{**STRAT_SETTINGS, **c} for c in combos]
+    print(f"🧪 {len(combos)} combinations ({args.mode})")
+
+    base_text = tp.read_text()
+    with tempfile.TemporaryDirectory(prefix=".sweep-", dir=tp.parent) as tmp:
+        plans = {}
+        for i, settings in enumerate(combos):
+            bid = f"{args.batch_prefix}-c{i:04d}"
+            plans[bid] = (settings, write_tradeplan(base_text, settings, Path(tmp) / f"{bid}.toml"))
+
+        survivors = list(plans)
+        slice_end = args.start_date + timedelta(days=args.prune_days)
+        if args.prune_days > 0 and slice_end < args.end_date and len(plans) > 1:
+            first = run_stage(args, "Slice",
+                              [(f"{bid}-p", plans[bid][1]) for bid in survivors], slice_end)
+            ranked = rank([{"batch_id": bid, **first[f"{bid}-p"]} for bid in survivors],
+                          args.rank_by)
+            n_keep = max(1, int(round(len(ranked) * args.keep)))
+            survivors = [r["batch_id"] for r in ranked[:n_keep]]
+            print(f"✂️ Pruned {len(ranked) - n_keep} of {len(ranked)} after first slice")
+            if not args.keep_slices:
+                purge_slices(args.dsn, list(first))
+
+        final = run_stage(args, "Full range",
+                          [(bid, plans[bid][1]) for bid in survivors], args.end_date)
+
+    results = rank(
+        [{"batch_id": bid, "settings": plans[bid][0], **final[bid]} for bid in survivors],
+        args.rank_by,
+    )
+    score_batches(args.dsn, [r["batch_id"] for r in results if r["returncode"] == 0], save=True)
+
+    print(f"🏁 Top results by {args.rank_by}:")
+    for r in results[:10]:
+        print(f" • {r['batch_id']}  net={r['net_profit']:.2f}  "
+              f"win={r['win_rate']*100:.1f}%  {r['settings']}")
+    if args.out:
+        Path(args.out).write_text(json.dumps(results, indent=2))
+        print("📝 Results written to", args.out)
+    sys.exit(0 if any(r["returncode"] == 0 for r in results) else 1)
+
+if __name__ == "__main__":
+    main()
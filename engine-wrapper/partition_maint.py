@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# Maintenance for the partitioned trades/new_trades tables
+# (database/add_trades_partitioning.sql):
+#   1. create the next --months-ahead monthly partitions and move rows that
+#      landed in the DEFAULT partition into their own month, and move the
+#      oldest --split-months months of the pre-migration <table>_legacy
+#      partition into monthly partitions of their own;
+#   2. archive partitions whose range ended more than --retention-days ago to
+#      zstd-compressed Parquet, then detach and drop them.
+#
+# A partition is only archived once none of its rows belong to an algo_run
+# started inside the retention window, because backtests write trades with
+# historical buy_times. Export, detach and drop happen in one transaction
+# with the partition locked against writes, so rows are either in Postgres
+# or in a finished archive file, never neither.
+import os
+import re
+import sys
+import time
+import argparse
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import psycopg2
+from psycopg2 import sql
+
+TABLES        = ("trades", "new_trades")
+ARCHIVE_DIR   = os.getenv("ARCHIVE_DIR", "liu_samples/archive")
+RETENTION_D   = int(os.getenv("TRADES_RETENTION_DAYS", 365))
+SPLIT_MONTHS  = int(os.getenv("LEGACY_SPLIT_MONTHS", 3))
+EXPORT_CHUNK  = 50_000
+# promoted indicator columns (indicators.py) of each table
+INDICATOR_TABLES = {"trades":     ("trade_buy_indicators", "trade_sell_indicators"),
+                    "new_trades": ("new_trade_indicators",)}
+
+PARTITIONS_SQL = """
+    SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+      FROM pg_inherits i
+      JOIN pg_class c ON c.oid = i.inhrelid
+     WHERE i.inhparent = %s::regclass
+"""
+
+COLUMNS_SQL = """
+    SELECT column_name, data_type, numeric_precision, numeric_scale
+      FROM information_schema.columns
+     WHERE table_schema = current_schema()
+       AND table_name = %s
+     ORDER BY ordinal_position
+"""
+
+UPPER_BOUND = re.compile(r"TO \('([^']+)'\)")
+
+
+def arrow_type(pa, data_type, precision, scale):
+    return {
+        "smallint":                    pa.int16(),
+        "integer":                     pa.int32(),
+        "bigint":                      pa.int64(),
+        "boolean":                     pa.bool_(),
+        "real":                        pa.float32(),
+        "double precision":            pa.float64(),
+        "date":                        pa.date32(),
+        "timestamp without time zone": pa.timestamp("us"),
+        "timestamp with time zone":    pa.timestamp("us", tz="UTC"),
+        "numeric":                     pa.decimal128(precision, scale) if precision else None,
+    }.get(data_type) or pa.string()
+
+
+def export_parquet(conn, table, path):
+    # streams the partition through a server-side cursor; jsonb, enums and
+    # anything else without a native Arrow type are stored as text
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    with conn.cursor() as cur:
+        cur.execute(COLUMNS_SQL, (table,))
+        cols = cur.fetchall()
+    schema = pa.schema([(name, arrow_type(pa, dt, p, s)) for name, dt, p, s in cols])
+    select = sql.SQL(", ").join(
+        sql.SQL("{}::text").format(sql.Identifier(f.name)) if f.type == pa.string()
+        else sql.Identifier(f.name)
+        for f in schema
+    )
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp")
+    rows = 0
+    with conn.cursor(name=f"export_{table}") as cur:
+        cur.itersize = EXPORT_CHUNK
+        cur.execute(sql.SQL("SELECT {} FROM {}").format(select, sql.Identifier(table)))
+        with pq.ParquetWriter(tmp, schema, compression="zstd") as writer:
+            while True:
+                chunk = cur.fetchmany(EXPORT_CHUNK)
+                if not chunk:
+                    break
+                writer.write_table(pa.Table.from_pydict(
+                    {f.name: [r[i] for r in chunk] for i, f in enumerate(schema)}, schema))
+                rows += len(chunk)
+    with open(tmp, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return rows
+
+
+def partitions(cur, parent):
+    cur.execute(PARTITIONS_SQL, (parent,))
+    out = []
+    for name, bound in cur.fetchall():
+        m = UPPER_BOUND.search(bound)
+        if m:   # DEFAULT has no upper bound and is never archived
+            out.append((name, datetime.fromisoformat(m.group(1))))
+    return sorted(out, key=lambda p: p[1])
+
+
+def archive_partition(conn, parent, part, archive_dir, retention_days, dry_run=False):
+    with conn.cursor() as cur:
+        # no new rows while we copy; reads carry on
+        cur.execute(sql.SQL("LOCK TABLE {} IN SHARE MODE").format(sql.Identifier(part)))
+        cur.execute(
+            sql.SQL("""
+                SELECT EXISTS (
+                    SELECT 1
+                      FROM {} p
+                      JOIN algo_run ar ON ar.algo_run_id = p.algo_run_id
+                     WHERE ar.start_time >= now() - make_interval(days => %s)
+                )
+            """).format(sql.Identifier(part)),
+            (retention_days,),
+        )
+        if cur.fetchone()[0]:
+            conn.rollback()
+            print(f"⏭️  {part}: holds rows from recent runs, keeping it")
+            return None
+        if dry_run:
+            cur.execute(sql.SQL("SELECT COUNT(*) FROM {}").format(sql.Identifier(part)))
+            n = cur.fetchone()[0]
+            conn.rollback()
+            print(f"🔎 {part}: would archive {n} rows")
+            return n
+
+    path = Path(archive_dir) / parent / f"{part}.parquet"
+    t0 = time.perf_counter()
+    rows = export_parquet(conn, part, path)
+
+    if not rows:
+        path.unlink()       # nothing worth keeping
+
+    with conn.cursor() as cur:
+        cur.execute(sql.SQL("ALTER TABLE {} DETACH PARTITION {}").format(
+            sql.Identifier(parent), sql.Identifier(part)))
+        # detach/drop fire no DELETE triggers: keep the read model and the
+        # incremental diagnostics honest by hand
+        if parent == "trades":
+            cur.execute(sql.SQL(
+                "DELETE FROM executions WHERE trade_id IN (SELECT trade_id FROM {})"
+            ).format(sql.Identifier(part)))
+        for side in INDICATOR_TABLES[parent]:
+            cur.execute("SELECT to_regclass(%s) IS NOT NULL", (side,))
+            if cur.fetchone()[0]:
+                cur.execute(sql.SQL("DELETE FROM {} WHERE trade_id IN (SELECT trade_id FROM {})").format(
+                    sql.Identifier(side), sql.Identifier(part)))
+        cur.execute("SELECT nextval('batch_delete_seq') WHERE to_regclass('batch_delete_seq') IS NOT NULL")
+        cur.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(part)))
+    conn.commit()
+    if rows:
+        size = path.stat().st_size / 1024 / 1024
+        print(f"📦 {part}: {rows} rows → {path} ({size:.1f} MB, {time.perf_counter() - t0:.1f}s)")
+    else:
+        print(f"🗑️  {part}: empty, dropped")
+    return rows
+
+
+def run(dsn, months_ahead=3, retention_days=RETENTION_D, archive_dir=ARCHIVE_DIR,
+        archive=True, dry_run=False, split_months=SPLIT_MONTHS):
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SET statement_timeout = 0")
+        conn.commit()
+        cutoff = datetime.now() - timedelta(days=retention_days)
+        for parent in TABLES:
+            with conn.cursor() as cur:
+                if not dry_run:
+                    cur.execute("SELECT * FROM maintain_trade_partitions(%s, %s)",
+                                (parent, months_ahead))
+                    made = [r[0] for r in cur.fetchall() if r[0]]
+                    print(f"🗓️  {parent}: {len(made)} monthly partitions in place")
+                    if split_months:
+                        # locks the table while it moves rows, a few months per run
+                        cur.execute("SELECT * FROM split_legacy_partition(%s, %s)",
+                                    (parent, split_months))
+                        split = [r[0] for r in cur.fetchall() if r[0]]
+                        if split:
+                            print(f"✂️  {parent}_legacy: moved {split[0]}…{split[-1]} out")
+                old = [p for p, upper in partitions(cur, parent) if upper <= cutoff]
+            conn.commit()
+            if not archive:
+                continue
+            for part in old:
+                archive_partition(conn, parent, part, archive_dir, retention_days, dry_run)
+    finally:
+        conn.close()
+
+
+def main():
+    p = argparse.ArgumentParser(description="Create and archive trades/new_trades partitions")
+    p.add_argument("--months-ahead", type=int, default=3,
+                   help="Monthly partitions to keep ready past the current month")
+    p.add_argument("--split-months", type=int, default=SPLIT_MONTHS,
+                   help="Oldest months of <table>_legacy to move into monthly partitions "
+                        "per run (0 to leave it alone); the table is locked while they move")
+    p.add_argument("--retention-days", type=int, default=RETENTION_D,
+                   help="Archive partitions whose range ended longer ago than this")
+    p.add_argument("--archive-dir", default=ARCHIVE_DIR,
+                   help="Where <table>/<partition>.parquet files go")
+    p.add_argument("--no-archive", action="store_true",
+                   help="Only create partitions")
+    p.add_argument("--dry-run", action="store_true",
+                   help="Report what would be archived; change nothing")
+    p.add_argument("--loop", type=int, default=0,
+                   help="Repeat every N seconds instead of running once")
+    args = p.parse_args()
+
+    dsn = os.getenv("DSN", "")
+    if not dsn:
+        print("❌ DSN not set", file=sys.stderr)
+        sys.exit(1)
+    if not args.no_archive:
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            print("❌ pyarrow is required for archiving (or pass --no-archive)", file=sys.stderr)
+            sys.exit(1)
+
+    while True:
+        try:
+            run(dsn, args.months_ahead, args.retention_days, args.archive_dir,
+                archive=not args.no_archive, dry_run=args.dry_run,
+                split_months=args.split_months)
+        except psycopg2.Error as e:
+            print(f"❌ Maintenance failed: {e}", file=sys.stderr)
+            if not args.loop:
+                sys.exit(1)
+        if not args.loop:
+            break
+        time.sleep(args.loop)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+# Wall time of every Streamlit rerun, split into page sections and loaders.
+#
+#   import rerun_profile
+#   prof = rerun_profile.start("live_trades")   # before the other imports
+#   import streamlit as st, …
+#   prof.mark("imports")
+#   …page section…
+#   prof.mark("risk")                           # time since the previous mark
+#   …
+#   prof.finish()                               # metrics + the debug panel
+#
+# Every metrics.query_timer() that runs during the rerun is listed as a
+# loader of the section it ran in. Per process, the imports of the first
+# rerun and the time from process start to the end of that rerun are kept as
+# the cold start. Everything goes to Prometheus (metrics.py). The debug panel,
+# an expander at the bottom of the page with p50/p95 over recent reruns, shows
+# when DEBUG_PANEL=1 or the URL has ?debug=1.
+import os
+import threading
+import time
+from collections import deque
+
+import metrics
+
+PANEL   = os.getenv("DEBUG_PANEL", "").lower() in ("1", "true", "yes")
+HISTORY = 200       # reruns kept per app for the panel's percentiles
+
+_local   = threading.local()    # Streamlit runs each session's script on its own thread
+_lock    = threading.Lock()
+_history = {}                   # app -> deque of {"total": s, "sections": {name: s}}
+_cold    = {}                   # app -> {"imports_s", "first_rerun_s", "process_s"}
+
+
+def _process_start():
+    # wall clock of process start (Linux), else of this module's import
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return time.time() - uptime + start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return time.time()
+
+
+PROCESS_START = _process_start()
+
+
+def _on_query(app, query, seconds):
+    prof = getattr(_local, "prof", None)
+    if prof is not None and not prof.done:
+        prof.loaders.append([query, seconds, None])
+
+
+metrics.on_query(_on_query)
+
+
+class Profile:
+    def __init__(self, app):
+        self.app      = app
+        self.t0       = time.perf_counter()
+        self.last     = self.t0
+        self.sections = {}
+        self.loaders  = []      # [query, seconds, section]
+        self.total    = None
+        self.done     = False
+
+    def mark(self, section):
+        now = time.perf_counter()
+        self.sections[section] = self.sections.get(section, 0.0) + now - self.last
+        self.last = now
+        for loader in self.loaders:
+            if loader[2] is None:
+                loader[2] = section
+
+    def finish(self, panel=None):
+        """Record this rerun; show the debug panel if enabled (or `panel`)."""
+        if self.done:
+            return
+        if any(loader[2] is None for loader in self.loaders):
+            self.mark("other")
+        self.total, self.done = time.perf_counter() - self.t0, True
+        with _lock:
+            _history.setdefault(self.app, deque(maxlen=HISTORY)).append(
+                {"total": self.total, "sections": dict(self.sections)})
+            if self.app not in _cold:
+                _cold[self.app] = {
+                    "imports_s":     self.sections.get("imports", 0.0),
+                    "first_rerun_s": self.total,
+                    "process_s":     time.time() - PROCESS_START,
+                }
+                for phase, s in _cold[self.app].items():
+                    metrics.record_cold_start(self.app, phase.rsplit("_", 1)[0], s)
+        metrics.record_rerun(self.app, self.total, self.sections)
+        if panel or (panel is None and _wanted()):
+            self.panel()
+
+    def panel(self):
+        import pandas as pd
+        import streamlit as st
+
+        with _lock:
+            runs = list(_history.get(self.app, ()))
+            cold = dict(_cold.get(self.app, {}))
+        rows = []
+        for name, s in self.sections.items():
+            past = [r["sections"][name] for r in runs if name in r["sections"]]
+            rows.append({"section": name, "ms": s * 1000,
+                         "p50 ms": _pct(past, 50) * 1000, "p95 ms": _pct(past, 95) * 1000})
+        totals = [r["total"] for r in runs]
+        with st.expander("🐞 Rerun profile", expanded=False):
+            st.caption(
+                f"This rerun {self.total * 1000:.1f} ms · p50 {_pct(totals, 50) * 1000:.1f} ms · "
+                f"p95 {_pct(totals, 95) * 1000:.1f} ms over {len(runs)} rerun(s) · "
+                f"cold start: imports {cold.get('imports_s', 0) * 1000:.0f} ms, "
+                f"first rerun {cold.get('first_rerun_s', 0):.2f} s, "
+                f"{cold.get('process_s', 0):.1f} s after process start"
+            )
+            st.dataframe(pd.DataFrame(rows).round(2), use_container_width=True, hide_index=True)
+            if self.loaders:
+                st.dataframe(pd.DataFrame([{"loader": q, "section": sec, "ms": s * 1000}
+                                           for q, s, sec in self.loaders]).round(2),
+                             use_container_width=True, hide_index=True)
+
+
+def _pct(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q / 100))]
+
+
+def _wanted():
+    if PANEL:
+        return True
+    try:
+        import streamlit as st
+        return str(st.query_params.get("debug", "")) in ("1", "true")
+    except Exception:
+        return False
+
+
+def start(app):
+    """A new profile for this rerun, current on the calling thread."""
+    prof = _local.prof = Profile(app)
+    return prof
@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+# Shared read model for the dashboards: one process queries, every viewer
+# reads the result.
+#
+# The service runs one refresher thread per dataset (recent executions,
+# recent backtests). Each thread re-reads its dataset every
+# SNAPSHOT_REFRESH_MS and publishes a new version only when the rows
+# changed. The version is encoded to JSON once and served as is:
+#
+#   GET /snapshots/<name>                   200 + ETag, or 304 on If-None-Match
+#   GET /snapshots/<name>?after=<v>&wait=20 long poll until version > v
+#   GET /healthz                            versions, ages, errors, hit counts
+#
+# Database load is one query per dataset per interval, however many
+# Streamlit processes and sessions are watching. The dashboards use
+# SnapshotFeed (SNAPSHOT_URL): it keeps the last frame and revalidates it
+# with its ETag, so an unchanged dataset costs a 304 and no parsing.
+# Without SNAPSHOT_URL, or while the service is unreachable, they query
+# Postgres themselves like before.
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+import urllib.error
+import urllib.request
+from abc import ABC, abstractmethod
+from collections import deque
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import metrics
+from db_pool import connection
+from watermark import IdWatermark
+
+PORT        = int(os.getenv("SNAPSHOT_PORT", 8700))
+REFRESH_MS  = int(os.getenv("SNAPSHOT_REFRESH_MS", 1000))
+ROWS        = int(os.getenv("SNAPSHOT_ROWS", 200))
+MAX_WAIT_S  = 25
+EPOCH       = datetime(1970, 1, 1, tzinfo=timezone.utc)
+CLIENT_TIMEOUT_S = float(os.getenv("SNAPSHOT_TIMEOUT_S", 2))
+
+EXECUTIONS_SQL = """
+    SELECT execution_id, ts, symbol, side, qty, price
+      FROM executions
+     WHERE execution_id > %s
+     ORDER BY execution_id DESC
+     LIMIT %s
+"""
+
+BACKTESTS_SQL = """
+    SELECT batch_id, run_at, symbols, win_rate, net_profit
+      FROM backtests
+     ORDER BY run_at DESC
+     LIMIT %s
+"""
+
+
+def _json(value):
+    # timestamps travel as integer epoch microseconds: exact, and any pandas
+    # parses them the same
+    if isinstance(value, datetime):
+        value = value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+        return (value - EPOCH) // timedelta(microseconds=1)
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+# ————— datasets —————
+class Dataset(ABC):
+    """A named query whose latest result is published as a snapshot."""
+
+    name    = ""
+    columns = ()
+    dates   = ()        # columns the client parses as timestamps
+    zoned   = ()        # of those, the TIMESTAMPTZ ones; the rest stay naive UTC
+    index   = None      # column the client makes the index
+
+    def __init__(self, dsn, rows=ROWS):
+        self.dsn  = dsn
+        self.rows = rows
+
+    @abstractmethod
+    def load(self):
+        """Return the current rows, in `columns` order."""
+
+
+class Executions(Dataset):
+    # incremental like streamlit/app/executions_feed.py: only rows past the
+    # watermark are fetched, and a late commit below it is still picked up
+    name    = "executions"
+    columns = ("timestamp", "symbol", "side", "qty", "price")
+    dates   = ("timestamp",)
+    index   = "timestamp"
+
+    def __init__(self, dsn, rows=ROWS):
+        super().__init__(dsn, rows)
+        self.buffer    = deque(maxlen=rows)
+        self.watermark = IdWatermark()
+
+    def load(self):
+        with connection(self.dsn) as conn, conn.cursor() as cur:
+            cur.execute(EXECUTIONS_SQL, (self.watermark.after, self.rows))
+            fresh = self.watermark.fresh(cur.fetchall(), cut_low=cur.rowcount == self.rows)
+        self.buffer.extend(r[1:] for r in reversed(fresh))
+        return sorted(self.buffer, key=lambda r: r[0], reverse=True)
+
+
+class Backtests(Dataset):
+    name    = "backtests"
+    columns = ("batch_id", "run_at", "symbols", "win_rate", "net_profit")
+    dates   = ("run_at",)
+    zoned   = ("run_at",)
+
+    def load(self):
+        with connection(self.dsn) as conn, conn.cursor() as cur:
+            cur.execute(BACKTESTS_SQL, (self.rows,))
+            return cur.fetchall()
+
+
+DATASETS = (Executions, Backtests)
+
+
+class Publisher:
+    """Refresher thread for one dataset plus its current snapshot."""
+
+    def __init__(self, dataset, interval_s):
+        self.dataset   = dataset
+        self.interval  = interval_s
+        self.version   = 0
+        self.current   = None   # (version, etag, body), swapped as one
+        self.digest    = None
+        self.published = None
+        self.error     = None
+        self.stats     = {"refreshes": 0, "published": 0, "served": 0, "not_modified": 0}
+        self._cond     = threading.Condition()
+        threading.Thread(target=self._run, daemon=True,
+                         name=f"snapshot-{dataset.name}").start()
+
+    def _refresh(self):
+        d = self.dataset
+        with metrics.query_timer("snapshot_service", d.name):
+            rows = d.load()
+        self.stats["refreshes"] += 1
+        payload = json.dumps([list(r) for r in rows], default=_json, separators=(",", ":"))
+        digest = hashlib.sha1(payload.encode()).hexdigest()
+        if digest == self.digest:
+            return
+        body = (f'{{"name":"{d.name}","version":{self.version + 1},"generated_at":{time.time():.3f},'
+                f'"columns":{json.dumps(d.columns)},"dates":{json.dumps(d.dates)},'
+                f'"zoned":{json.dumps(d.zoned)},'
+                f'"index":{json.dumps(d.index)},"rows":{payload}}}').encode()
+        with self._cond:
+            self.version += 1
+            self.digest    = digest
+            self.current   = (self.version, f'"{d.name}-{self.version}-{digest[:12]}"', body)
+            self.published = time.time()
+            self.stats["published"] += 1
+            self._cond.notify_all()
+
+    def _run(self):
+        backoff = self.interval
+        while True:
+            try:
+                self._refresh()
+                self.error, backoff = None, self.interval
+            except Exception as e:
+                # keep serving the last good snapshot
+                if self.error is None:
+                    print(f"⚠️ {self.dataset.name} refresh failed: {e}", file=sys.stderr)
+                self.error = str(e).splitlines()[0] if str(e) else type(e).__name__
+                backoff = min(backoff * 2, 30)
+            time.sleep(backoff)
+
+    def wait(self, after, timeout):
+        with self._cond:
+            self._cond.wait_for(lambda: self.version > after, timeout)
+
+    def health(self):
+        return {"version": self.version, "rows": self.dataset.rows,
+                "age_s": round(time.time() - self.published, 3) if self.published else None,
+                "error": self.error, **self.stats}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    publishers = {}
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, code, body=b"", headers=None):
+        self.send_response(code)
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == "/healthz":
+            body = json.dumps({n: p.health() for n, p in self.publishers.items()}).encode()
+            return self._send(200, body, {"Content-Type": "application/json"})
+        name = url.path.rsplit("/", 1)[-1] if url.path.startswith("/snapshots/") else None
+        pub = self.publishers.get(name)
+        if pub is None:
+            return self._send(404, b'{"error":"unknown snapshot"}', {"Content-Type": "application/json"})
+        q = parse_qs(url.query)
+        if "after" in q:
+            try:
+                after, wait = int(q["after"][0]), float(q.get("wait", [MAX_WAIT_S])[0])
+                if not wait >= 0:       # also rejects nan
+                    raise ValueError(wait)
+            except ValueError:
+                return self._send(400, b'{"error":"after must be an integer, wait a non-negative number"}',
+                                  {"Content-Type": "application/json"})
+            pub.wait(after, min(wait, MAX_WAIT_S))
+        if pub.current is None:
+            return self._send(503, b'{"error":"no snapshot yet"}',
+                              {"Content-Type": "application/json", "Retry-After": "1"})
+        version, etag, body = pub.current
+        headers = {"ETag": etag, "X-Snapshot-Version": str(version), "Cache-Control": "no-cache"}
+        if self.headers.get("If-None-Match") == etag:
+            pub.stats["not_modified"] += 1
+            metrics.record_snapshot(name, "not_modified")
+            return self._send(304, headers=headers)
+        pub.stats["served"] += 1
+        metrics.record_snapshot(name, "served")
+        self._send(200, body, {**headers, "Content-Type": "application/json"})
+
+
+def serve(dsn, port=PORT, interval_s=REFRESH_MS / 1000, rows=ROWS):
+    _Handler.publishers = {cls.name: Publisher(cls(dsn, rows), interval_s) for cls in DATASETS}
+    server = ThreadingHTTPServer(("", port), _Handler)
+    server.daemon_threads = True
+    return server
+
+
+# ————— client —————
+class SnapshotUnavailable(Exception):
+    pass
+
+
+class SnapshotFeed:
+    """Reads one dataset from the snapshot service.
+
+    Same refresh()/fetched interface as ExecutionsFeed, so a dashboard can
+    use either. The last frame is kept and revalidated with its ETag; a 304
+    returns it as is. When the service can't be reached, refresh() raises
+    SnapshotUnavailable (immediately, for RETRY_S after a failure) so the
+    caller can query Postgres instead.
+    """
+
+    RETRY_S = 10
+
+    def __init__(self, url, name, app="dashboard", timeout=CLIENT_TIMEOUT_S):
+        self.url      = f"{url.rstrip('/')}/snapshots/{name}"
+        self.app      = app
+        self.timeout  = timeout
+        self.etag     = None
+        self.version  = None    # snapshot version of the last frame
+        self.seen     = None    # TradeStream version the last frame is current for
+        self.pending  = None    # (stream version, snapshot version then, since)
+        self.fetched  = 0       # 1 when the last refresh got a new version
+        self.retry_at = 0.0
+        self._last    = None
+        self._lock    = threading.Lock()
+
+    SETTLE_S = 10   # longest a stream version waits for the service to catch up
+
+    def refresh(self, version=None):
+        # `version` comes from a TradeStream: if nothing was published since
+        # the last refresh, the previous frame is still current. A new stream
+        # version usually arrives before the service has re-read the dataset,
+        # so it only counts as seen once a newer snapshot came back (or after
+        # SETTLE_S); until then every rerun revalidates, which costs a 304.
+        with self._lock:
+            self.fetched = 0
+            if version is not None and version == self.seen and self._last is not None:
+                return self._last
+            if version is not None and (self.pending is None or self.pending[0] != version):
+                self.pending = (version, self.version, time.monotonic())
+            if time.monotonic() < self.retry_at:
+                raise SnapshotUnavailable(f"{self.url}: retrying shortly")
+            req = urllib.request.Request(self.url)
+            if self.etag and self._last is not None:
+                req.add_header("If-None-Match", self.etag)
+            try:
+                with metrics.query_timer(self.app, "snapshot"), \
+                        urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                    snap = json.loads(resp.read())
+                    self.etag = resp.headers.get("ETag")
+            except urllib.error.HTTPError as e:
+                if e.code != 304:
+                    self.retry_at = time.monotonic() + self.RETRY_S
+                    raise SnapshotUnavailable(f"{self.url}: HTTP {e.code}") from e
+                self._settle(version)
+                return self._last
+            except (OSError, ValueError) as e:
+                self.retry_at = time.monotonic() + self.RETRY_S
+                raise SnapshotUnavailable(f"{self.url}: {e}") from e
+            self.version = snap["version"]
+            self.fetched = 1
+            self._last   = self._frame(snap)
+            self._settle(version)
+            return self._last
+
+    def _settle(self, version):
+        if version is None or self.pending is None:
+            return
+        _, base, since = self.pending
+        if base is None or (self.version or 0) > base or time.monotonic() - since > self.SETTLE_S:
+            self.seen, self.pending = version, None
+
+    @staticmethod
+    def _frame(snap):
+        import pandas as pd
+        df = pd.DataFrame(snap["rows"], columns=snap["columns"])
+        # same dtypes as the pages' own queries: executions.ts is a naive UTC
+        # TIMESTAMP, backtests.run_at a TIMESTAMPTZ
+        for c in snap["dates"]:
+            df[c] = pd.to_datetime(df[c], unit="us", utc=c in snap.get("zoned", ()))
+        return df.set_index(snap["index"]) if snap["index"] else df
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Serve shared dashboard snapshots over HTTP")
+    p.add_argument("--port", type=int, default=PORT)
+    p.add_argument("--interval-ms", type=int, default=REFRESH_MS,
+                   help="How often each dataset is re-read")
+    p.add_argument("--rows", type=int, default=ROWS, help="Rows per dataset")
+    args = p.parse_args(argv)
+
+    dsn = os.getenv("DSN", "")
+    if not dsn:
+        print("❌ DSN not set", file=sys.stderr)
+        sys.exit(1)
+
+    metrics.serve()
+    server = serve(dsn, args.port, args.interval_ms / 1000, args.rows)
+    print(f"📡 Serving {', '.join(_Handler.publishers)} snapshots on :{args.port} "
+          f"(every {args.interval_ms} ms)")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
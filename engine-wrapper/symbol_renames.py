@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# As-of symbol resolution across ticker changes (database/market_m_a_data.csv).
+#
+# Each row of the mapping file is an event: from `date` on, one share of
+# from_symbol is convert_price shares of to_symbol plus cash_per_share in
+# cash. A plain rename (ratio 1, no cash) also means to_symbol *was*
+# from_symbol before that date. An acquisition (any other terms) only leads
+# forward: the acquirer has a price history of its own.
+#
+# A lineage is the run of tickers one instrument traded under, e.g.
+# CBS → VIAC → PARA, ending at its canonical (current) ticker. Every ticker
+# in the file gets its lineage built once, on load, as segment start dates
+# in sorted order, so resolve(symbol, date) is a bisect. Tickers the file
+# doesn't mention are a lineage of one segment. Ticker reuse (a different
+# company listing under a retired symbol) isn't in the file and isn't
+# modelled: a retired ticker resolves to its successor.
+import os
+import sys
+import csv
+import argparse
+from bisect import bisect_right
+from datetime import date, datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+HERE     = Path(__file__).resolve().parent
+CSV_PATH = os.getenv("SYMBOL_RENAMES_CSV") or next(
+    (str(p) for p in (HERE / "market_m_a_data.csv",
+                      HERE.parent / "database" / "market_m_a_data.csv") if p.exists()),
+    "")
+
+
+class Event(NamedTuple):
+    date:        date
+    from_symbol: str
+    to_symbol:   str
+    ratio:       float
+    cash:        float
+
+    @property
+    def rename(self):
+        return self.ratio == 1 and self.cash == 0
+
+
+class Segment(NamedTuple):
+    symbol: str             # ticker the instrument traded under
+    start:  Optional[date]  # first day (None: open)
+    end:    Optional[date]  # day the next ticker took over (None: still current)
+    ratio:  float           # canonical shares per share of `symbol`
+    cash:   float           # cash per share of `symbol` paid on the way
+
+    def price(self, p):
+        # a `symbol` price in canonical shares
+        return (p - self.cash) / self.ratio
+
+    def qty(self, q):
+        return q * self.ratio
+
+
+def _day(value):
+    if value is None or isinstance(value, date) and not isinstance(value, datetime):
+        return value
+    if isinstance(value, datetime):
+        return value.date()
+    return date.fromisoformat(str(value)[:10])
+
+
+class Renames:
+    def __init__(self, events=()):
+        self.events = sorted(events)
+        self._into, self._out = {}, {}
+        for e in self.events:
+            if e.rename:
+                self._into.setdefault(e.to_symbol, []).append(e)
+            self._out.setdefault(e.from_symbol, []).append(e)
+        self._lineages = {}
+        for e in self.events:
+            for sym in (e.from_symbol, e.to_symbol):
+                if sym not in self._lineages:
+                    self._lineages[sym] = self._build(sym)
+
+    @classmethod
+    def load(cls, path=None):
+        path = path or CSV_PATH
+        if not path or not Path(path).exists():
+            return cls()
+        events = []
+        with open(path, newline="") as f:
+            for row in csv.DictReader(f):
+                events.append(Event(
+                    date.fromisoformat(row["date"].strip()),
+                    row["from_symbol"].strip().upper(),
+                    row["to_symbol"].strip().upper(),
+                    float(row["convert_price"] or 1),
+                    float(row["cash_per_share"] or 0),
+                ))
+        return cls(events)
+
+    def _build(self, symbol):
+        # back through renames to the first ticker, then forward through
+        # every event to the current one
+        root, end, seen = symbol, None, {symbol}
+        while True:
+            back = [e for e in self._into.get(root, ()) if end is None or e.date < end]
+            if not back or back[-1].from_symbol in seen:
+                break
+            root, end = back[-1].from_symbol, back[-1].date
+            seen.add(root)
+
+        chain, cur, start, seen = [], root, None, {root}
+        while True:
+            fwd = [e for e in self._out.get(cur, ()) if start is None or e.date > start]
+            if not fwd or fwd[0].to_symbol in seen:
+                chain.append((cur, start, None, None))
+                break
+            chain.append((cur, start, fwd[0].date, fwd[0]))
+            cur, start = fwd[0].to_symbol, fwd[0].date
+            seen.add(cur)
+
+        # factors accumulate from the canonical end
+        segments, ratio, cash = [], 1.0, 0.0
+        for sym, s, e, ev in reversed(chain):
+            if ev is not None:
+                ratio, cash = ev.ratio * ratio, ev.cash + ev.ratio * cash
+            segments.append(Segment(sym, s, e, ratio, cash))
+        segments.reverse()
+        return [s.start or date.min for s in segments], segments
+
+    # ————— lookups —————
+    def lineage(self, symbol):
+        """All segments of `symbol`'s lineage, oldest first."""
+        symbol = symbol.upper()
+        hit = self._lineages.get(symbol)
+        return hit[1] if hit else [Segment(symbol, None, None, 1.0, 0.0)]
+
+    def resolve(self, symbol, when):
+        """The segment of `symbol`'s lineage that was trading on `when`."""
+        symbol = symbol.upper()
+        hit = self._lineages.get(symbol)
+        if not hit:
+            return Segment(symbol, None, None, 1.0, 0.0)
+        starts, segments = hit
+        return segments[bisect_right(starts, _day(when)) - 1]
+
+    def canonical(self, symbol):
+        return self.lineage(symbol)[-1].symbol
+
+    def canonical_many(self, symbols):
+        # one lookup per distinct ticker, e.g. a column of trades
+        symbols = np.asarray(symbols, dtype=object)
+        if not len(symbols):
+            return symbols
+        uniq, inv = np.unique(symbols, return_inverse=True)
+        return np.array([self.canonical(s) for s in uniq], dtype=object)[inv.ravel()]
+
+    def segments(self, symbol, start=None, end=None):
+        """The lineage segments overlapping [start, end]."""
+        lo, hi = _day(start), _day(end)
+        return [s for s in self.lineage(symbol)
+                if not (hi is not None and s.start is not None and s.start > hi)
+                and not (lo is not None and s.end is not None and s.end <= lo)]
+
+    def tickers(self, symbols, start=None, end=None):
+        """Every ticker needed to cover `symbols` over [start, end]."""
+        return sorted({s.symbol for sym in symbols for s in self.segments(sym, start, end)})
+
+
+@lru_cache(maxsize=None)
+def default():
+    """The mapping file, loaded once per process."""
+    return Renames.load()
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Resolve tickers across renames and M&A")
+    p.add_argument("--csv", default=CSV_PATH, help="Mapping file (SYMBOL_RENAMES_CSV)")
+    sub = p.add_subparsers(dest="cmd", required=True)
+
+    lin = sub.add_parser("lineage", help="Tickers a symbol traded under")
+    lin.add_argument("symbol")
+    lin.add_argument("--start-date")
+    lin.add_argument("--end-date")
+
+    res = sub.add_parser("resolve", help="The ticker a symbol traded under on a date")
+    res.add_argument("symbol")
+    res.add_argument("date")
+
+    args = p.parse_args(argv)
+    if not args.csv or not Path(args.csv).exists():
+        print(f"❌ Mapping file not found: {args.csv or 'market_m_a_data.csv'}", file=sys.stderr)
+        sys.exit(1)
+    renames = Renames.load(args.csv)
+
+    if args.cmd == "lineage":
+        segs = renames.segments(args.symbol, args.start_date, args.end_date)
+        for s in segs:
+            print(f"{s.symbol:<8} {str(s.start or '…'):<10} → {str(s.end or '…'):<10} "
+                  f"×{s.ratio:g}" + (f" + {s.cash:g} cash" if s.cash else ""))
+        print(f"✅ {args.symbol.upper()} → {renames.canonical(args.symbol)}, {len(segs)} segment(s)")
+    else:
+        s = renames.resolve(args.symbol, args.date)
+        print(f"✅ {args.symbol.upper()} on {args.date}: {s.symbol} "
+              f"(canonical {renames.canonical(args.symbol)}, ×{s.ratio:g}"
+              + (f" + {s.cash:g} cash" if s.cash else "") + ")")
+
+
+if __name__ == "__main__":
+    main()
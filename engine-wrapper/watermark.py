@@ -0,0 +1,73 @@
+# Incremental reads past a serial id that don't lose late commits.
+#
+# A bigserial is assigned at insert, not at commit: while the live trader
+# and concurrent backtests insert, id 101 can become visible after 102 has
+# already been read. A plain `id > last seen` watermark skips 101 forever.
+#
+# IdWatermark holds the watermark below any id that is missing from what
+# has been read so far. Each pass re-reads from the oldest such gap, hands
+# back only rows it hasn't handed back before, and gives a gap up after
+# WATERMARK_HOLD_S (a rolled-back insert leaves a gap that never fills).
+# Gaps are only looked for among the newest WATERMARK_SPAN ids. A query
+# that filters rows out (e.g. live runs only) leaves gaps that never fill;
+# settle() with the ids the filter skipped drops those. Look them up in one
+# statement with the filter negated, so a row that committed in between
+# isn't mistaken for one.
+#
+#   wm = IdWatermark()
+#   rows = query("… WHERE id > %s ORDER BY id …", wm.after)
+#   for row in wm.fresh(rows):
+#       …
+import os
+import time
+
+HOLD_S = float(os.getenv("WATERMARK_HOLD_S", 60))
+SPAN   = int(os.getenv("WATERMARK_SPAN", 10_000))
+
+
+class IdWatermark:
+    def __init__(self, hold_s=HOLD_S, span=SPAN):
+        self.hold_s = hold_s
+        self.span   = span
+        self.after  = 0         # every pass reads ids above this
+        self.top    = 0         # highest id read
+        self.seen   = set()     # ids in (after, top] already handed back
+        self.gaps   = {}        # missing id in (after, top] -> when first missed
+
+    def fresh(self, rows, key=lambda r: r[0], cut_low=False):
+        """The rows of one pass not handed back before, in the order given.
+
+        `rows` are everything above `after` the query returned. cut_low:
+        the query kept only the newest rows (ORDER BY id DESC LIMIT n), so
+        ids below the lowest one returned aren't gaps.
+        """
+        ids = [key(r) for r in rows]
+        out = [r for r, i in zip(rows, ids) if i > self.after and i not in self.seen]
+        if not ids:
+            self._expire()
+            return out
+        got = set(ids)
+        high = max(ids)
+        low = max(self.top, high - self.span, min(ids) - 1 if cut_low else 0)
+        now = time.monotonic()
+        for i in range(low + 1, high + 1):
+            if i not in got:
+                self.gaps.setdefault(i, now)
+        for i in got & self.gaps.keys():
+            del self.gaps[i]
+        self.seen |= {key(r) for r in out}
+        self.top = max(self.top, high)
+        self._expire()
+        return out
+
+    def settle(self, present):
+        """Forget the gaps for ids the query filtered out."""
+        for i in present:
+            self.gaps.pop(i, None)
+        self._expire()
+
+    def _expire(self):
+        now = time.monotonic()
+        self.gaps = {i: t for i, t in self.gaps.items() if now - t < self.hold_s}
+        self.after = min(self.gaps) - 1 if self.gaps else self.top
+        self.seen = {i for i in self.seen if i > self.after}
@@ -1,9 +1,17 @@
 import os
+import sys
+from pathlib import Path
+
+# shared helpers (db_pool, …) live in engine-wrapper/; the images copy them
+# next to the app, so this only matters when running from a checkout
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent / "engine-wrapper"))
+
 import pandas as pd
-import psycopg2
 import streamlit as st
 from streamlit_autorefresh import st_autorefresh
 
+from db_pool import connection
+
 # ──────────────────────────────────────────────────────────────────────────────
 # Configuration from environment
 # ──────────────────────────────────────────────────────────────────────────────
@@ -23,7 +31,7 @@ st_autorefresh(interval=REFRESH_INTERVAL_MS, key="live")
 # ──────────────────────────────────────────────────────────────────────────────
 # Data loader with Streamlit’s new @st.cache_data
 # ──────────────────────────────────────────────────────────────────────────────
-@st.cache_data(ttl=REFRESH_INTERVAL_MS // 1000)
+@st.cache_data(ttl=REFRESH_INTERVAL_MS / 1000)
 def get_latest_trades(limit: int) -> pd.DataFrame:
     query = """
         SELECT buy_time   AS timestamp,
@@ -47,7 +55,7 @@ def get_latest_trades(limit: int) -> pd.DataFrame:
         ORDER BY timestamp DESC
         LIMIT %s
     """
-    with psycopg2.connect(DSN) as conn:
+    with connection(DSN) as conn:
         df = pd.read_sql(query, conn, params=(limit,))
     return df.set_index("timestamp")
 
@@ -0,0 +1,94 @@
+import os
+
+import pandas as pd
+import streamlit as st
+from psycopg2 import errors
+
+import downsample
+import metrics
+
+CHART_POINTS = int(os.getenv("CHART_POINTS", 500))
+QTY_BUCKETS  = int(os.getenv("CHART_QTY_BUCKETS", 120))
+
+
+# ─── Cached queries ─────────────────────────────────────────
+# `version` is the TradeStream version (None while polling), so a new fill
+# invalidates these; the ttl covers the polling case.
+@st.cache_data(ttl=5, show_spinner=False)
+def _range(dsn, version):
+    return downsample.data_range(dsn)
+
+
+@st.cache_data(ttl=5, show_spinner=False)
+def _symbols(dsn, version, start, end):
+    return downsample.symbols(dsn, start, end)
+
+
+@st.cache_data(ttl=5, show_spinner=False)
+def _series(dsn, version, app, symbol, start, end, points, buckets):
+    with metrics.query_timer(app, "chart_price"):
+        price = downsample.price_series(dsn, start, end, symbol, points)
+    with metrics.query_timer(app, "chart_qty"):
+        qty = downsample.qty_series(dsn, start, end, symbol, buckets)
+    return price, qty
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _market(symbol, start, end, points):
+    # the bar store only changes on import
+    return downsample.market_series(symbol, start, end, points)
+
+
+def render(dsn, version, app, fallback: pd.DataFrame, key="charts", height=300):
+    """Price (LTTB) and bought/sold qty (bucketed) for a window of executions.
+
+    Fill prices are drawn against the symbol's closes from the local bar
+    store when it has bars for the window.
+
+    The window and symbol pickers sit above the charts; the zoom slider
+    narrows the range, and every range is drawn with the same point budget.
+    `fallback` (the recent-executions frame) is charted as-is when the
+    executions read model isn't there.
+    """
+    try:
+        first, last = _range(dsn, version)
+    except errors.UndefinedTable:
+        first = last = None
+    if last is None:
+        if not fallback.empty:
+            c1, c2 = st.columns(2)
+            with c1:
+                st.line_chart(fallback["price"], height=height)
+            with c2:
+                st.bar_chart(fallback["qty"], height=height)
+        return
+
+    c1, c2 = st.columns(2)
+    label = c1.selectbox("Chart window", list(downsample.WINDOWS), index=1, key=f"{key}_window")
+    start, end = downsample.window(last, label)
+    start = max(start, pd.Timestamp(first).floor("min").to_pydatetime())
+    syms = _symbols(dsn, version, start, end)
+    if not syms:
+        st.info(f"No executions in the last {label}.")
+        return
+    symbol = c2.selectbox("Symbol", syms, key=f"{key}_symbol")
+    lo, hi = st.slider("Zoom", min_value=start, max_value=end, value=(start, end),
+                       format="MM-DD HH:mm", key=f"{key}_zoom_{label}")
+
+    price, qty = _series(dsn, version, app, symbol, lo, hi, CHART_POINTS, QTY_BUCKETS)
+    market = _market(symbol, lo, hi, CHART_POINTS)
+    c1, c2 = st.columns(2)
+    with c1:
+        st.markdown(f"#### {symbol} price")
+        if market.empty:
+            st.line_chart(price["price"], height=height)
+        else:
+            # each line runs through the other's timestamps instead of breaking there
+            both = (pd.concat([price["price"].rename("fill"), market["market"]], axis=1, sort=True)
+                      .interpolate(method="time", limit_area="inside"))
+            st.line_chart(both, height=height)
+    with c2:
+        st.markdown(f"#### {symbol} quantity (buy / sell)")
+        st.bar_chart(qty, height=height)
+    st.caption(f"{len(price)} price points, {len(market)} market closes, {len(qty)} qty buckets "
+               f"for {lo:%Y-%m-%d %H:%M} → {hi:%Y-%m-%d %H:%M}")
@@ -0,0 +1,98 @@
+import threading
+from collections import deque
+
+import pandas as pd
+from psycopg2 import errors
+
+import metrics
+from db_pool import connection
+from watermark import IdWatermark
+
+COLUMNS = ["timestamp", "symbol", "side", "qty", "price"]
+
+# ─── Queries ────────────────────────────────────────────────
+# Newest `capacity` rows above the watermark. On a cold start the watermark
+# is 0; anything older than the newest `capacity` rows would fall out of the
+# ring buffer anyway, so it is never fetched. The watermark stays below ids
+# that haven't committed yet (watermark.py), so those rows are re-read until
+# they show up.
+NEW_ROWS_SQL = """
+    SELECT execution_id,
+           ts     AS timestamp,
+           symbol,
+           side,
+           qty,
+           price
+      FROM executions
+     WHERE execution_id > %s
+     ORDER BY execution_id DESC
+     LIMIT %s
+"""
+
+# Pre-executions schema: scan trades like the dashboards used to.
+LEGACY_SQL = """
+    SELECT buy_time   AS timestamp, symbol, 'buy' AS side, qty, buy_price AS price
+      FROM trades WHERE buy_time IS NOT NULL
+    UNION ALL
+    SELECT sell_time  AS timestamp, symbol, 'sell' AS side, qty, sell_price AS price
+      FROM trades WHERE sell_time IS NOT NULL
+    ORDER BY timestamp DESC
+    LIMIT %s
+"""
+
+
+class ExecutionsFeed:
+    """Incremental reader of the `executions` read model.
+
+    Keeps the last `capacity` executions in a ring buffer and only asks the
+    database for rows past the watermark, so a refresh costs O(new rows)
+    instead of O(trades). A fill that commits after a newer one was read is
+    still picked up.
+    """
+
+    def __init__(self, dsn: str, capacity: int, app: str = "dashboard"):
+        self.dsn       = dsn
+        self.app       = app
+        self.fetched   = 0      # new rows pulled by the last refresh
+        self.rows      = deque(maxlen=capacity)
+        self.watermark = IdWatermark()
+        self.legacy    = False
+        self.version   = None
+        self._last     = None
+        self._lock     = threading.Lock()
+
+    def refresh(self, version=None) -> pd.DataFrame:
+        # `version` comes from a TradeStream: if nothing was published since
+        # the last refresh, serve the previous frame without a query.
+        with self._lock:
+            self.fetched = 0
+            if version is not None and version == self.version and self._last is not None:
+                return self._last
+            self.version = version
+            with metrics.query_timer(self.app, "executions"):
+                self._last = self._legacy() if self.legacy else self._fetch()
+            return self._last
+
+    def _fetch(self) -> pd.DataFrame:
+        try:
+            with connection(self.dsn) as conn, conn.cursor() as cur:
+                cur.execute(NEW_ROWS_SQL, (self.watermark.after, self.rows.maxlen))
+                fresh = self.watermark.fresh(cur.fetchall(), cut_low=cur.rowcount == self.rows.maxlen)
+        except errors.UndefinedTable:
+            # database/add_executions.sql not applied yet
+            self.legacy = True
+            return self._legacy()
+        self.fetched = len(fresh)
+        self.rows.extend(r[1:] for r in reversed(fresh))
+        return self.frame()
+
+    def frame(self) -> pd.DataFrame:
+        df = pd.DataFrame(list(self.rows), columns=COLUMNS)
+        df["timestamp"] = pd.to_datetime(df["timestamp"])
+        return df.sort_values("timestamp", ascending=False).set_index("timestamp")
+
+    def _legacy(self) -> pd.DataFrame:
+        with connection(self.dsn) as conn:
+            df = pd.read_sql(LEGACY_SQL, conn, params=(self.rows.maxlen,))
+        df["timestamp"] = pd.to_datetime(df["timestamp"])
+        return df.set_index("timestamp")
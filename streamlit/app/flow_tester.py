@@ -1,10 +1,32 @@
 import os
+import platform
 import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+# shared helpers (db_pool, …) live in engine-wrapper/; the images copy them
+# next to the app, so this only matters when running from a checkout
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent / "engine-wrapper"))
+
+import rerun_profile
+prof = rerun_profile.start("flow_tester")
+
 import streamlit as st
 import pandas as pd
-import psycopg2
 from psycopg2 import errors
 
+import execution_charts
+import metrics
+import backtest_jobs
+from db_pool import all_stats, connection
+from executions_feed import ExecutionsFeed
+from snapshots import SnapshotFeed, SnapshotUnavailable
+from trade_stream import TradeStream
+
+prof.mark("imports")
+
 # ─── Page config ─────────────────────────────────────────
 st.set_page_config(
     page_title="Flow Tester: Portfolio → Backtest → Live Orders",
@@ -17,6 +39,34 @@ TRADEPLAN_DIR  = os.getenv("TRADEPLAN_DIR", "/app/liu_samples")
 TLOG_LEVEL     = os.getenv("TLOG_LEVEL", "DEBUG")
 REFRESH_MS     = int(os.getenv("REFRESH_INTERVAL_MS", 5000))
 MAX_ROWS       = int(os.getenv("MAX_ROWS", 50))
+STREAM_POLL_MS = int(os.getenv("STREAM_POLL_MS", 500))
+SNAPSHOT_URL   = os.getenv("SNAPSHOT_URL", "")
+
+metrics.serve()     # METRICS_PORT; once per process
+
+@st.cache_resource
+def trade_stream(dsn):
+    return TradeStream(dsn)
+
+stream = trade_stream(DSN)
+
+# Shared snapshot service (engine-wrapper/snapshots.py): when SNAPSHOT_URL is
+# set, backtests and executions are read from it instead of Postgres, so
+# viewers add no database load. The loaders fall back to their own queries
+# while it is unreachable.
+@st.cache_resource
+def snapshot_feed(url, name):
+    return SnapshotFeed(url, name, app="flow_tester")
+
+def from_snapshot(name, version=None):
+    if not SNAPSHOT_URL:
+        return None
+    try:
+        return snapshot_feed(SNAPSHOT_URL, name).refresh(version)
+    except SnapshotUnavailable:
+        return None
+
+prof.mark("setup")
 
 # ─── Sidebar: 1) Initialize Portfolio ────────────────────
 with st.sidebar:
@@ -37,33 +87,74 @@ with st.sidebar:
     symbols    = st.text_input("Symbols (CSV)", "AAPL,MSFT,NVDA")
     start_date = st.date_input("Start Date", value=pd.to_datetime("2025-01-01"))
     end_date   = st.date_input("End Date",   value=pd.to_datetime("today"))
-    if st.button("▶️ Run Backtest"):
-        with st.spinner("Running backtest... this can take a minute"):
-            cmd = [
-                "python3", "-m", "liualgotrader.enhanced_backtest",
-                "--symbols",    symbols,
-                "--start-date", start_date.strftime("%Y-%m-%d"),
-                "--end-date",   end_date.strftime("%Y-%m-%d"),
-                "--tradeplan",  f"{TRADEPLAN_DIR}/tradeplan.toml",
-                "--diagnostics",f"{TRADEPLAN_DIR}/diagnostics.json",
-                "--log-level",  TLOG_LEVEL
-            ]
-            proc = subprocess.run(cmd, capture_output=True, text=True)
-        if proc.returncode == 0:
-            st.success("✅ Backtest complete!")
-        else:
-            st.error("❌ Backtest failed:\n" + proc.stderr)
-        st.experimental_rerun()   # reload UI with new data
+    no_cache   = st.checkbox("Bypass result cache", value=False,
+                             help="Results are cached only for ranges that end before today")
+    priority   = st.selectbox("Priority", list(backtest_jobs.PRIORITIES), index=1)
+    if st.button("▶️ Queue Backtest"):
+        try:
+            job_id = backtest_jobs.submit(
+                DSN, "flow_tester", f"{TRADEPLAN_DIR}/tradeplan.toml", symbols,
+                start_date, end_date, f"flow-{datetime.now():%Y%m%d-%H%M%S}",
+                backtest_jobs.PRIORITIES[priority],
+                diagnostics=f"{TRADEPLAN_DIR}/diagnostics.json",
+                log_level=TLOG_LEVEL, no_cache=no_cache,
+            )
+            st.success(f"📨 Queued job {job_id}")
+        except errors.UndefinedTable:
+            st.error("No backtest_jobs table — apply database/add_backtest_jobs.sql")
 
     st.write("---")
     st.header("3) Live Orders")
-    st.write(f"Auto-refresh every {REFRESH_MS/1000:.1f}s")
-    st_autorefresh = st.checkbox("Enable auto-refresh", value=True)
+    if stream.healthy:
+        st.write("Live updates pushed from the database")
+    else:
+        st.write(f"Auto-refresh every {REFRESH_MS/1000:.1f}s")
+    auto_refresh = st.checkbox("Enable auto-refresh", value=True)
+
+# A fragment checks the change stream every STREAM_POLL_MS; the page only
+# reruns when a fill was published, or every REFRESH_MS while it is down.
+st.session_state["flow_rendered"] = (stream.version, stream.healthy, time.monotonic())
+
+@st.fragment(run_every=STREAM_POLL_MS / 1000)
+def follow_stream():
+    version, healthy, at = st.session_state["flow_rendered"]
+    if stream.healthy != healthy or (healthy and stream.version != version):
+        st.rerun()
+    if not healthy and (time.monotonic() - at) * 1000 >= REFRESH_MS:
+        st.rerun()
+
+if auto_refresh:
+    follow_stream()
+prof.mark("sidebar")
+
+# ─── Backtest Jobs ─────────────────────────────────────────
+@st.cache_data(ttl=2)
+def load_jobs(n):
+    try:
+        with metrics.query_timer("flow_tester", "backtest_jobs"):
+            return pd.DataFrame(backtest_jobs.recent(DSN, n, "flow_tester"))
+    except errors.UndefinedTable:
+        return pd.DataFrame()
+
+df_jobs = load_jobs(10)
+if not df_jobs.empty:
+    st.title("⏳ Backtest Jobs")
+    st.dataframe(
+        df_jobs[["job_id", "status", "ahead", "priority", "batch_id", "symbols",
+                 "submitted_at", "started_at", "finished_at", "returncode"]],
+        use_container_width=True
+    )
+    latest = df_jobs.iloc[0]
+    if latest["status"] == "failed":
+        res = latest["result"] or {}
+        st.error(f"❌ Job {latest['job_id']} failed:\n"
+                 + (res.get("error") or res.get("stderr", "")[-2000:]))
+prof.mark("jobs")
 
 # ─── Recent Backtests ──────────────────────────────────────
 st.title("📝 Recent Backtests")
-@st.cache_data(ttl=REFRESH_MS//1000)
-def load_backtests(n):
+@st.cache_data(ttl=REFRESH_MS / 1000)
+def query_backtests(n):
     q = """
       SELECT batch_id, run_at, symbols, win_rate, net_profit
         FROM backtests
@@ -71,13 +162,17 @@ def load_backtests(n):
        LIMIT %s
     """
     try:
-        with psycopg2.connect(DSN) as conn:
+        with metrics.query_timer("flow_tester", "backtests"), connection(DSN) as conn:
             df = pd.read_sql(q, conn, params=(n,))
         df["run_at"] = pd.to_datetime(df["run_at"])
         return df
     except errors.UndefinedTable:
         return pd.DataFrame()
 
+def load_backtests(n):
+    df = from_snapshot("backtests")
+    return query_backtests(n) if df is None else df.head(n)
+
 df_bt = load_backtests(MAX_ROWS)
 
 # Metrics
@@ -98,40 +193,49 @@ if df_bt.empty:
 else:
     st.dataframe(df_bt, use_container_width=True)
     st.line_chart(df_bt.set_index("run_at")["net_profit"], height=300)
+prof.mark("backtests")
 
 # ─── Live Orders ──────────────────────────────────────────
 st.subheader("📈 Live Orders")
-@st.cache_data(ttl=REFRESH_MS//1000)
+@st.cache_resource
+def trades_feed(dsn, n):
+    return ExecutionsFeed(dsn, n, app="flow_tester")
+
 def load_trades(n):
-    query = """
-      SELECT buy_time   AS timestamp, symbol, 'buy' AS side, qty, buy_price AS price
-        FROM trades WHERE buy_time IS NOT NULL
-      UNION ALL
-      SELECT sell_time AS timestamp, symbol, 'sell' AS side, qty, sell_price AS price
-        FROM trades WHERE sell_time IS NOT NULL
-      ORDER BY timestamp DESC
-      LIMIT %s;
-    """
-    with psycopg2.connect(DSN) as conn:
-        df = pd.read_sql(query, conn, params=(n,))
-    return df.set_index("timestamp")
+    version = stream.version if stream.healthy else None
+    df = from_snapshot("executions", version)
+    return trades_feed(DSN, n).refresh(version) if df is None else df.head(n)
 
 df_live = load_trades(MAX_ROWS)
 if df_live.empty:
     st.info("No live trades executed yet.")
 else:
     st.dataframe(df_live, use_container_width=True)
-    c1, c2 = st.columns(2)
-    with c1: st.line_chart(df_live["price"], height=250)
-    with c2: st.bar_chart(df_live["qty"],   height=250)
+    execution_charts.render(DSN, stream.version if stream.healthy else None,
+                            "flow_tester", df_live, key="flow", height=250)
+prof.mark("live_orders")
 
 # ─── Environment ──────────────────────────────────────────
+# Versions can't change under a running server: probed once per process,
+# from package metadata rather than by forking three CLIs every rerun.
+@st.cache_resource
+def versions():
+    from importlib import metadata
+    try:
+        liu = metadata.version("liualgotrader")
+    except metadata.PackageNotFoundError:
+        liu = "not installed"
+    return {"Python":    f"Python {platform.python_version()}",
+            "Liu":       f"liualgotrader {liu}",
+            "Streamlit": f"Streamlit {st.__version__}"}
+
 st.subheader("🔧 Environment")
 env = {
-    "Python":      subprocess.run(["python3","--version"], capture_output=True, text=True).stdout.strip(),
-    "Liu CLI":     subprocess.run(["liu","--version"], capture_output=True, text=True).stdout.strip(),
-    "Streamlit":   subprocess.run(["streamlit","--version"], capture_output=True, text=True).stdout.strip(),
+    **versions(),
     "Backtests":   len(df_bt),
     "Live Trades": len(df_live),
+    "DB pool":     all_stats(),
 }
 st.json(env)
+prof.mark("environment")
+prof.finish()
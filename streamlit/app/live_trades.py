@@ -1,8 +1,27 @@
 import os
+import sys
+import time
+from pathlib import Path
+
+# shared helpers (db_pool, …) live in engine-wrapper/; the images copy them
+# next to the app, so this only matters when running from a checkout
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent / "engine-wrapper"))
+
+import rerun_profile
+prof = rerun_profile.start("live_trades")
+
 import pandas as pd
-import psycopg2
 import streamlit as st
-from streamlit_autorefresh import st_autorefresh
+
+import execution_charts
+import metrics
+from db_pool import all_stats
+from executions_feed import ExecutionsFeed
+from risk_monitor import RiskMonitor
+from snapshots import SnapshotFeed, SnapshotUnavailable
+from trade_stream import TradeStream
+
+prof.mark("imports")
 
 # ─── Page config & styling ─────────────────────────────────
 st.set_page_config(
@@ -17,46 +36,110 @@ st.write("---")
 DSN                 = os.getenv("DSN", "")
 REFRESH_INTERVAL_MS = int(os.getenv("REFRESH_INTERVAL_MS", 5000))
 MAX_ROWS            = int(os.getenv("MAX_ROWS", 50))
+STREAM_POLL_MS      = int(os.getenv("STREAM_POLL_MS", 500))
+SNAPSHOT_URL        = os.getenv("SNAPSHOT_URL", "")
+
+metrics.serve()     # METRICS_PORT; once per process
+
+# ─── Change stream ──────────────────────────────────────────
+# One LISTEN connection per server process, shared by every session.
+@st.cache_resource
+def get_stream(dsn: str) -> TradeStream:
+    return TradeStream(dsn)
+
+stream = get_stream(DSN)
 
 # ─── Auto-refresh ───────────────────────────────────────────
-st_autorefresh(interval=REFRESH_INTERVAL_MS, key="live_orders")
+# A fragment checks the change stream every STREAM_POLL_MS without rerunning
+# the page. The page reruns only when a fill was published (stream.version
+# moved) or the listener went up or down, and every REFRESH_INTERVAL_MS
+# while it is down.
+st.session_state["live_rendered"] = (stream.version, stream.healthy, time.monotonic())
+
+@st.fragment(run_every=STREAM_POLL_MS / 1000)
+def follow_stream():
+    version, healthy, at = st.session_state["live_rendered"]
+    if stream.healthy != healthy or (healthy and stream.version != version):
+        st.rerun()
+    if not healthy and (time.monotonic() - at) * 1000 >= REFRESH_INTERVAL_MS:
+        st.rerun()
+
+follow_stream()
 
 # ─── Sidebar controls ───────────────────────────────────────
 with st.sidebar:
     st.header("⚙️ Settings")
     st.write("**DSN:**", DSN or "not set")
     st.write("**Refresh (ms):**", REFRESH_INTERVAL_MS)
+    st.write("**Updates:**", "🟢 push" if stream.healthy else "🟠 polling")
+    st.write("**Snapshots:**", SNAPSHOT_URL or "off")
     rows = st.slider("Max rows to show", 10, 200, MAX_ROWS, step=10)
     st.write("---")
+    pool_stats = st.expander("🔌 DB pool")
+prof.mark("setup")
 
 # ─── Data loading ────────────────────────────────────────────
-@st.cache_data(ttl=REFRESH_INTERVAL_MS // 1000)
+# With SNAPSHOT_URL set, executions come from the shared snapshot service
+# (engine-wrapper/snapshots.py), so viewers add no database load. Otherwise,
+# or while it is down, one feed per server process pulls only executions
+# newer than the last one it has seen. Sized for the slider's maximum.
+@st.cache_resource
+def get_feed(dsn: str, capacity: int) -> ExecutionsFeed:
+    return ExecutionsFeed(dsn, capacity, app="live_trades")
+
+@st.cache_resource
+def get_snapshots(url: str) -> SnapshotFeed:
+    return SnapshotFeed(url, "executions", app="live_trades")
+
 def get_latest_trades(limit: int) -> pd.DataFrame:
-    sql = """
-        SELECT buy_time   AS timestamp,
-               symbol,
-               'buy'      AS side,
-               qty,
-               buy_price AS price
-          FROM trades
-         WHERE buy_time IS NOT NULL
-        UNION ALL
-        SELECT sell_time  AS timestamp,
-               symbol,
-               'sell'     AS side,
-               qty,
-               sell_price AS price
-          FROM trades
-         WHERE sell_time IS NOT NULL
-        ORDER BY timestamp DESC
-        LIMIT %s
-    """
-    with psycopg2.connect(DSN) as conn:
-        df = pd.read_sql(sql, conn, params=(limit,))
-    df["timestamp"] = pd.to_datetime(df["timestamp"])
-    return df.set_index("timestamp")
+    version = stream.version if stream.healthy else None
+    df = None
+    if SNAPSHOT_URL:
+        feed = get_snapshots(SNAPSHOT_URL)
+        try:
+            df = feed.refresh(version)
+        except SnapshotUnavailable:
+            pass
+    if df is None:
+        feed = get_feed(DSN, max(MAX_ROWS, 200))
+        df = feed.refresh(version)
+    df = df.head(limit)
+    if version is not None and feed.fetched and stream.last:
+        metrics.observe_fill_lag("live_trades", time.time() - stream.last["tstamp"])
+    return df
 
 df = get_latest_trades(rows)
+prof.mark("executions")
+
+# ─── Risk monitor ───────────────────────────────────────────
+# One per server process, following the change stream on its own thread,
+# so limits are watched between reruns too.
+@st.cache_resource
+def get_risk(dsn: str) -> RiskMonitor:
+    return RiskMonitor(dsn, stream=stream, app="live_trades")
+
+risk = get_risk(DSN)
+if not stream.healthy:
+    risk.poll()
+snap = risk.snapshot()
+
+st.subheader("🛡️ Risk")
+c1, c2, c3, c4 = st.columns(4)
+c1.metric("Gross exposure", f"${snap['gross']:,.0f}", f"{snap['gross_pct']:.0%} of portfolio",
+          delta_color="off")
+c2.metric("Net exposure", f"${snap['net']:,.0f}", f"{snap['net_pct']:.0%} of portfolio",
+          delta_color="off")
+c3.metric("Realized P&L", f"${snap['realized']:,.2f}")
+c4.metric("Unrealized P&L", f"${snap['unrealized']:,.2f}")
+for a in snap["alerts"][:5]:
+    st.error(f"🚨 {a['at']:%H:%M:%S} — {a['message']}")
+if snap["positions"]:
+    st.dataframe(pd.DataFrame(snap["positions"]).set_index("symbol"), use_container_width=True)
+st.caption(f"{snap['fills']} fills since {snap['since']:%Y-%m-%d %H:%M %Z} · "
+           f"per-trade risk budget ${snap['risk_budget']:,.2f} of "
+           f"${snap['portfolio_value']:,.0f}")
+st.write("---")
+prof.mark("risk")
 
 # ─── Main content ───────────────────────────────────────────
 if df.empty:
@@ -67,11 +150,12 @@ else:
     # Table of recent trades
     st.dataframe(df, use_container_width=True)
     
-    # Split into two charts
-    price_chart, qty_chart = st.columns(2)
-    with price_chart:
-        st.markdown("#### Price over Time")
-        st.line_chart(df["price"], height=300)
-    with qty_chart:
-        st.markdown("#### Quantity over Time")
-        st.bar_chart(df["qty"], height=300)
+    # Charts read the executions history downsampled, not the table above
+    execution_charts.render(DSN, stream.version if stream.healthy else None,
+                            "live_trades", df, key="live")
+
+prof.mark("table_charts")
+
+with pool_stats:
+    st.json(all_stats())
+prof.finish()
@@ -0,0 +1,333 @@
+import os
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+from psycopg2 import errors
+
+import metrics
+from db_pool import connection
+from watermark import IdWatermark
+
+MARKET_TZ    = ZoneInfo(os.getenv("MARKET_TZ", "America/New_York"))
+MARKET_CLOSE = (16, 0)
+LIVE_ENVS    = [e.strip() for e in os.getenv("RISK_ENVS", "PAPER,PROD").split(",") if e.strip()]
+MAX_GROSS    = float(os.getenv("RISK_MAX_GROSS", 1.0))  # × portfolio_value
+POLL_S       = float(os.getenv("RISK_POLL_S", 5))
+BATCH        = 5000
+
+# ─── Queries ────────────────────────────────────────────────
+# Fills of live runs past the watermark, oldest first. Executions without
+# an algo_run (legacy rows) count as live. The watermark stays below ids
+# that may still commit (watermark.py); the ones that exist but were
+# filtered out here are looked up with FILTERED_SQL so they stop holding it.
+FILLS_SQL = """
+    SELECT e.execution_id, e.trade_id, e.symbol, e.side, e.qty, e.price, e.ts
+      FROM executions e
+      LEFT JOIN algo_run ar ON ar.algo_run_id = e.algo_run_id
+     WHERE e.execution_id > %(after)s
+       AND e.ts >= %(since)s
+       AND (ar.algo_env IS NULL OR ar.algo_env = ANY(%(envs)s))
+     ORDER BY e.execution_id
+     LIMIT %(n)s
+"""
+
+# ids FILLS_SQL skips on purpose; a live fill that committed since isn't
+# among them, so it stays a gap and is read on the next poll
+FILTERED_SQL = """
+    SELECT e.execution_id
+      FROM executions e
+      LEFT JOIN algo_run ar ON ar.algo_run_id = e.algo_run_id
+     WHERE e.execution_id = ANY(%(gaps)s)
+       AND NOT (e.ts >= %(since)s AND (ar.algo_env IS NULL OR ar.algo_env = ANY(%(envs)s)))
+"""
+
+# Positions carried into the session: bought earlier and not sold before it
+# started. One sold since is seeded too, so its sell, replayed from
+# executions, closes it and books its P&L.
+CARRIED_SQL = """
+    SELECT t.trade_id, t.symbol, t.qty, t.buy_price, t.buy_time
+      FROM trades t
+      LEFT JOIN algo_run ar ON ar.algo_run_id = t.algo_run_id
+     WHERE (t.sell_time IS NULL OR t.sell_time >= %(since)s)
+       AND t.buy_time < %(since)s
+       AND (ar.algo_env IS NULL OR ar.algo_env = ANY(%(envs)s))
+"""
+
+
+def load_plan(tradeplan_dir=None):
+    # the [portfolio & risk] keys of tradeplan.toml, with its sample defaults
+    plan = {"portfolio_value": 25000.0, "risk": 0.001, "market_liquidation_end_time_minutes": 15}
+    path = Path(tradeplan_dir or os.getenv("TRADEPLAN_DIR", "/app/liu_samples")) / "tradeplan.toml"
+    try:
+        import toml
+        data = toml.load(path)
+    except Exception as e:
+        print(f"⚠️ risk monitor: using default limits ({path}: {e})", file=sys.stderr)
+        return plan
+    return {k: type(v)(data.get(k, v)) for k, v in plan.items()}
+
+
+class Position:
+    __slots__ = ("symbol", "qty", "cost", "mark", "trades")
+
+    def __init__(self, symbol):
+        self.symbol = symbol
+        self.qty    = 0         # shares held over all open trades
+        self.cost   = 0.0       # Σ qty · buy_price of those trades
+        self.mark   = None      # last fill price seen for the symbol
+        self.trades = 0
+
+    @property
+    def value(self):
+        return self.qty * self.mark if self.mark is not None else self.cost
+
+    @property
+    def unrealized(self):
+        return self.value - self.cost
+
+
+class RiskMonitor:
+    """Open positions, P&L and exposure of the live trader, kept per fill.
+
+    Every new execution adjusts one open trade and one symbol, and the
+    portfolio totals are moved by that symbol's change in contribution, so
+    applying a fill is O(1) however long the session has been running.
+    State is rebuilt from the start of the trading day on first use (and at
+    each day change). Alerts are edge-triggered: raised once when a limit is
+    crossed and re-armed when it clears.
+    """
+
+    def __init__(self, dsn: str, plan=None, stream=None, app: str = "risk_monitor"):
+        self.dsn     = dsn
+        self.app     = app
+        self.plan    = plan or load_plan()
+        self.budget  = self.plan["portfolio_value"] * self.plan["risk"]
+        self.alerts  = deque(maxlen=100)
+        self.missing = False    # executions read model not installed
+        self._lock   = threading.Lock()
+        self._reset(self._session_start())
+        if stream is not None:
+            threading.Thread(target=self._follow, args=(stream,), daemon=True,
+                             name="risk-monitor").start()
+
+    # ─── State ──────────────────────────────────────────────
+    def _session_start(self):
+        now = datetime.now(MARKET_TZ)
+        return now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    def _reset(self, since):
+        self.since      = since
+        self.watermark  = IdWatermark()
+        self.positions  = {}
+        self.open       = {}        # trade_id → (symbol, qty, buy_price)
+        self.realized   = 0.0
+        self.unrealized = 0.0
+        self.gross      = 0.0
+        self.net        = 0.0
+        self.fills      = 0
+        self.unmatched  = 0         # sells whose buy we never saw
+        self.updated    = None
+        self._active    = set()
+        self._seeded    = False
+
+    def _unbook(self, pos):
+        self.gross      -= abs(pos.value)
+        self.net        -= pos.value
+        self.unrealized -= pos.unrealized
+
+    def _book(self, pos):
+        self.gross      += abs(pos.value)
+        self.net        += pos.value
+        self.unrealized += pos.unrealized
+
+    def apply(self, trade_id, symbol, side, qty, price, ts=None):
+        price = float(price) if price is not None else None
+        pos = self.positions.get(symbol)
+        if pos is None:
+            pos = self.positions[symbol] = Position(symbol)
+        self._unbook(pos)
+        if side == "buy":
+            self.open[trade_id] = (symbol, qty, price)
+            pos.qty    += qty
+            pos.cost   += qty * price
+            pos.trades += 1
+        else:
+            opened = self.open.pop(trade_id, None)
+            if opened is None:
+                self.unmatched += 1
+            else:
+                _, bqty, bprice = opened
+                pos.qty    -= bqty
+                pos.cost   -= bqty * bprice
+                pos.trades -= 1
+                pnl = (price - bprice) * bqty
+                self.realized += pnl
+                if -pnl > self.budget:
+                    self._alert(None, "trade_loss",
+                                f"{symbol} trade {trade_id} lost ${-pnl:,.2f}, "
+                                f"over the ${self.budget:,.2f} per-trade risk budget")
+        if price is not None:
+            pos.mark = price
+        if pos.trades == 0:
+            pos.qty, pos.cost = 0, 0.0      # no float drift on a flat book
+        self._book(pos)
+        self.fills += 1
+        if ts is not None and ts.tzinfo is None:
+            ts = ts.replace(tzinfo=timezone.utc).astimezone(MARKET_TZ)     # naive UTC from the DB
+        self.updated = ts or datetime.now(MARKET_TZ)
+        self._check_position(pos)
+        self._check_exposure()
+
+    # ─── Limits ─────────────────────────────────────────────
+    def _alert(self, key, rule, message):
+        if key is not None:
+            if key in self._active:
+                return
+            self._active.add(key)
+        self.alerts.appendleft({"at": datetime.now(MARKET_TZ), "rule": rule, "message": message})
+        metrics.record_risk_alert(rule)
+        print(f"🚨 {message}", file=sys.stderr)
+
+    def _clear(self, key):
+        self._active.discard(key)
+
+    def _check_position(self, pos):
+        # a symbol's open loss against the budget of the trades holding it
+        key = f"position:{pos.symbol}"
+        if pos.trades and -pos.unrealized > self.budget * pos.trades:
+            self._alert(key, "position_loss",
+                        f"{pos.symbol} open loss ${-pos.unrealized:,.2f} over {pos.trades} "
+                        f"trade(s) × ${self.budget:,.2f} risk budget")
+        else:
+            self._clear(key)
+
+    def _check_exposure(self):
+        limit = self.plan["portfolio_value"] * MAX_GROSS
+        if self.gross > limit:
+            self._alert("gross", "gross_exposure",
+                        f"gross exposure ${self.gross:,.2f} is over ${limit:,.2f} "
+                        f"({self.gross / self.plan['portfolio_value']:.0%} of portfolio_value)")
+        else:
+            self._clear("gross")
+
+    def _check_clock(self, now=None):
+        now = now or datetime.now(MARKET_TZ)
+        close = now.replace(hour=MARKET_CLOSE[0], minute=MARKET_CLOSE[1], second=0, microsecond=0)
+        cutoff = close - timedelta(minutes=self.plan["market_liquidation_end_time_minutes"])
+        held = sum(1 for p in self.positions.values() if p.trades)
+        if now.weekday() < 5 and cutoff <= now < close + timedelta(hours=1) and held:
+            self._alert("liquidation", "liquidation",
+                        f"{held} position(s) still open past the liquidation time "
+                        f"({cutoff:%H:%M} {MARKET_TZ.key})")
+        elif not held:
+            self._clear("liquidation")
+
+    # ─── Database ───────────────────────────────────────────
+    def _params(self, **kw):
+        # executions.ts and trades.buy_time are naive UTC (Postgres' default
+        # TimeZone), as downsample.py and bar_store.py read them
+        return {"since": self.since.astimezone(timezone.utc).replace(tzinfo=None),
+                "envs": LIVE_ENVS, **kw}
+
+    def _seed(self, cur):
+        cur.execute(CARRIED_SQL, self._params())
+        for trade_id, symbol, qty, price, ts in cur.fetchall():
+            self.apply(trade_id, symbol, "buy", qty, price, ts)
+        self._seeded = True
+
+    def poll(self):
+        """Apply fills committed since the last poll; returns how many."""
+        with self._lock:
+            if self._session_start() != self.since:
+                self._reset(self._session_start())
+            applied = 0
+            try:
+                with metrics.query_timer(self.app, "risk_fills"), \
+                        connection(self.dsn) as conn, conn.cursor() as cur:
+                    if not self._seeded:
+                        self._seed(cur)
+                    after = self.watermark.after
+                    while True:
+                        cur.execute(FILLS_SQL, self._params(after=after, n=BATCH))
+                        rows = cur.fetchall()
+                        # a fill re-read from below the watermark is applied once
+                        fresh = self.watermark.fresh(rows)
+                        for execution_id, trade_id, symbol, side, qty, price, ts in fresh:
+                            self.apply(trade_id, symbol, side, qty, price, ts)
+                        if rows:
+                            after = rows[-1][0]
+                        applied += len(fresh)
+                        if len(rows) < BATCH:
+                            break
+                    if self.watermark.gaps:
+                        cur.execute(FILTERED_SQL, self._params(gaps=list(self.watermark.gaps)))
+                        self.watermark.settle(r[0] for r in cur.fetchall())
+            except errors.UndefinedTable:
+                self.missing = True
+                return 0
+            self._check_clock()
+            metrics.record_risk(self.gross, self.net, self.realized, self.unrealized,
+                                self.plan["portfolio_value"])
+            return applied
+
+    def _follow(self, stream):
+        # wake up on every published fill, and every POLL_S for the clock
+        # rules / while the change stream is down
+        seen = -1
+        while True:
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"⚠️ risk monitor poll failed: {e}", file=sys.stderr)
+            if stream.healthy:
+                seen = stream.wait(seen, POLL_S)
+            else:
+                time.sleep(POLL_S)
+
+    # ─── Published state ────────────────────────────────────
+    def snapshot(self):
+        with self._lock:
+            pv = self.plan["portfolio_value"]
+            return {
+                "since":          self.since,
+                "updated":        self.updated,
+                "fills":          self.fills,
+                "unmatched":      self.unmatched,
+                "portfolio_value": pv,
+                "risk_budget":    self.budget,
+                "gross":          self.gross,
+                "net":            self.net,
+                "gross_pct":      self.gross / pv if pv else None,
+                "net_pct":        self.net / pv if pv else None,
+                "realized":       self.realized,
+                "unrealized":     self.unrealized,
+                "positions": [
+                    {"symbol": p.symbol, "qty": p.qty, "trades": p.trades,
+                     "avg_price": p.cost / p.qty if p.qty else None, "mark": p.mark,
+                     "value": p.value, "unrealized": p.unrealized}
+                    for p in sorted(self.positions.values(), key=lambda p: -abs(p.value))
+                    if p.trades
+                ],
+                "alerts":   list(self.alerts),
+                "active":   sorted(self._active),
+            }
+
+
+if __name__ == "__main__":
+    # Headless: python risk_monitor.py — follows the change stream, prints
+    # alerts and serves the liu_risk_* gauges on METRICS_PORT
+    from trade_stream import TradeStream
+    metrics.serve()
+    dsn = os.getenv("DSN", "")
+    monitor = RiskMonitor(dsn, stream=TradeStream(dsn))
+    while True:
+        time.sleep(60)
+        s = monitor.snapshot()
+        print(f"📊 gross ${s['gross']:,.2f} ({s['gross_pct']:.0%})  net ${s['net']:,.2f}  "
+              f"realized ${s['realized']:,.2f}  unrealized ${s['unrealized']:,.2f}  "
+              f"{len(s['positions'])} open")
@@ -0,0 +1,6 @@
+# The engine-wrapper modules import each other as top-level modules, the
+# way the scripts and Docker images run them.
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "engine-wrapper"))
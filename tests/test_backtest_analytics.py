@@ -0,0 +1,84 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+from backtest_analytics import DAY_S, compute
+from symbol_renames import Event, Renames
+
+NAN = np.nan
+RENAMES = Renames([Event(date(2022, 2, 16), "VIAC", "PARA", 1.0, 0.0)])
+
+
+def columns(*trades):
+    # rows as load_trades returns them: by batch, then close time, open last
+    names = ("batch_id", "symbol", "qty", "buy_price", "sell_price", "is_win", "buy_ts", "sell_ts")
+    cols = dict(zip(names, map(list, zip(*trades))))
+    out = {c: np.array(cols[c], dtype=object) for c in ("batch_id", "symbol", "is_win")}
+    out.update({c: np.array(cols[c], dtype="float64")
+                for c in ("qty", "buy_price", "sell_price", "buy_ts", "sell_ts")})
+    return out
+
+
+TRADES = columns(
+    ("a", "AAPL", 10, 100.0, 110.0, "t", 0,     3600),           # +100
+    ("a", "AAPL", 10, 100.0,  95.0, "f", 1800,  7200),           # -50
+    ("a", "MSFT",  5, 200.0, 180.0, "f", DAY_S, DAY_S + 3600),   # -100
+    ("a", "MSFT",  1,  50.0,   NAN, "",  DAY_S, NAN),            # still open
+    ("b", "VIAC", 100, 10.0,  12.0, "",  0,     100),            # +200, is_win NULL
+    ("b", "PARA", 10,  20.0,  21.0, "f", 200,   300),            # +10, flagged a loss
+)
+
+
+@pytest.fixture(scope="module")
+def rows():
+    return {r["batch_id"]: r for r in compute(TRADES, RENAMES)}
+
+
+def test_no_trades():
+    assert compute({}) == []
+
+
+def test_counts_and_pnl(rows):
+    a = rows["a"]
+    assert a["trades"] == 4
+    assert a["closed_trades"] == 3
+    assert a["win_rate"] == pytest.approx(1 / 3)
+    assert a["net_profit"] == -50.0
+    assert a["profit_factor"] == pytest.approx(100 / 150, abs=1e-4)
+    assert a["avg_hold_s"] == pytest.approx((3600 + 5400 + 3600) / 3)
+
+
+def test_drawdown_per_batch(rows):
+    # equity 100, 50, -50: 150 below the peak
+    assert rows["a"]["max_drawdown"] == 150.0
+    # b starts from its own zero, not from where a ended
+    assert rows["b"]["max_drawdown"] == 0.0
+
+
+def test_exposure_is_union_of_holdings(rows):
+    # [0, 3600] ∪ [1800, 7200] ∪ [DAY, DAY + 3600] over [0, DAY + 3600]
+    assert rows["a"]["exposure_pct"] == pytest.approx(10_800 / (DAY_S + 3600), abs=1e-4)
+
+
+def test_sharpe_from_daily_returns(rows):
+    notional = (1000 + 1000 + 1000 + 50) / 4
+    ret = np.array([50, -100]) / notional
+    down = np.mean(np.minimum(ret, 0) ** 2)
+    assert rows["a"]["sharpe"] == pytest.approx(ret.mean() / ret.std(ddof=1) * np.sqrt(252), abs=1e-4)
+    assert rows["a"]["sortino"] == pytest.approx(ret.mean() / np.sqrt(down) * np.sqrt(252), abs=1e-4)
+    # one trading day is too few for a ratio
+    assert rows["b"]["sharpe"] is None
+
+
+def test_is_win_flag_wins_over_pnl(rows):
+    b = rows["b"]
+    assert b["net_profit"] == 210.0
+    assert b["win_rate"] == 0.5
+
+
+def test_renamed_symbols_count_once(rows):
+    assert rows["b"]["symbols"] == ["PARA"]
+    assert rows["b"]["per_symbol"] == {"PARA": {"trades": 2, "win_rate": 0.5, "net_profit": 210.0}}
+    assert rows["a"]["symbols"] == ["AAPL", "MSFT"]
+    assert rows["a"]["per_symbol"]["MSFT"] == {"trades": 2, "win_rate": 0.0, "net_profit": -100.0}
@@ -0,0 +1,39 @@
+import numpy as np
+
+from downsample import lttb
+
+
+def test_short_series_kept_whole():
+    x = np.arange(5.0)
+    assert lttb(x, x, 5).tolist() == [0, 1, 2, 3, 4]
+    assert lttb(x, x, 10).tolist() == [0, 1, 2, 3, 4]
+    assert lttb(x, x, 2).tolist() == [0, 1, 2, 3, 4]
+
+
+def test_budget_and_endpoints():
+    rng = np.random.default_rng(7)
+    x = np.arange(10_000.0)
+    y = rng.normal(size=len(x)).cumsum()
+    idx = lttb(x, y, 500)
+    assert len(idx) == 500
+    assert idx[0] == 0 and idx[-1] == len(x) - 1
+    assert (np.diff(idx) > 0).all()
+
+
+def test_one_point_per_bucket():
+    x = np.arange(1000.0)
+    y = np.sin(x / 50)
+    n = 20
+    idx = lttb(x, y, n)
+    edges = np.linspace(1, len(x) - 1, n - 1).astype(np.int64)
+    for i in range(n - 2):
+        assert edges[i] <= idx[i + 1] < edges[i + 1]
+
+
+def test_keeps_spikes():
+    x = np.arange(1000.0)
+    y = np.zeros(len(x))
+    y[123], y[777] = 50.0, -40.0
+    idx = lttb(x, y, 10)
+    assert 123 in idx and 777 in idx
+
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+from fill_quality import _match
+
+
+def frames(live, sim):
+    # as compare() builds them: live by time, sim with its position as bt_idx
+    left = pd.DataFrame(live, columns=["ts", "symbol", "operation"]).astype({"ts": "float64"})
+    left = left.sort_values("ts", kind="stable").reset_index(drop=True)
+    right = pd.DataFrame(sim, columns=["bt_ts", "symbol", "operation"]).astype({"bt_ts": "float64"})
+    right["bt_idx"] = np.arange(len(right))
+    return left, right.sort_values("bt_ts", kind="stable")
+
+
+def matched(live, sim, tolerance_s=60.0):
+    return _match(*frames(live, sim), tolerance_s).tolist()
+
+
+def test_loser_rematches_a_free_fill():
+    # both live fills are nearest to 1000; 1004 falls back to 1010
+    sim = [(1000, "AAPL", "buy"), (1010, "AAPL", "buy")]
+    live = [(1001, "AAPL", "buy"), (1004, "AAPL", "buy")]
+    assert matched(live, sim) == [0, 1]
+
+
+def test_nearest_live_fill_keeps_the_match():
+    sim = [(1000, "AAPL", "buy")]
+    live = [(990, "AAPL", "buy"), (1002, "AAPL", "buy")]
+    out = matched(live, sim)
+    assert np.isnan(out[0]) and out[1] == 0
+
+
+def test_symbol_and_side_must_agree():
+    sim = [(1000, "AAPL", "sell"), (1000, "MSFT", "buy")]
+    live = [(1000, "AAPL", "buy")]
+    assert np.isnan(matched(live, sim)).all()
+
+
+def test_tolerance():
+    sim = [(1000, "AAPL", "buy")]
+    live = [(1100, "AAPL", "buy")]
+    assert np.isnan(matched(live, sim, 60.0)).all()
+    assert matched(live, sim, 120.0) == [0]
+
+
+def test_every_sim_fill_taken_once():
+    rng = np.random.default_rng(3)
+    sim = [(t, "AAPL", "buy") for t in np.sort(rng.uniform(0, 3600, 200))]
+    live = [(t, "AAPL", "buy") for t in np.sort(rng.uniform(0, 3600, 300))]
+    out = np.array(matched(live, sim))
+    hit = out[~np.isnan(out)]
+    assert len(hit) == len(np.unique(hit))
+    # matching stops only when no unmatched live fill has a free one in reach
+    free = np.array([t for i, (t, _, _) in enumerate(sim) if i not in set(hit)])
+    for (t, _, _), m in zip(live, out):
+        if np.isnan(m):
+            assert not (np.abs(free - t) <= 60).any()
+
+
+def test_no_sim_fills():
+    assert np.isnan(matched([(1000, "AAPL", "buy")], [])).all()
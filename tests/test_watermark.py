@@ -0,0 +1,91 @@
+import pytest
+
+import watermark
+from watermark import IdWatermark
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(watermark.time, "monotonic", lambda: now[0])
+    return now
+
+
+def rows(*ids):
+    return [(i, f"row {i}") for i in ids]
+
+
+def test_late_commit_is_picked_up():
+    wm = IdWatermark()
+    assert wm.fresh(rows(1, 2, 4)) == rows(1, 2, 4)
+    # 3 wasn't visible yet: the next pass re-reads from just below it
+    assert wm.after == 2
+    assert set(wm.gaps) == {3}
+
+    assert wm.fresh(rows(3, 4, 5)) == rows(3, 5)
+    assert wm.after == 5
+    assert wm.gaps == {}
+    assert wm.seen == set()
+
+
+def test_rows_are_handed_back_once():
+    wm = IdWatermark()
+    wm.fresh(rows(1, 3))
+    assert wm.fresh(rows(3)) == []
+    assert wm.after == 1
+
+
+def test_gaps_only_within_span():
+    wm = IdWatermark(span=5)
+    wm.fresh(rows(100))
+    assert set(wm.gaps) == {96, 97, 98, 99}
+    assert wm.after == 95
+
+
+def test_cut_low_ignores_ids_below_the_page():
+    # ORDER BY id DESC LIMIT 3: 1..97 were cut, not missing
+    wm = IdWatermark()
+    assert wm.fresh(rows(100, 99, 98), cut_low=True) == rows(100, 99, 98)
+    assert wm.gaps == {}
+    assert wm.after == 100
+
+    wm = IdWatermark()
+    wm.fresh(rows(100, 99, 98))
+    assert wm.after == 0
+
+
+def test_settle_drops_filtered_ids():
+    wm = IdWatermark()
+    wm.fresh(rows(1, 3, 5))
+    assert wm.after == 1
+    wm.settle([4])
+    assert set(wm.gaps) == {2}
+    assert wm.after == 1
+    wm.settle([2])
+    assert wm.gaps == {}
+    assert wm.after == 5
+
+
+def test_gap_expires_after_hold(clock):
+    wm = IdWatermark(hold_s=10)
+    wm.fresh(rows(1, 3))
+    assert wm.after == 1
+
+    clock[0] += 9
+    assert wm.fresh(rows(3)) == []
+    assert wm.after == 1
+
+    # a rolled-back insert: give up on 2 and move past it
+    clock[0] += 2
+    assert wm.fresh(rows(3)) == []
+    assert wm.gaps == {}
+    assert wm.after == 3
+    assert wm.seen == set()
+
+
+def test_empty_pass_still_expires(clock):
+    wm = IdWatermark(hold_s=10)
+    wm.fresh(rows(1, 3))
+    clock[0] += 11
+    assert wm.fresh([]) == []
+    assert wm.after == 3